@@ -0,0 +1,95 @@
+"""
+Recall vs latency of the IVF index against exact search on the real index.
+
+Loads the vectors of lahn_index (vectors.npy), builds an IVF index over them
+with the given number of cells and, for each nprobe value, runs the same
+queries through the IVF path and the exact scan. Reports recall@k (share of
+the exact top-k that the IVF search also returns) and mean/p95 latency.
+
+Queries are the embedded lines of --questions if given (one question per
+line, needs the embedding model), otherwise stored vectors with a little
+noise added, so each has a known close neighbourhood in the corpus.
+
+Usage (from backend/):
+    python benchmarks/ann_benchmark.py
+    python benchmarks/ann_benchmark.py --lists 256 --nprobe 1 4 8 16 32 --top-k 10
+    python benchmarks/ann_benchmark.py --questions fixtures/questions.txt
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llama_index.core.vector_stores.types import VectorStoreQuery  # noqa: E402
+
+from utils.vector_store import MmapVectorStore, IVFIndex  # noqa: E402
+
+
+EMBED_MODEL = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+
+
+def load_queries(store, args):
+    if args.questions:
+        from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+
+        with open(args.questions, encoding="utf-8") as f:
+            questions = [line.strip() for line in f if line.strip()]
+        model = HuggingFaceEmbedding(EMBED_MODEL)
+        return np.asarray(model.get_text_embedding_batch(questions), dtype=np.float32)
+
+    base = store._snapshot.base
+    rng = np.random.default_rng(0)
+    rows = rng.choice(base.shape[0], size=min(args.queries, base.shape[0]), replace=False)
+    queries = np.asarray(base[np.sort(rows)], dtype=np.float32)
+    return queries + rng.normal(scale=args.noise, size=queries.shape).astype(np.float32)
+
+
+def timed(store, query, top_k, nprobe):
+    start = time.perf_counter()
+    result = store.query(VectorStoreQuery(query_embedding=query.tolist(), similarity_top_k=top_k), nprobe=nprobe)
+    return result.ids, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("storage_dir", nargs="?", default="lahn_index")
+    parser.add_argument("--lists", type=int, default=0, help="IVF cells, 0 = about 4 * sqrt(n)")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--noise", type=float, default=0.02)
+    parser.add_argument("--questions")
+    args = parser.parse_args()
+
+    store = MmapVectorStore.from_persist_dir(args.storage_dir)
+    snap = store._snapshot
+    if snap.base is None or not snap.base.shape[0]:
+        sys.exit(f"No vectors.npy in {args.storage_dir}; build the index first.")
+
+    start = time.perf_counter()
+    snap.ivf = IVFIndex.train(snap.base, args.lists)
+    print(f"{snap.base.shape[0]} vectors, dim {snap.base.shape[1]}, {len(snap.ivf.centroids)} cells "
+          f"(trained in {time.perf_counter() - start:.1f}s)")
+
+    queries = load_queries(store, args)
+    exact = [timed(store, q, args.top_k, None) for q in queries]
+    exact_ms = np.array([ms for _, ms in exact])
+    print(f"\n{'search':<12} {'recall@' + str(args.top_k):>10} {'mean ms':>9} {'p95 ms':>9}")
+    print(f"{'exact':<12} {1.0:10.3f} {exact_ms.mean():9.2f} {np.percentile(exact_ms, 95):9.2f}")
+
+    for nprobe in args.nprobe:
+        recalls, latencies = [], []
+        for q, (exact_ids, _) in zip(queries, exact):
+            ids, ms = timed(store, q, args.top_k, nprobe)
+            recalls.append(len(set(ids) & set(exact_ids)) / max(len(exact_ids), 1))
+            latencies.append(ms)
+        latencies = np.array(latencies)
+        print(f"{'ivf/' + str(nprobe):<12} {np.mean(recalls):10.3f} {latencies.mean():9.2f} {np.percentile(latencies, 95):9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Compare the ONNX int8 embedding backend with the PyTorch FP32 model.
+
+Embeds the same texts with both backends and reports
+    agreement   cosine similarity between the two vectors of each text
+                (mean, min, p1) and how often both give the same nearest
+                neighbour among the texts for each query
+    latency     single-query embedding time (p50/p95) and batch throughput
+
+Texts are the sentences of the data sources (or --texts, one per line);
+queries are --queries (one per line) or a sample of the texts.
+
+Usage (from backend/):
+    python benchmarks/embedding_benchmark.py data
+    python benchmarks/embedding_benchmark.py data --threads 4 --limit 2000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.context_compression import split_sentences  # noqa: E402
+from utils.manifest import list_sources  # noqa: E402
+from utils.onnx_embedding import OnnxEmbedding, get_embed_model  # noqa: E402
+
+
+def read_lines(path):
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def load_texts(data_dir, limit):
+    texts = []
+    for path in list_sources(data_dir):
+        if path.endswith(".txt"):
+            with open(path, encoding="utf-8", errors="ignore") as f:
+                texts.extend(split_sentences(f.read()))
+        if len(texts) >= limit:
+            break
+    return texts[:limit]
+
+
+def unit(vectors):
+    matrix = np.asarray(vectors, dtype=np.float32)
+    return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+
+def timed_batch(model, texts):
+    start = time.perf_counter()
+    vectors = model.get_text_embedding_batch(texts)
+    return unit(vectors), time.perf_counter() - start
+
+
+def query_latency(model, queries):
+    latencies = []
+    for q in queries:
+        start = time.perf_counter()
+        model.get_query_embedding(q)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return np.percentile(latencies, 50), np.percentile(latencies, 95)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("data_dir", nargs="?", default="data")
+    parser.add_argument("--texts")
+    parser.add_argument("--queries")
+    parser.add_argument("--limit", type=int, default=1000)
+    parser.add_argument("--threads", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    texts = read_lines(args.texts) if args.texts else load_texts(args.data_dir, args.limit)
+    if not texts:
+        sys.exit(f"No texts found in {args.data_dir}")
+    queries = read_lines(args.queries) if args.queries else texts[:: max(1, len(texts) // 100)]
+    print(f"{len(texts)} texts, {len(queries)} queries, {args.threads} threads\n")
+
+    models = {"torch": get_embed_model("torch"), "onnx": OnnxEmbedding(threads=args.threads)}
+    vectors = {}
+    print(f"{'backend':<8} {'texts/s':>9} {'query p50 ms':>13} {'query p95 ms':>13}")
+    for name, model in models.items():
+        model.get_query_embedding("warm-up")
+        vectors[name], elapsed = timed_batch(model, texts)
+        p50, p95 = query_latency(model, queries)
+        print(f"{name:<8} {len(texts) / elapsed:9.1f} {p50:13.1f} {p95:13.1f}")
+
+    cos = (vectors["torch"] * vectors["onnx"]).sum(axis=1)
+    print(f"\ncosine torch vs onnx: mean {cos.mean():.4f}, min {cos.min():.4f}, p1 {np.percentile(cos, 1):.4f}")
+
+    q_torch = unit(models["torch"].get_text_embedding_batch(queries))
+    q_onnx = unit(models["onnx"].get_text_embedding_batch(queries))
+    s_torch, s_onnx = q_torch @ vectors["torch"].T, q_onnx @ vectors["onnx"].T
+    # queries sampled from the texts would trivially find themselves
+    s_torch[s_torch > 0.999] = -1
+    s_onnx[s_onnx > 0.999] = -1
+    same = np.argmax(s_torch, axis=1) == np.argmax(s_onnx, axis=1)
+    print(f"same nearest neighbour for {same.mean() * 100:.1f}% of queries")
+
+
+if __name__ == "__main__":
+    main()
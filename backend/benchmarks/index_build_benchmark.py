@@ -0,0 +1,83 @@
+"""
+Measure the embedding work of an index build.
+
+Runs the node pipeline three ways on the same documents:
+    baseline  SemanticSplitterNodeParser + VectorStoreIndex embedding every node again
+    embed     split_and_embed with the text cache, nodes embedded exactly
+    derive    split_and_embed, node embeddings derived from the sentence embeddings
+and reports embeddings computed per document, build time and, for "derive",
+how close the derived node vectors are to exactly embedded ones (cosine).
+
+Usage (from backend/):
+    python benchmarks/index_build_benchmark.py data
+    python benchmarks/index_build_benchmark.py data --batch-size 512
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llama_index.core import VectorStoreIndex  # noqa: E402
+from llama_index.core.node_parser import SemanticSplitterNodeParser  # noqa: E402
+from llama_index.embeddings.huggingface import HuggingFaceEmbedding  # noqa: E402
+
+from utils.embedding_pipeline import CachedEmbedding, split_and_embed, embed_nodes  # noqa: E402
+from utils.manifest import list_sources  # noqa: E402
+from utils.avatar import load_source_documents  # noqa: E402
+
+
+EMBED_MODEL = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+
+
+def baseline(documents, model):
+    counter = CachedEmbedding(model, use_cache=False, embed_batch_size=model.embed_batch_size)
+    parser = SemanticSplitterNodeParser(embed_model=counter)
+    nodes = parser.get_nodes_from_documents(documents)
+    for node in nodes:
+        node.text = " ".join(node.text.split())
+    VectorStoreIndex(nodes, embed_model=counter)
+    return nodes, counter
+
+
+def run(name, fn, documents):
+    start = time.perf_counter()
+    nodes, counter = fn()
+    elapsed = time.perf_counter() - start
+    print(f"{name:<9} {len(nodes):6d} nodes {counter.computed:7d} embeddings "
+          f"{counter.computed / len(documents):7.1f}/doc {elapsed:7.1f}s")
+    return nodes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("data_dir", nargs="?", default="data")
+    parser.add_argument("--batch-size", type=int, default=256)
+    args = parser.parse_args()
+
+    documents = [doc for docs in load_source_documents(list_sources(args.data_dir)).values() for doc in docs]
+    if not documents:
+        sys.exit(f"No documents found in {args.data_dir}")
+    print(f"{len(documents)} documents, batch size {args.batch_size}\n")
+
+    model = HuggingFaceEmbedding(EMBED_MODEL, embed_batch_size=args.batch_size)
+    run("baseline", lambda: baseline(documents, model), documents)
+    run("embed", lambda: split_and_embed(documents, model, derive=False), documents)
+    derived = run("derive", lambda: split_and_embed(documents, model, derive=True), documents)
+
+    # agreement of derived node vectors with exact ones
+    exact = [node.model_copy() for node in derived]
+    for node in exact:
+        node.embedding = None
+    embed_nodes(exact, model)
+    a = np.asarray([n.embedding for n in derived], dtype=np.float32)
+    b = np.asarray([n.embedding for n in exact], dtype=np.float32)
+    cos = (a * b).sum(axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))
+    print(f"\nderived vs exact node embeddings: cosine mean {cos.mean():.3f}, min {cos.min():.3f}, p5 {np.percentile(cos, 5):.3f}")
+
+
+if __name__ == "__main__":
+    main()
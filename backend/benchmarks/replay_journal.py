@@ -0,0 +1,113 @@
+"""
+Replay recorded chat traffic (utils/journal.py) against a running server.
+
+Sends every journaled turn to /api/chat at the pace it originally arrived
+(--speed 2 replays twice as fast, --speed 0 as fast as --concurrency
+allows) and reports
+    latency     p50/p95/max end-to-end, overall and for priority (Pi) turns
+    outcome     responses by status code, 503s from admission control
+
+The journal keeps only the length of each turn's history, so a history of
+the same number of messages and characters is rebuilt from earlier turns'
+prompts and replies. Turns recorded from the Pi are sent with the same
+X-Lahn-Client header.
+
+Usage (from backend/):
+    python benchmarks/replay_journal.py chat_logs/journal
+    python benchmarks/replay_journal.py chat_logs/journal/journal-20250916-120000-4242-1.jsonl.gz --speed 10 --url http://localhost:5001
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.admission import PRIORITY_HEADER  # noqa: E402
+from utils.journal import journal_files, read_journal  # noqa: E402
+
+
+def load_turns(path, limit):
+    turns = []
+    for journal_path in journal_files(path):
+        turns.extend(r for r in read_journal(journal_path) if r.get("route") == "chat")
+    turns.sort(key=lambda r: r["ts"])
+    return turns[:limit] if limit else turns
+
+
+def synthetic_history(turns, i):
+    """history_len messages of about history_chars characters, from the turns before i."""
+    turn = turns[i]
+    length = turn.get("history_len", 0)
+    if not length:
+        return []
+    earlier = [text for t in reversed(turns[:i]) for text in (t.get("reply") or "", t.get("prompt") or "")]
+    texts = list(reversed(earlier[:length]))
+    texts = ["..."] * (length - len(texts)) + texts
+    per_message = max(turn.get("history_chars", 0) // length, 1)
+    return [
+        {"sender": "user" if j % 2 == (length % 2) else "avatar", "text": ((text or "...") * (per_message // max(len(text), 1) + 1))[:per_message]}
+        for j, text in enumerate(texts)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("journal", nargs="?", default="chat_logs/journal")
+    parser.add_argument("--url", default="http://localhost:5001")
+    parser.add_argument("--speed", type=float, default=1.0)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--limit", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=300)
+    args = parser.parse_args()
+
+    turns = load_turns(args.journal, args.limit)
+    if not turns:
+        sys.exit(f"No chat turns found in {args.journal}")
+    span = turns[-1]["ts"] - turns[0]["ts"]
+    pace = f"{args.speed}x" if args.speed > 0 else "max"
+    print(f"{len(turns)} turns over {span / 60:.1f} min, replaying at {pace} against {args.url}\n")
+
+    results = []
+    lock = threading.Lock()
+
+    def send(i):
+        turn = turns[i]
+        headers = {PRIORITY_HEADER: turn["client"]} if turn.get("client") else {}
+        body = {"prompt": turn["prompt"], "history": synthetic_history(turns, i)}
+        start = time.perf_counter()
+        try:
+            status = requests.post(f"{args.url}/api/chat", json=body, headers=headers, timeout=args.timeout).status_code
+        except requests.RequestException:
+            status = "error"
+        with lock:
+            results.append((status, time.perf_counter() - start, bool(turn.get("client"))))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for i, turn in enumerate(turns):
+            if args.speed > 0:
+                delay = (turn["ts"] - turns[0]["ts"]) / args.speed - (time.perf_counter() - started)
+                if delay > 0:
+                    time.sleep(delay)
+            pool.submit(send, i)
+    elapsed = time.perf_counter() - started
+
+    print(f"{'turns':<10} {'n':>6} {'p50 s':>8} {'p95 s':>8} {'max s':>8}")
+    for label, priority in (("all", None), ("priority", True)):
+        latencies = [t for status, t, p in results if status == 200 and (priority is None or p == priority)]
+        if latencies:
+            print(f"{label:<10} {len(latencies):6d} {np.percentile(latencies, 50):8.2f} "
+                  f"{np.percentile(latencies, 95):8.2f} {max(latencies):8.2f}")
+    print(f"\nstatus: {dict(Counter(status for status, _, _ in results))}")
+    print(f"throughput: {len(results) / elapsed:.2f} turns/s over {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Compare vector-only and hybrid (vector + BM25) retrieval on evaluation questions.
+
+Question file: JSONL, one question per line with the sources that answer it
+(any substring of a node's file path / URL, or of its text):
+
+    {"question": "Wo brütet der Eisvogel an der Lahn?", "expected": ["Eisvogel_Wetzlar.txt"]}
+
+Usage (from backend/):
+    python benchmarks/retrieval_benchmark.py fixtures/retrieval_questions.jsonl
+    python benchmarks/retrieval_benchmark.py fixtures/retrieval_questions.jsonl --top-k 3 5 10
+
+Reports per retriever and top-k: recall (share of questions with at least one
+expected source retrieved), characters of retrieved context handed to
+synthesis, and mean retrieval latency.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.avatar import build_or_load_index  # noqa: E402
+from utils.hybrid_retrieval import HybridRetriever  # noqa: E402
+
+
+def matches(node, expected):
+    source = " ".join(str(v) for v in (node.ref_doc_id, node.metadata.get("file_path"), node.metadata.get("source")))
+    return any(e in source or e in node.get_content() for e in expected)
+
+
+def evaluate(retriever, questions):
+    hits, chars, elapsed = 0, 0, 0.0
+    for q in questions:
+        start = time.perf_counter()
+        results = retriever.retrieve(q["question"])
+        elapsed += time.perf_counter() - start
+        hits += any(matches(r.node, q["expected"]) for r in results)
+        chars += sum(len(r.node.get_content()) for r in results)
+    n = len(questions)
+    return hits / n, chars / n, elapsed / n * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("questions")
+    parser.add_argument("--top-k", type=int, nargs="+", default=[5, 10])
+    args = parser.parse_args()
+
+    with open(args.questions, encoding="utf-8") as f:
+        questions = [json.loads(line) for line in f if line.strip()]
+    index = build_or_load_index()
+    print(f"{len(questions)} questions\n")
+    print(f"{'retriever':<14} {'recall':>7} {'ctx chars':>10} {'ms':>8}")
+
+    for top_k in args.top_k:
+        for name, retriever in (
+            (f"vector@{top_k}", index.as_retriever(similarity_top_k=top_k)),
+            (f"hybrid@{top_k}", HybridRetriever(index, top_k=top_k)),
+        ):
+            recall, chars, ms = evaluate(retriever, questions)
+            print(f"{name:<14} {recall:7.3f} {chars:10.0f} {ms:8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Compare the Whisper transcription engines on a fixture set.
+
+Fixture layout: a folder with audio clips (any format ffmpeg reads) and, next
+to each clip, a reference transcript with the same name and a .txt extension:
+
+    fixtures/transcription/
+        lahn_ufer.webm
+        lahn_ufer.txt
+        ...
+
+Usage (from backend/):
+    python benchmarks/transcription_benchmark.py fixtures/transcription
+    python benchmarks/transcription_benchmark.py fixtures/transcription --backends ctranslate2 torch-int8
+
+Reports per engine: load time, real-time factor (processing time / audio
+duration, lower is better) and word error rate against the references.
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.transcription import ENGINES, get_transcription_engine, load_wav, SAMPLE_RATE  # noqa: E402
+
+
+AUDIO_EXTENSIONS = (".wav", ".webm", ".mp3", ".m4a", ".ogg", ".flac")
+
+
+def normalize(text):
+    text = re.sub(r"[^\w\s']", " ", text.lower())
+    return text.split()
+
+
+def word_error_rate(reference, hypothesis):
+    ref, hyp = normalize(reference), normalize(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    # Levenshtein distance over words, one row at a time
+    prev = list(range(len(hyp) + 1))
+    for i, r in enumerate(ref, 1):
+        cur = [i] + [0] * len(hyp)
+        for j, h in enumerate(hyp, 1):
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (r != h))
+        prev = cur
+    return prev[-1] / len(ref)
+
+
+def load_fixtures(folder):
+    import subprocess
+
+    fixtures = []
+    tmp_dir = tempfile.mkdtemp(prefix="whisper_bench_")
+    for name in sorted(os.listdir(folder)):
+        stem, ext = os.path.splitext(name)
+        ref_path = os.path.join(folder, stem + ".txt")
+        if ext.lower() not in AUDIO_EXTENSIONS or not os.path.exists(ref_path):
+            continue
+        wav_path = os.path.join(tmp_dir, stem + ".wav")
+        subprocess.run(
+            ["ffmpeg", "-y", "-i", os.path.join(folder, name), "-ar", str(SAMPLE_RATE), "-ac", "1", wav_path],
+            check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        speech, sr = load_wav(wav_path)
+        with open(ref_path, encoding="utf-8") as f:
+            fixtures.append((name, speech, sr, f.read().strip()))
+    return fixtures
+
+
+def benchmark(backend, fixtures):
+    start = time.perf_counter()
+    engine = get_transcription_engine(backend)
+    load_time = time.perf_counter() - start
+
+    # warm-up so one-off allocations don't land on the first clip
+    engine.transcribe(fixtures[0][1][: fixtures[0][2]], sampling_rate=fixtures[0][2])
+
+    audio_seconds = processing_seconds = 0.0
+    errors = []
+    for name, speech, sr, reference in fixtures:
+        start = time.perf_counter()
+        hypothesis = engine.transcribe(speech, sampling_rate=sr)
+        elapsed = time.perf_counter() - start
+        duration = len(speech) / sr
+        wer = word_error_rate(reference, hypothesis)
+        audio_seconds += duration
+        processing_seconds += elapsed
+        errors.append(wer)
+        print(f"  {name:<30} {duration:6.1f}s audio  RTF {elapsed / duration:5.2f}  WER {wer:5.1%}")
+
+    return {
+        "backend": backend,
+        "load_s": load_time,
+        "rtf": processing_seconds / audio_seconds,
+        "wer": sum(errors) / len(errors),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("fixtures", help="folder with audio clips and .txt references")
+    parser.add_argument("--backends", nargs="+", default=list(ENGINES), choices=list(ENGINES))
+    args = parser.parse_args()
+
+    fixtures = load_fixtures(args.fixtures)
+    if not fixtures:
+        sys.exit(f"No audio/.txt pairs found in {args.fixtures}")
+    print(f"{len(fixtures)} fixtures, {sum(len(f[1]) / f[2] for f in fixtures):.1f}s of audio\n")
+
+    results = []
+    for backend in args.backends:
+        print(f"== {backend}")
+        results.append(benchmark(backend, fixtures))
+        print()
+
+    baseline = next((r for r in results if r["backend"] == "transformers"), results[0])
+    print(f"{'backend':<14} {'load':>7} {'RTF':>6} {'speedup':>8} {'WER':>7}")
+    for r in results:
+        print(f"{r['backend']:<14} {r['load_s']:6.1f}s {r['rtf']:6.2f} {baseline['rtf'] / r['rtf']:7.1f}x {r['wer']:6.1%}")
+
+
+if __name__ == "__main__":
+    main()
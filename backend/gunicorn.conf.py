@@ -0,0 +1,32 @@
+"""
+Prefork deployment: gunicorn -c gunicorn.conf.py server:app (from backend/)
+
+The master imports server.py once (LLM clients, embedder, index, Whisper),
+then forks the workers, which share those pages copy-on-write; the vectors
+are memory-mapped, so refreshed versions are shared through the page cache
+too. Each worker starts its own background threads in post_fork and follows
+the others' prompt/index/upload changes through utils/worker_sync.py.
+"""
+import os
+import sys
+
+os.environ.setdefault("SERVER_MODE", "prefork")
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from utils.admission import thread_budget  # noqa: E402
+
+bind = os.getenv("WEB_BIND", "0.0.0.0:5001")
+workers = int(os.getenv("WEB_WORKERS", str(os.cpu_count() or 1)))
+worker_class = "gthread"   # threads for the voice websocket and slow LLM calls
+# enough threads for every lane's running and queued requests (utils/admission.py),
+# so admission, not gunicorn's accept queue, decides who waits
+threads = int(os.getenv("WEB_THREADS", str(thread_budget())))
+if threads < thread_budget():
+    print(f"⚠️ WEB_THREADS={threads} is below the {thread_budget()} the admission lanes need; "
+          "requests beyond it queue in gunicorn without priority")
+preload_app = True
+timeout = 300   # chat requests wait on retrieval + LLM
+
+
+def post_fork(server, worker):
+    sys.modules["server"].start_worker()
@@ -1,86 +1,414 @@
 from flask import Flask, request, jsonify, send_file, make_response
 from flask_cors import CORS
+from flask_sock import Sock
 from werkzeug.utils import secure_filename
-import os, io, asyncio
+import os, io, sys, asyncio, queue, functools, threading, time
 from datetime import datetime
 
-# from llama_index.core import Settings
+from llama_index.core import Settings
 from llama_index.core.tools.query_engine import QueryEngineTool
-
-from utils.avatar import get_llm, build_index, build_or_load_index, fetch_system_prompt_from_gdoc
-from utils.utils import whisper_processor, whisper_model, transcribe_audio, azure_speech_response_func, LahnSensorsTool, format_history_as_string
+from llama_index.core.query_engine import RetrieverQueryEngine
+
+from utils.avatar import get_llm, refresh_index, build_index, build_or_load_index, load_index, init_embed_model, fetch_system_prompt_from_gdoc, STORAGE_DIR
+from utils.utils import convert_to_wav, azure_speech_response_func, azure_speech_stream_func, LahnSensorsTool, format_history_as_string
+from utils.transcription import get_transcription_engine
+from utils.transcription_queue import TranscriptionQueue
+from utils.live_index import LiveIndexer
+from utils.hybrid_retrieval import HybridRetriever
+from utils.context_compression import ContextCompressor, compress_text
+from utils.index_versions import IndexVersions, IndexRefresher
+from utils.sqlite_store import reopen_stores
+from utils.startup import Warmup, WARM_WHISPER
+from utils.worker_sync import EventBus, SERVER_MODE
+from utils.admission import Admission, PRIORITY_HEADER
+from utils.prompt_registry import prompts
+from utils.debate_openers import DebateOpeners
+from utils.journal import Journal
+from utils.pandas_sandbox import sandbox
+from utils.sensor_snapshot import SensorSnapshot
 
 import os
 
 # === Initialize Flask ===
 app = Flask(__name__)
 CORS(app, supports_credentials=True)
+sock = Sock(app)
 
 UPLOAD_DIR = "data/uploaded_experiences"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
+# prefork: gunicorn loads this module once in the master (models, index), forks the
+# workers, and gunicorn.conf.py calls start_worker() in each; state changes a worker
+# makes (prompt, index version, uploads) are broadcast to the others over the bus
+PREFORK = SERVER_MODE == "prefork"
+bus = EventBus() if PREFORK else None
+remote_jobs = {}   # job id -> latest status of jobs running in other workers
+REMOTE_JOB_HISTORY = 200
+
+
+def broadcast(kind, **data):
+    if bus is not None:
+        bus.publish(kind, **data)
+
+
+# lahn_index points at the served version; refreshes build the next one beside it
+index_versions = IndexVersions(STORAGE_DIR)
+index_versions.ensure_layout()
+
+# New experiences go straight into the live index, no rebuild needed
+index = None
+index_version = None   # version directory the loaded index came from
+live_indexer = LiveIndexer(
+    lambda: index, STORAGE_DIR,
+    on_indexed=lambda source: broadcast("experience", source=source),
+    start=False,
+)
+
+# Uploaded audio is transcribed in the background, in micro-batches
+transcription_queue = TranscriptionQueue(
+    get_transcription_engine, convert_to_wav, on_transcribed=live_indexer.submit,
+    on_finished=lambda job: broadcast("job", job=job),
+    start=False,
+)
+
 # === Load LLM once at startup ===
 llm_choice = "gemma-3-27b-it" #"hrz-chat-small" #"gemma-3-27b-it" #"mistral-large-instruct" #"hrz-chat-small" #"llama-3.3-70b-instruct" #
 
-llm, system_prompt = get_llm('openai', llm_choice)
+# Set by the warm-up below; routes that need them answer 503 until they are
+# (the prompts themselves live in the registry: utils/prompt_registry.py)
+llm = sensor_query_llm = query_llm = api_tool = debate_summary_llm = None
+query_engine = None
 
-# print('LLM metadata model name: ', llm.metadata.model_name)
 
-# agent=True
-sensor_query_llm, _ = get_llm('gwdg', "hrz-chat-small", system_prompt= 'Provide an accurate response to the given query. Only perform calculations. Do not generate any plots or visualizations :')
-query_llm, _ = get_llm('gwdg', "hrz-chat-small", system_prompt= 'Provide an accurate response to the given query:')
+def load_sensor_llm():
+    global sensor_query_llm, api_tool
+    sensor_query_llm, _ = get_llm('gwdg', "hrz-chat-small", system_prompt=prompts.get("sensor"))
+    api_tool = QueryEngineTool.from_defaults(
+            query_engine=LahnSensorsTool(sensor_query_llm),
+            name=LahnSensorsTool.name,
+            description=LahnSensorsTool.description,
+        )
 
-api_tool = QueryEngineTool.from_defaults(
-        query_engine=LahnSensorsTool(sensor_query_llm),
-        name=LahnSensorsTool.name,
-        description=LahnSensorsTool.description,
-    )
 
+def load_rag_llm():
+    global query_llm, query_engine
+    query_llm, _ = get_llm('gwdg', "hrz-chat-small", system_prompt=prompts.get("rag"))
+    if index is not None:
+        query_engine = make_query_engine(index)
 
-def prepare_query_engine(refresh=False):
-    global query_llm
-    if refresh==True:
-        index = build_index()
-    else:
-        index = build_or_load_index()
 
+def load_llms():
+    global llm, debate_summary_llm
+    # the avatar prompt is not part of the client, chat() takes it from the registry per request
+    llm, _ = get_llm('openai', llm_choice)
+
+    # print('LLM metadata model name: ', llm.metadata.model_name)
+
+    # agent=True
+    load_sensor_llm()
+    load_rag_llm()
+
+    debate_summary_llm, _= get_llm('gwdg', "mistral-large-instruct", system_prompt= '')
+    print('LLM initialized.')
+
+
+# a changed prompt only rebuilds what was made from it
+prompts.on_change("sensor", lambda text: load_sensor_llm())
+prompts.on_change("rag", lambda text: load_rag_llm())
+
+
+def make_query_engine(index):
     # query_llm = get_llm('gwdg', "mistral-large-instruct", system_prompt= 'Provide an accurate response to the given query:')
 
-    index_query_engine = index.as_query_engine(llm=query_llm,similarity_top_k=10, verbose=True)
+    # index_query_engine = index.as_query_engine(llm=query_llm,similarity_top_k=10, verbose=True)
+    index_query_engine = RetrieverQueryEngine.from_args(
+        HybridRetriever(index), llm=query_llm, node_postprocessors=[ContextCompressor()], verbose=True
+    )
 
     return index_query_engine
 
 
-query_engine = prepare_query_engine()
+def prepare_query_engine():
+    global index, index_version, query_engine
+    index_version = index_versions.current()
+    index = build_or_load_index(embed_model=Settings.embed_model)
+    live_indexer.load(index)
+    query_engine = make_query_engine(index)
+
+
+def activate_index(new_index, version=None):
+    # called by the refresh job once the new version is validated; requests
+    # already running finish on the old engine, new ones get the new one
+    global index, index_version, query_engine
+    index = new_index
+    index_version = version or index_versions.current()
+    live_indexer.load(new_index)
+    query_engine = make_query_engine(new_index)
+
+
+def retrieve_context(engine, conversation, prompt, trace=None):
+    # trace (a dict) receives the retrieved node ids and stage timings for the journal
+    trace = trace if trace is not None else {}
+    query = 'Provide context needed to address the most recent message in this conversation. Your job is not to predict what any party will say, but to provide information from the context, which is relevant for them to make their decision. That is where your job stops. : '+ format_history_as_string(conversation) + '\nUser: '+prompt
+    # print('Query: ', query)
+    start = time.perf_counter()
+    result = engine.query(query)
+    trace["node_ids"] = [n.node.node_id for n in result.source_nodes]
+    trace["retrieve_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    start = time.perf_counter()
+    context = compress_text(result.response, prompt)
+    trace["compress_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return context
+
+
+def context_message(context):
+    return {'role':'system', 'content':'Here is relevant information about the Lahn: '+context + ' . You can call get_relevant_Lahn_context() if environmental data readings are relevant to the user\'s query.'}
+
+
+def avatar_completion(messages):
+    chat_completion = llm.chat.completions.create(
+          messages= messages,
+          model= llm_choice,
+          temperature=0,
+          top_p=0.85
+      )
+    return chat_completion.choices[0].message.content
+
+
+# Debate openers ("Let's talk about <topic>") are answered from replies precomputed
+# per index version; they are rebuilt when the index or a prompt they use changes
+debate_openers = DebateOpeners()
+
+
+def opener_versions(version=None):
+    return {
+        "index": version or index_versions.current(),
+        "avatar": prompts.version("avatar"),
+        "rag": prompts.version("rag"),
+        "model": llm_choice,
+    }
+
+
+def build_openers(opener_index, path):
+    engine = make_query_engine(opener_index)
+
+    def generate(opener):
+        context = retrieve_context(engine, [], opener)
+        reply = avatar_completion([{'role':'system', 'content':prompts.get("avatar")}, context_message(context)])
+        # a sensor call needs the live data, so only the context pack is kept for it
+        return context, None if 'analyze_sensor_data' in reply else reply
+
+    try:
+        debate_openers.build(path, generate, opener_versions(os.path.basename(path)))
+    except Exception as e:
+        print(f"❌ Failed to precompute debate openers: {e}")
+
+
+def refresh_openers():
+    if index is None or not debate_openers.stale(opener_versions()):
+        return
+    path = index_versions.path(index_versions.current())
+    threading.Thread(target=build_openers, args=(index, path), name="debate-openers", daemon=True).start()
+
+
+def serve_index(new_index):
+    activate_index(new_index)
+    broadcast("index", version=index_versions.current())
+    refresh_openers()   # after a rollback the stored ones may predate a prompt change
+
+
+index_refresher = IndexRefresher(
+    index_versions, build_index, refresh_index, load_index,
+    on_ready=serve_index, on_update=lambda job: broadcast("job", job=job),
+    prepare=build_openers,
+)
+prompts.on_change("avatar", lambda text: refresh_openers())
+prompts.on_change("rag", lambda text: refresh_openers())
+
+
+def load_openers():
+    debate_openers.load(STORAGE_DIR)
+    # in prefork mode every worker checks after the fork; one of them builds
+    if not PREFORK:
+        refresh_openers()
+
+
+def warm_embedder():
+    embed_model = init_embed_model()
+    # the first call builds the tokenizer/graph caches, so the first chat doesn't pay for it;
+    # not in the prefork master, torch/onnxruntime thread pools don't survive fork
+    if not PREFORK:
+        embed_model.get_query_embedding("Lahn")
+
+
+# Startup work runs in parallel in the background; the port is bound right away
+# and /readyz reports what is warm
+warmup = Warmup()
+warmup.add("llm", load_llms)
+warmup.add("embedder", warm_embedder)
+warmup.add("index", prepare_query_engine, after=("llm", "embedder"))
+warmup.add("openers", load_openers, after=("index",), required=False)
+if WARM_WHISPER and not PREFORK:
+    # prefork workers load it after the fork: CTranslate2's threads start with the model
+    warmup.add("whisper", get_transcription_engine, required=False)
+warmup.start()
+if PREFORK:
+    # workers are forked with everything loaded, pages shared copy-on-write
+    warmup.join()
+    bus.reset()
+
+
+# Every chat turn goes to a JSONL journal (written in the background) for
+# replay with benchmarks/replay_journal.py
+journal = Journal()
+
+
+# Latest/24 h min-max/trend of the sensors, refreshed in the background and
+# sent with every chat, so most sensor questions need no analyze_sensor_data() round trip
+sensor_snapshot = SensorSnapshot()
+
+
+def remember_remote_job(job):
+    remote_jobs[job["id"]] = job
+    while len(remote_jobs) > REMOTE_JOB_HISTORY:
+        remote_jobs.pop(next(iter(remote_jobs)))
+
+
+def catch_up():
+    """
+    Bring a freshly forked worker up to date. Workers fork from the master's
+    startup state, and one gunicorn respawns later (after a crash or timeout)
+    never sees the index/prompt/experience events published before it started.
+    """
+    # the index was loaded in the master; its SQLite connection must not be shared across fork
+    reopen_stores(index.storage_context)
+    version = index_versions.current()
+    if version != index_version:
+        print(f"Worker {os.getpid()}: loading index {version} (forked with {index_version})")
+        activate_index(load_index(index_versions.path(version)), version)   # replays the delta too
+    else:
+        live_indexer.sync()
+    prompts.reload()
+
+
+def start_worker():
+    """Background threads of one serving process (after fork in prefork mode)."""
+    if bus is not None:
+        bus.on("prompt", prompts.reload)
+        bus.on("index", lambda version: activate_index(load_index(index_versions.path(version)), version))
+        bus.on("experience", lambda source: live_indexer.sync())
+        bus.on("job", remember_remote_job)
+        bus.start()
+    if PREFORK and index is not None:
+        catch_up()
+    live_indexer.start()
+    transcription_queue.start()
+    journal.start()
+    sensor_snapshot.start()
+    sandbox.start()   # pandas code runs in these processes, started before the first sensor question
+    prompts.watch()
+    if PREFORK:
+        refresh_openers()
+        if WARM_WHISPER:
+            threading.Thread(target=get_transcription_engine, name="whisper-warmup", daemon=True).start()
+    print(f"Worker {os.getpid()} started.")
+
 
-debate_summary_llm, _= get_llm('gwdg', "mistral-large-instruct", system_prompt= '')
-print('LLM initialized.')
+if not PREFORK:
+    # prefork workers start theirs from gunicorn's post_fork hook
+    start_worker()
+
+
+# Per-endpoint concurrency limits and bounded queues; the sculpture's requests
+# (X-Lahn-Client: pi) go first, overload answers 503 with Retry-After
+admission = Admission()
+
+
+def requires(*tasks):
+    """503 with Retry-After until the given startup steps are done."""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if not warmup.is_ready(*tasks):
+                return jsonify({"status": "error", "message": "Server is still starting up.", "startup": warmup.status()}), 503, {"Retry-After": "5"}
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@app.route("/healthz", methods=["GET"])
+def healthz():
+    return jsonify({"status": "ok"})
+
+
+@app.route("/readyz", methods=["GET"])
+def readyz():
+    ready = warmup.is_ready()
+    return jsonify({"ready": ready, "startup": warmup.status()}), 200 if ready else 503
 
 
 
 
 @app.route("/api/refresh-prompt", methods=["POST"])
+@requires("llm")
+@admission.limit("admin")
 def refresh_prompt():
-    global system_prompt, llm
     print('Refresh prompt request received.')
-    fetch_system_prompt_from_gdoc()
-    llm,  system_prompt = get_llm('openai', llm_choice)
+    if fetch_system_prompt_from_gdoc():
+        broadcast("prompt")
     return 'Done.'
 
 
 
 @app.route("/api/refresh-embeddings", methods=["POST"])
+@requires("index")
+@admission.limit("admin")
 def refresh_embeddings():
-    global query_engine
     print('Refresh embeddings request received.')
-    query_engine = prepare_query_engine(refresh=True)
-    return 'Done'
+    # ?full=1 rebuilds from scratch, otherwise only changed sources are re-indexed
+    job_id = index_refresher.start(full=request.args.get("full") == "1")
+    return jsonify({
+        "status": "running",
+        "job_id": job_id,
+        "status_url": f"/api/refresh-embeddings/{job_id}",
+    }), 202
+
+
+@app.route("/api/refresh-embeddings/<job_id>", methods=["GET"])
+def refresh_embeddings_status(job_id):
+    job = index_refresher.status(job_id) or remote_jobs.get(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "Unknown job."}), 404
+    return jsonify(job)
+
+
+@app.route("/api/prompt-versions", methods=["GET"])
+def prompt_versions():
+    return jsonify(prompts.versions())
+
+
+@app.route("/api/index-versions", methods=["GET"])
+def index_versions_list():
+    return jsonify({"current": index_versions.current(), "versions": index_versions.versions()})
+
+
+@app.route("/api/index-versions/rollback", methods=["POST"])
+@requires("index")
+@admission.limit("admin")
+def index_versions_rollback():
+    version = (request.get_json(silent=True) or {}).get("version")
+    try:
+        version = index_refresher.rollback(version)
+    except (ValueError, RuntimeError) as e:
+        return jsonify({"status": "error", "message": str(e)}), 409
+    return jsonify({"status": "ok", "current": version})
 
 
 
 @app.route("/api/chat", methods=["POST"])
+@requires("llm", "index")
+@admission.limit("chat")
 def chat():
-    global llm, llm_choice, system_prompt
     print('Chat request received.')
     data = request.get_json()
     prompt = data.get("prompt", "")
@@ -99,7 +427,7 @@ def chat():
     # print('Conversation data from API call: ', conversation)
 
     # chat_history.insert(0, {'role':'user', 'content':'Hallo'})
-    chat_history.insert(0, {'role':'system', 'content':system_prompt})
+    chat_history.insert(0, {'role':'system', 'content':prompts.get("avatar")})
 
     # print('Extracted chat history: ', chat_history)
 
@@ -107,26 +435,49 @@ def chat():
 
     print('\nUser message:', prompt)
 
+    started = time.perf_counter()
+    trace = {}
+
+    def reply(text):
+        trace["total_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        journal.record(
+            route="chat",
+            client=request.headers.get(PRIORITY_HEADER),
+            prompt=prompt,
+            history_len=len(conversation),
+            history_chars=sum(len(m["text"]) for m in conversation),
+            reply=text,
+            **trace,
+        )
+        return jsonify({"reply": text.replace('*','')})
+
+    opener = debate_openers.lookup(prompt, opener_versions()) if not conversation else None
+    if opener is not None and opener["reply"]:
+        print('Serving precomputed debate opener.')
+        trace["opener"] = True
+        return reply(opener["reply"])
+
     # if 'get_relevant_Lahn_context' in response:
     print('Obtaining information for the LLM...')
     # response = response[response.find('user_query="')+12:]
-    query = 'Provide context needed to address the most recent message in this conversation. Your job is not to predict what any party will say, but to provide information from the context, which is relevant for them to make their decision. That is where your job stops. : '+ format_history_as_string(conversation) + '\nUser: '+prompt #prompt #response[:response.find('")')]
-    # print('Query: ', query)
-    context = query_engine.query(query).response
+    if opener is not None:
+        trace["opener"] = True
+        context = opener["context"]
+    else:
+        context = retrieve_context(query_engine, conversation, prompt, trace)
     print('Context: ', context)
 
 
-    messages_being_sent_to_avatar = chat_history+[{'role':'system', 'content':'Here is relevant information about the Lahn: '+context + ' . You can call get_relevant_Lahn_context() if environmental data readings are relevant to the user\'s query.'}]
+    messages_being_sent_to_avatar = chat_history+[context_message(context)]
+    snapshot_version, snapshot_message = sensor_snapshot.message()
+    if snapshot_message is not None:
+        trace["sensor_snapshot"] = snapshot_version
+        messages_being_sent_to_avatar.append(snapshot_message)
     print('Messages being sent to avatar: ', messages_being_sent_to_avatar)
 
-    chat_completion = llm.chat.completions.create(
-          messages= messages_being_sent_to_avatar,
-          model= llm_choice,
-          temperature=0,
-          top_p=0.85
-      )
-
-    response = chat_completion.choices[0].message.content
+    start = time.perf_counter()
+    response = avatar_completion(messages_being_sent_to_avatar)
+    trace["avatar_ms"] = round((time.perf_counter() - start) * 1000, 1)
 
     print('Avatar response: ', response)
 
@@ -136,7 +487,9 @@ def chat():
         response = response[response.find('user_query="')+12:]
         query = response[:response.find('")')]
         print('Query: ', query)
+        start = time.perf_counter()
         analysis = str(api_tool(query))
+        trace["sensor_ms"] = round((time.perf_counter() - start) * 1000, 1)
         print('Analysis: ', analysis)
         results += '\nHere is the output of analyze_sensor_data(): '+analysis +' Respond to the user accordingly. Do not provide any subjective Lahn-specific evaluation of this data, just focus on the quantitative result. And do not return a function call.'
 
@@ -158,13 +511,15 @@ def chat():
 
         print('Avatar response after getting sensor data:', response_2)
 
-        return jsonify({"reply": response_2.replace('*','')})
+        return reply(response_2)
 
-    return jsonify({"reply": response.replace('*','')})
+    return reply(response)
 
 
 
 @app.route("/api/debate-summary", methods=["POST"])
+@requires("llm")
+@admission.limit("summary")
 def debate_summary():
     print('Debate Summary request received.')
     data = request.get_json()
@@ -174,19 +529,7 @@ def debate_summary():
 
     formatted_history = format_history_as_string(conversation)
 
-    prompt = f"""This is a debate between a human and an AI avatar for the Lahn river. Your job is to provide a summary outline in the format
-            "Lahn:<Lahn's Central Perspective>\nPro:<Central Pro>\nCon:<Central Con of Lahn's perspective (deduced by you)>\n\nYou:<User's Central Perspective>\nPro:<Central Pro>\nCon:<Central Con of User's perspective (deduced by you)>", briefly outlining the Lahn's primary perspective, a pro and con of that perspective, the user's perspective
-            and a pro and con of that as well. Keep all content very brief. You're summarizing, not re-iterating. You are provided with the most recent debate summary. If it already contains content, iterate on that content to reflect recent updates to the conversation.
-            Topic being debated: {topic}
-
-            Conversation:
-            {formatted_history}
-
-            Existing summary:
-            {summary}
-
-            Respond with an updated version of the summary in the described format. Make sure to preserve the specified formatting in the template "Lahn:\nPro:\nCon:\n\nYou:\nPro:\nCon:". No extra characters. The contents of your response should ba based purely on the given summary. 
-            Summaries for 'Lahn' and 'User'should be based purely on what they said. If any party is yet to contribute to the conversation, leave their summary blank, as in the template."""
+    prompt = prompts.get("debate").format(topic=topic, history=formatted_history, summary=summary)
 
     response = debate_summary_llm.complete(prompt) #chat_engine.chat(prompt)
     # print('Summary model response: ', response)
@@ -206,6 +549,7 @@ def debate_summary():
 
 
 @app.route("/api/voice-chat", methods=["POST"])
+@admission.limit("voice")
 def voice_chat():
     if "audio" not in request.files:
         return jsonify({"error": "No audio uploaded"}), 400
@@ -236,6 +580,19 @@ def voice_chat():
 
 
 
+@sock.route("/api/voice-stream")
+@admission.limit_socket("stream")
+def voice_stream(ws):
+    # Full-duplex voice: mic pcm16 in, reply pcm16 out, turns ended by server-side VAD
+    print('Voice stream connected.')
+    try:
+        asyncio.run(azure_speech_stream_func(ws))
+    except Exception as e:
+        print("❌ Voice stream error:", e)
+    print('Voice stream closed.')
+
+
+
 @app.route("/api/reply-audio")
 def reply_audio():
     # Serve the latest reply audio file
@@ -251,6 +608,7 @@ def reply_audio():
 
 
 @app.route("/api/experience-upload", methods=["POST"])
+@admission.limit("upload")
 def experience_upload():
     print("Experience upload received.")
     timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S_%f")
@@ -259,10 +617,12 @@ def experience_upload():
     # Save the text message (if any)
     text = request.form.get("text", "")
     if text.strip():
-        with open(os.path.join(UPLOAD_DIR+'/text', f"{timestamp}_message.txt"), "w", encoding="utf-8") as f:
+        text_path = os.path.join(UPLOAD_DIR+'/text', f"{timestamp}_message.txt")
+        with open(text_path, "w", encoding="utf-8") as f:
             f.write(text.strip())
+        live_indexer.submit(text_path)
 
-    # Save and transcribe the uploaded audio file
+    # Save the uploaded audio file and queue it for transcription
     if "audio" in request.files:
         audio_file = request.files["audio"]
         if audio_file and audio_file.filename:
@@ -272,15 +632,57 @@ def experience_upload():
             audio_file.save(audio_path)
 
             try:
-                transcript = transcribe_audio(audio_path)
-                with open(os.path.join(UPLOAD_DIR+'/text', f"{timestamp}_transcript.txt"), "w", encoding="utf-8") as f:
-                    f.write(transcript.strip())
-                print("📝 Transcription saved.")
-            except Exception as e:
-                print("❌ Failed to transcribe:", e)
-                return jsonify({"status": "error", "message": "Audio saved, but transcription failed."}), 500
+                job_id = transcription_queue.submit(
+                    audio_path, os.path.join(UPLOAD_DIR+'/text', f"{timestamp}_transcript.txt")
+                )
+            except queue.Full:
+                print("❌ Transcription queue full.")
+                return jsonify({"status": "error", "message": "Audio saved, but the transcription queue is full."}), 503
+
+            print("📝 Transcription queued:", job_id)
+            broadcast("job", job=transcription_queue.status(job_id))
+            return jsonify({
+                "status": "queued",
+                "message": "Experience saved. Transcription in progress.",
+                "job_id": job_id,
+                "status_url": f"/api/experience-upload/{job_id}",
+            }), 202
 
     return jsonify({"status": "success", "message": "Experience saved."})
 
+
+
+@app.route("/api/experience-upload/<job_id>", methods=["GET"])
+def experience_upload_status(job_id):
+    job = transcription_queue.status(job_id) or remote_jobs.get(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "Unknown job."}), 404
+    return jsonify(job)
+
+
+
+@app.route("/api/transcription-metrics", methods=["GET"])
+def transcription_metrics():
+    return jsonify(transcription_queue.metrics())
+
+
+@app.route("/api/sensor-metrics", methods=["GET"])
+def sensor_metrics():
+    report = {"sandbox": sandbox.metrics(), "snapshot": sensor_snapshot.version}
+    if "utils.sensor_query" in sys.modules:   # imported with the first sensor question
+        report["code_cache"] = sys.modules["utils.sensor_query"].code_cache.metrics()
+    return jsonify(report)
+
+
+@app.route("/api/journal-metrics", methods=["GET"])
+def journal_metrics():
+    return jsonify(journal.metrics())
+
+
+@app.route("/api/admission-metrics", methods=["GET"])
+def admission_metrics():
+    # queue waits per lane; p95 creeping towards the lane's max wait means more workers are needed
+    return jsonify({"worker": os.getpid(), "lanes": admission.metrics()})
+
 if __name__ == "__main__":
     app.run(debug=True, use_reloader=False)
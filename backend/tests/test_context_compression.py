@@ -0,0 +1,14 @@
+from utils.context_compression import select_sentences
+
+
+def test_keeps_best_sentence_when_none_reaches_min_score():
+    sentences = ["Die Lahn fließt durch Gießen.", "The weather was mild.", "A very long sentence " * 50]
+    vectors = [[0.05, 1.0, 0.0], [0.01, 0.0, 1.0], [0.08, 1.0, 1.0]]
+    # every score is below MIN_SENTENCE_SCORE; the best one (index 2) does not fit the budget
+    assert select_sentences(sentences, vectors, [1.0, 0.0, 0.0], budget=20) == [0]
+
+
+def test_weak_sentences_are_not_added_to_relevant_ones():
+    sentences = ["The Lahn is a river.", "Unrelated text here."]
+    vectors = [[1.0, 0.0], [0.0, 1.0]]
+    assert select_sentences(sentences, vectors, [1.0, 0.0], budget=100) == [0]
@@ -0,0 +1,27 @@
+import os
+
+from utils.debate_openers import DebateOpeners
+
+
+def swap(link, target):
+    os.symlink(target, link + ".tmp")
+    os.replace(link + ".tmp", link)
+
+
+def test_not_stale_after_index_swap_to_prepared_version(tmp_path):
+    old, new, link = str(tmp_path / "v1"), str(tmp_path / "v2"), str(tmp_path / "lahn_index")
+    os.makedirs(old)
+    os.makedirs(new)
+    os.symlink(old, link)
+    openers = DebateOpeners(topics=["floods"])
+    generate = lambda opener: ("context", "reply")
+
+    openers.build(old, generate, {"index": "v1"})
+    openers.load(link)
+    assert not openers.stale({"index": "v1"})
+
+    # the refresh job prepares the new version's openers before the swap
+    openers.build(new, generate, {"index": "v2"})
+    swap(link, new)
+    assert not openers.stale({"index": "v2"})
+    assert openers.lookup("Let's talk about floods", {"index": "v2"})["reply"] == "reply"
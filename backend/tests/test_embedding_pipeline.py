@@ -0,0 +1,20 @@
+from llama_index.core import Document
+from llama_index.core.embeddings import MockEmbedding
+
+from utils.embedding_pipeline import split_and_embed
+
+
+def test_empty_documents_produce_no_nodes():
+    documents = [
+        Document(text="The Lahn flows through Giessen. Fish live in it. The water is cold."),
+        Document(text=""),
+        Document(text="   \n\n  "),
+    ]
+    nodes, _ = split_and_embed(documents, MockEmbedding(embed_dim=8))
+    assert [n.ref_doc_id for n in nodes] == [documents[0].doc_id] * len(nodes)
+    assert all(len(n.embedding) == 8 for n in nodes)
+
+
+def test_only_empty_documents():
+    nodes, _ = split_and_embed([Document(text=" ")], MockEmbedding(embed_dim=8))
+    assert nodes == []
@@ -0,0 +1,77 @@
+import os
+
+from llama_index.core import Settings, StorageContext, VectorStoreIndex, load_index_from_storage
+from llama_index.core.embeddings import MockEmbedding
+from llama_index.core.schema import TextNode
+
+from utils.hybrid_retrieval import BM25Index, load_bm25
+from utils.live_index import LiveIndexer
+from utils.sqlite_store import SqliteKVStore, sqlite_stores, STORE_FILE
+from utils.vector_store import MmapVectorStore, load_vector_store
+
+
+def build(storage_dir):
+    os.makedirs(storage_dir)
+    docstore, index_store = sqlite_stores(SqliteKVStore(os.path.join(storage_dir, STORE_FILE)))
+    context = StorageContext.from_defaults(vector_store=MmapVectorStore(), docstore=docstore, index_store=index_store)
+    nodes = [TextNode(text=f"Lahn fact {i}", embedding=[float(i + 1)] + [0.0] * 7) for i in range(5)]
+    index = VectorStoreIndex(nodes, storage_context=context)
+    index.storage_context.persist(persist_dir=storage_dir)
+
+
+def load(storage_dir):
+    # as the server does: a new process maps vectors.npy and opens store.sqlite
+    docstore, index_store = sqlite_stores(SqliteKVStore.from_persist_dir(storage_dir))
+    context = StorageContext.from_defaults(
+        persist_dir=storage_dir, vector_store=load_vector_store(storage_dir),
+        docstore=docstore, index_store=index_store,
+    )
+    return load_index_from_storage(context)
+
+
+def test_live_inserts_keep_their_vectors_after_restart(tmp_path):
+    Settings.embed_model = MockEmbedding(embed_dim=8)
+    storage_dir = str(tmp_path / "index")
+    build(storage_dir)
+
+    index = load(storage_dir)
+    indexer = LiveIndexer(lambda: index, storage_dir, start=False)
+    indexer.load(index)
+    upload = tmp_path / "experience.txt"
+    upload.write_text("I saw a kingfisher by the river this morning.", encoding="utf-8")
+    indexer.add_file(str(upload))
+    live_ids = set(index.index_struct.nodes_dict) - set(load(storage_dir).vector_store.node_ids())
+    assert live_ids
+
+    restarted = load(storage_dir)
+    LiveIndexer(lambda: restarted, storage_dir, start=False).load(restarted)
+    assert set(restarted.index_struct.nodes_dict) == restarted.vector_store.node_ids()
+    assert live_ids <= restarted.vector_store.node_ids()
+
+
+def test_bm25_reads_only_live_inserts_after_restart(tmp_path):
+    Settings.embed_model = MockEmbedding(embed_dim=8)
+    storage_dir = str(tmp_path / "index")
+    build(storage_dir)
+
+    index = load_bm25(load(storage_dir), storage_dir)
+    indexer = LiveIndexer(lambda: index, storage_dir, start=False)
+    indexer.load(index)
+    upload = tmp_path / "experience.txt"
+    upload.write_text("I saw a kingfisher by the river this morning.", encoding="utf-8")
+    indexer.add_file(str(upload))
+    live_ids = set(index.index_struct.nodes_dict) - set(BM25Index.from_persist_dir(storage_dir).doc_len)
+    assert live_ids
+
+    restarted = load(storage_dir)
+    requested = []
+    get_nodes = restarted.docstore.get_nodes
+    restarted.docstore.get_nodes = lambda ids, **kwargs: requested.extend(ids) or get_nodes(ids, **kwargs)
+    load_bm25(restarted, storage_dir)
+    assert set(requested) == live_ids
+    assert set(restarted.bm25.doc_len) == set(restarted.index_struct.nodes_dict)
+    assert restarted.bm25.search("kingfisher", 1)
+
+    requested.clear()
+    load_bm25(load(storage_dir), storage_dir)
+    assert requested == []
@@ -0,0 +1,29 @@
+import pytest
+
+pytest.importorskip("llama_index.experimental")
+
+from utils.sensor_query import data_day, question_key
+
+
+@pytest.mark.parametrize("a, b", [
+    ("last 7 days", "last 3 days"),
+    ("Temperatur über 20 Grad", "Temperatur unter 20 Grad"),
+    ("oxygen was not above 8", "oxygen was above 8"),
+    ("pH > 7.5", "pH < 7.5"),
+])
+def test_different_questions_get_different_keys(a, b):
+    assert question_key(a) != question_key(b)
+
+
+def test_case_spacing_and_punctuation_share_a_key():
+    assert question_key("What was the   lowest pH, yesterday?") == question_key("what was the lowest pH yesterday")
+
+
+def test_code_is_not_reused_on_the_next_day_of_data():
+    import pandas as pd
+
+    today = pd.DataFrame({"created_at": pd.to_datetime(["2026-10-18 23:50", "2026-10-19 00:10"]), "ph": [7.9, 8.0]})
+    tomorrow = pd.DataFrame({"created_at": pd.to_datetime(["2026-10-19 23:50", "2026-10-20 00:10"]), "ph": [7.9, 8.0]})
+
+    assert data_day(today) == "2026-10-19"
+    assert data_day(today) != data_day(tomorrow)
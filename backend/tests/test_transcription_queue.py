@@ -0,0 +1,69 @@
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+import soundfile as sf
+
+from utils.transcription import SAMPLE_RATE, WINDOW_SECONDS
+from utils.transcription_queue import TranscriptionQueue
+
+
+class BlockingEngine:
+    """Short clips return at once; long-form windows wait until released."""
+
+    def __init__(self):
+        self.release = threading.Event()
+
+    def transcribe(self, waveform, sampling_rate=SAMPLE_RATE):
+        return self.transcribe_batch([waveform], sampling_rate)[0]
+
+    def transcribe_batch(self, waveforms, sampling_rate=SAMPLE_RATE):
+        if any(len(w) > SAMPLE_RATE * 5 for w in waveforms):
+            assert self.release.wait(10)
+        return ["words"] * len(waveforms)
+
+
+def write_clip(path, seconds):
+    sf.write(path, np.zeros(int(seconds * SAMPLE_RATE), dtype=np.float32), SAMPLE_RATE)
+
+
+def wait_for(q, job_id, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = q.status(job_id)["status"]
+        if status in ("done", "error"):
+            return status
+        time.sleep(0.01)
+    return q.status(job_id)["status"]
+
+
+def test_long_clip_does_not_stall_short_clips(tmp_path):
+    engine = BlockingEngine()
+    q = TranscriptionQueue(lambda: engine, shutil.copyfile, batch_wait=0.2)
+    write_clip(tmp_path / "long.wav", WINDOW_SECONDS * 3)
+    write_clip(tmp_path / "short.wav", 2)
+
+    long_id = q.submit(str(tmp_path / "long.wav"), str(tmp_path / "long.txt"))
+    short_id = q.submit(str(tmp_path / "short.wav"), str(tmp_path / "short.txt"))
+
+    assert wait_for(q, short_id) == "done"
+    assert q.status(long_id)["status"] == "running"
+    engine.release.set()
+    assert wait_for(q, long_id) == "done"
+    assert (tmp_path / "long.txt").read_text() == "words"
+
+
+def test_temp_files_removed_when_transcription_fails(tmp_path):
+    class FailingEngine(BlockingEngine):
+        def transcribe_batch(self, waveforms, sampling_rate=SAMPLE_RATE):
+            raise RuntimeError("boom")
+
+    q = TranscriptionQueue(lambda: FailingEngine(), shutil.copyfile, batch_wait=0.0)
+    write_clip(tmp_path / "long.wav", WINDOW_SECONDS * 2)
+
+    job_id = q.submit(str(tmp_path / "long.wav"), str(tmp_path / "long.txt"))
+
+    assert wait_for(q, job_id) == "error"
+    assert sorted(os.listdir(tmp_path)) == ["long.wav"]
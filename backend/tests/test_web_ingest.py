@@ -0,0 +1,82 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from utils.web_ingest import MAX_DOC_CHARS, NewsFetcher
+
+ARTICLE = """<html><head><title>Lahn news</title></head><body>
+<nav><ul><li>Home page of the river portal</li><li>Contact the editorial team today</li></ul></nav>
+<article><p>The water level of the Lahn rose by twenty centimetres overnight.</p>
+<p>Oxygen readings at the Marburg station stayed above eight milligrams per litre.</p></article>
+<footer><p>Copyright by the river portal, all rights reserved here.</p></footer>
+<script>var tracking = "should never show up in the text";</script>
+</body></html>"""
+LONG_ARTICLE = "<html><body>" + "<p>The Lahn flows through Marburg and Giessen today.</p>" * 1000 + "</body></html>"
+ETAG = '"v1"'
+
+
+class StandIn(BaseHTTPRequestHandler):
+    requests = []
+
+    def do_GET(self):
+        StandIn.requests.append((self.path, dict(self.headers)))
+        if self.path == "/broken":
+            self.send_error(500)
+            return
+        if self.path == "/article" and self.headers.get("If-None-Match") == ETAG:
+            self.send_response(304)
+            self.end_headers()
+            return
+        body = (ARTICLE if self.path == "/article" else LONG_ARTICLE).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", ETAG)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    StandIn.requests = []
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), StandIn)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_second_fetch_revalidates_and_uses_cache(server, tmp_path):
+    fetcher = NewsFetcher(cache_dir=str(tmp_path))
+    first = fetcher.fetch(server + "/article")
+    second = fetcher.fetch(server + "/article")
+
+    assert "If-None-Match" not in StandIn.requests[0][1]
+    assert StandIn.requests[1][1]["If-None-Match"] == ETAG
+    assert second.text == first.text
+    assert second.metadata == {"source": server + "/article", "title": "Lahn news"}
+
+
+def test_boilerplate_is_stripped(server, tmp_path):
+    doc = NewsFetcher(cache_dir=str(tmp_path)).fetch(server + "/article")
+
+    assert "twenty centimetres" in doc.text and "eight milligrams" in doc.text
+    assert "river portal" not in doc.text
+    assert "tracking" not in doc.text
+
+
+def test_documents_are_capped(server, tmp_path):
+    doc = NewsFetcher(cache_dir=str(tmp_path)).fetch(server + "/long")
+
+    assert len(doc.text) == MAX_DOC_CHARS
+
+
+def test_failing_url_is_dropped(server, tmp_path):
+    urls = [server + "/broken", server + "/article"]
+    docs = NewsFetcher(cache_dir=str(tmp_path)).fetch_all(urls)
+
+    assert list(docs) == [server + "/article"]
@@ -0,0 +1,204 @@
+import os
+import time
+import threading
+import functools
+from collections import deque
+
+import numpy as np
+from flask import request, jsonify
+
+
+# === CONFIG ===
+# lane: (concurrent requests, queued requests, seconds a request may wait in the queue)
+# override one with e.g. ADMISSION_CHAT="8,16,20"; limits are per worker process
+LANE_DEFAULTS = {
+    "chat": (6, 12, 20.0),
+    "summary": (2, 4, 20.0),
+    "voice": (2, 4, 10.0),
+    "upload": (4, 8, 10.0),
+    "admin": (1, 0, 0.0),
+    "stream": (2, 0, 0.0),   # voice websocket sessions, each holds a thread for its whole length
+}
+SPARE_THREADS = 4   # health probes, metrics and the other routes outside the lanes
+PRIORITY_RESERVED = int(os.getenv("PRIORITY_RESERVED", "1"))   # slots per lane only the sculpture may use
+PRIORITY_HEADER = "X-Lahn-Client"
+PRIORITY_CLIENTS = set(os.getenv("PRIORITY_CLIENTS", "pi").split(","))
+WAIT_SAMPLES = 500   # recent queue waits kept per lane for the percentiles
+
+
+def _lane_config(name):
+    value = os.getenv(f"ADMISSION_{name.upper()}")
+    if not value:
+        return LANE_DEFAULTS[name]
+    concurrency, queue_size, max_wait = value.split(",")
+    return int(concurrency), int(queue_size), float(max_wait)
+
+
+def thread_budget(lanes=None):
+    """
+    Threads a worker needs so that every admitted or queued request has one
+    (plus SPARE_THREADS). With fewer, requests beyond the thread count wait in
+    gunicorn's accept queue before admission sees them, where the sculpture's
+    requests get no priority.
+    """
+    lanes = lanes or {name: _lane_config(name) for name in LANE_DEFAULTS}
+    return sum(concurrency + queue_size for concurrency, queue_size, _ in lanes.values()) + SPARE_THREADS
+
+
+class Overloaded(Exception):
+    def __init__(self, retry_after):
+        super().__init__("overloaded")
+        self.retry_after = retry_after
+
+
+class Lane:
+    """
+    Concurrency limit with a bounded FIFO queue in front of one group of routes.
+
+    Priority requests (the sculpture) queue separately and are always let in
+    before normal ones; the last PRIORITY_RESERVED slots are theirs alone,
+    so a busy web page can't take the slot a visitor at the Pi is waiting for.
+    A request that finds the queue full, or waits longer than max_wait,
+    raises Overloaded right away instead of piling up.
+    """
+
+    def __init__(self, name, concurrency, queue_size, max_wait, reserved=PRIORITY_RESERVED):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.max_wait = max_wait
+        self.reserved = min(reserved, concurrency - 1)
+        self.running = 0
+        self.waiting = {True: deque(), False: deque()}
+        self.cond = threading.Condition()
+        self.stats = {"admitted": 0, "rejected": 0, "timed_out": 0, "priority_admitted": 0}
+        self.waits = {True: deque(maxlen=WAIT_SAMPLES), False: deque(maxlen=WAIT_SAMPLES)}
+        self.service = deque(maxlen=WAIT_SAMPLES)
+
+    def _can_run(self, ticket, priority):
+        if self.waiting[priority][0] is not ticket:
+            return False
+        if priority:
+            return self.running < self.concurrency
+        return not self.waiting[True] and self.running < self.concurrency - self.reserved
+
+    def acquire(self, priority=False):
+        """Blocks until admitted; returns the seconds spent queued."""
+        queued_at = time.monotonic()
+        ticket = object()
+        with self.cond:
+            if self._full(priority):
+                self.stats["rejected"] += 1
+                raise Overloaded(self.retry_after())
+            self.waiting[priority].append(ticket)
+            deadline = queued_at + self.max_wait
+            while not self._can_run(ticket, priority):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.waiting[priority].remove(ticket)
+                    self.stats["timed_out"] += 1
+                    self.cond.notify_all()
+                    raise Overloaded(self.retry_after())
+                self.cond.wait(remaining)
+            self.waiting[priority].popleft()
+            self.running += 1
+            self.stats["admitted"] += 1
+            if priority:
+                self.stats["priority_admitted"] += 1
+            wait = time.monotonic() - queued_at
+            self.waits[priority].append(wait)
+            self.cond.notify_all()   # the next in line may be able to run too
+        return wait
+
+    def _full(self, priority):
+        # priority requests only queue behind each other
+        ahead = len(self.waiting[True]) + (0 if priority else len(self.waiting[False]))
+        if ahead == 0 and self._free(priority):
+            return False
+        return ahead >= self.queue_size
+
+    def _free(self, priority):
+        limit = self.concurrency if priority else self.concurrency - self.reserved
+        return self.running < limit
+
+    def release(self, seconds):
+        with self.cond:
+            self.running -= 1
+            self.service.append(seconds)
+            self.cond.notify_all()
+
+    def retry_after(self):
+        # time for the requests ahead to drain, from the recent service times
+        service = float(np.mean(self.service)) if self.service else 5.0
+        ahead = len(self.waiting[True]) + len(self.waiting[False]) + 1
+        return max(1, int(round(service * ahead / self.concurrency)))
+
+    def metrics(self):
+        with self.cond:
+            report = {
+                "concurrency": self.concurrency,
+                "queue_size": self.queue_size,
+                "running": self.running,
+                "queued": len(self.waiting[False]),
+                "queued_priority": len(self.waiting[True]),
+                **self.stats,
+                "avg_service_s": float(np.mean(self.service)) if self.service else 0.0,
+            }
+            for priority, label in ((False, "wait"), (True, "priority_wait")):
+                waits = list(self.waits[priority])
+                report[f"{label}_p50_s"] = float(np.percentile(waits, 50)) if waits else 0.0
+                report[f"{label}_p95_s"] = float(np.percentile(waits, 95)) if waits else 0.0
+        return report
+
+
+class Admission:
+    """Lanes by name plus the route decorator."""
+
+    def __init__(self, lanes=None):
+        lanes = lanes or {name: _lane_config(name) for name in LANE_DEFAULTS}
+        self.lanes = {name: Lane(name, *config) for name, config in lanes.items()}
+
+    def limit(self, lane_name):
+        lane = self.lanes[lane_name]
+
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                priority = request.headers.get(PRIORITY_HEADER) in PRIORITY_CLIENTS
+                try:
+                    lane.acquire(priority)
+                except Overloaded as e:
+                    print(f"⏳ {lane_name} overloaded, rejecting {request.path}")
+                    return jsonify({"status": "error", "message": "Server is busy, please retry."}), 503, {"Retry-After": str(e.retry_after)}
+                start = time.monotonic()
+                try:
+                    return view(*args, **kwargs)
+                finally:
+                    lane.release(time.monotonic() - start)
+            return wrapper
+        return decorator
+
+    def limit_socket(self, lane_name):
+        """limit() for a flask-sock route: an overloaded lane closes the socket with 1013 (try again later)."""
+        lane = self.lanes[lane_name]
+
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(ws, *args, **kwargs):
+                priority = request.headers.get(PRIORITY_HEADER) in PRIORITY_CLIENTS
+                try:
+                    lane.acquire(priority)
+                except Overloaded:
+                    print(f"⏳ {lane_name} overloaded, rejecting {request.path}")
+                    ws.close(reason=1013, message="Server is busy, please retry.")
+                    return
+                start = time.monotonic()
+                try:
+                    return view(ws, *args, **kwargs)
+                finally:
+                    lane.release(time.monotonic() - start)
+            return wrapper
+        return decorator
+
+    def metrics(self):
+        return {name: lane.metrics() for name, lane in self.lanes.items()}
@@ -3,13 +3,11 @@ import subprocess
 import datetime, requests
 from rich.console import Console
 from docx import Document
-from urllib.parse import urlparse, parse_qs
 from pathlib import Path
 import hashlib
 import re
 from dotenv import load_dotenv
 
-from youtube_transcript_api import YouTubeTranscriptApi
 from llama_index.core.schema import Document as LlamaDocument
 
 from llama_index.core import StorageContext, load_index_from_storage, Settings
@@ -17,18 +15,24 @@ from llama_index.core.readers import SimpleDirectoryReader
 from llama_index.core.indices.vector_store import VectorStoreIndex
 from llama_index.core.memory import ChatMemoryBuffer
 from llama_index.core.settings import Settings
-from llama_index.readers.web import SimpleWebPageReader
-from llama_index.core.node_parser import SemanticSplitterNodeParser
 
 
 from openai import OpenAI
 # from llama_index.llms.openai import OpenAI as LlamaindexOpenAI
 
 
-from llama_index.embeddings.huggingface import HuggingFaceEmbedding
 # from llama_index.embeddings.azure_openai import AzureOpenAIEmbedding
 
 from .gwdg_llm import GWDGChatLLM
+from .live_index import clear_delta, replay_delta
+from .web_ingest import NewsFetcher
+from .embedding_pipeline import split_and_embed
+from .onnx_embedding import get_embed_model
+from .manifest import load_manifest, save_manifest, list_sources, source_entry, diff_sources, sync_drive_folder
+from .vector_store import new_vector_store, load_vector_store
+from .hybrid_retrieval import BM25Index, attach_bm25, get_bm25, load_bm25, delete_ref_doc
+from .prompt_registry import prompts
+from .sqlite_store import DOC_STORE, STORE_FILE, SqliteKVStore, sqlite_stores, store_exists
 
 
 load_dotenv()
@@ -49,6 +53,7 @@ DATA_DIR = "./data" #os.path.join(base_dir, "/data")
 # print('Base dir: ', base_dir, 'Data dir: ', DATA_DIR)
 LOG_DIR = "./chat_logs" #os.path.join(base_dir, "/chat_logs")
 STORAGE_DIR = "./lahn_index"#os.path.join(base_dir, "/lahn_index")
+SYSTEM_PROMPT_URL = "https://docs.google.com/document/d/1NYOOy8KkaLDBwvHvEVg1hVDY5yvHeLACUpCEkJVM8Kw/export?format=txt"
 
 
 def download_drive_folder(folder_id, output_dir="./data"):
@@ -59,19 +64,27 @@ def download_drive_folder(folder_id, output_dir="./data"):
 
 
 def fetch_system_prompt_from_gdoc(save=True):
+    """
+    Download the avatar prompt. With save, it goes into the prompt registry
+    (and system_prompt.txt) and the return value says whether it changed;
+    the request is conditional, and an identical text counts as unchanged.
+    """
     print(' Updating system prompt...')
-    url = "https://docs.google.com/document/d/1NYOOy8KkaLDBwvHvEVg1hVDY5yvHeLACUpCEkJVM8Kw/export?format=txt"
-    response = requests.get(url)
+    response = requests.get(SYSTEM_PROMPT_URL, headers=prompts.conditional_headers("avatar") if save else {})
+    if response.status_code == 304:
+        print(' Unchanged.')
+        return False
     response.raise_for_status()
     prompt = response.text.strip()
     # prompt = prompt[:prompt.find('General Internal Impressions')]
 
     if save==True:
-        base_dir = os.path.dirname(os.path.abspath(__file__))
-        file_path = os.path.join(base_dir, 'system_prompt.txt')
-        with open(file_path, 'w') as f:
-            f.write(prompt)
-        print(' Done.')
+        changed = prompts.update(
+            "avatar", prompt,
+            etag=response.headers.get("ETag"), last_modified=response.headers.get("Last-Modified"),
+        )
+        print(' Done.' if changed else ' Unchanged.')
+        return changed
     else:
         return prompt
 
@@ -94,37 +107,6 @@ def convert_docx_to_txt_and_cleanup(folder_path):
                     print(f"❌ Failed to convert {file_path}: {e}")
 
 
-def fetch_youtube_transcript(url, languages=["de"]):
-    print(f"🔗 Fetching: {url}")
-    try:
-        parsed = urlparse(url)
-
-        # Handle standard and short YouTube URL formats
-        if "youtube.com" in parsed.netloc:
-            video_id = parse_qs(parsed.query).get("v", [None])[0]
-        elif "youtu.be" in parsed.netloc:
-            video_id = parsed.path.lstrip("/")
-        else:
-            raise ValueError("Unrecognized YouTube URL format.")
-
-        if not video_id or len(video_id) != 11:
-            raise ValueError("Invalid YouTube video ID.")
-
-        transcript = YouTubeTranscriptApi.get_transcript(video_id, languages=languages)
-        full_text = " ".join([entry["text"] for entry in transcript])
-        return LlamaDocument(text=full_text, metadata={"source": url})
-
-    except Exception as e:
-        print(f"❌ Failed to fetch {url}: {e}")
-        return None
-
-
-def sanitize_filename(url):
-    domain = urlparse(url).netloc
-    hashed = hashlib.md5(url.encode()).hexdigest()[:8]
-    return f"{domain.replace('.', '_')}_{hashed}.txt"
-
-
 def select_model():
     print("Choose a model:")
     print("1. Mistral")
@@ -134,10 +116,8 @@ def select_model():
 
 
 def get_llm(mode='openai',model_name=None, system_prompt=None):
-    base_dir = os.path.dirname(os.path.abspath(__file__))
-    file_path = os.path.join(base_dir, 'system_prompt.txt')
     if system_prompt == None:
-        system_prompt = open(file_path, 'r').read()
+        system_prompt = prompts.get("avatar")
 
     # system_prompt += '\n You MUST ALWAYS call a function to answer any question. DO NOT respond directly. You have no knowledge or memory outside what you retrieve using the provided tools.\n'
 
@@ -180,10 +160,55 @@ def create_session_log():
     timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
     return open(os.path.join(LOG_DIR, f"session_{timestamp}.txt"), "w")
 
-def build_index():
-    cmd = f"rm -r data/*"
-    subprocess.run(cmd, shell=True)
-    print('Just cleared data/ . Contents: ', os.listdir('data'))
+def load_news_links():
+    links_path = Path(DATA_DIR) / "General_News/Online News (Links).txt"
+    if not links_path.exists():
+        return []
+    with open(links_path, "r") as f:
+        return list(dict.fromkeys(line.strip() for line in f if line.strip()))
+
+
+def load_news_documents():
+    """Fetch the news links and YouTube transcripts into {url: Document}, in memory."""
+    urls = load_news_links()
+    if not urls:
+        return {}
+
+    print(f"Fetching {len(urls)} news links...")
+    return NewsFetcher().fetch_all(urls)
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def load_source_documents(paths):
+    """Load each source file on its own, so every document id is tied to one file (for the manifest)."""
+    documents_by_source = {}
+    for path in paths:
+        try:
+            docs = SimpleDirectoryReader(input_files=[path], filename_as_id=True).load_data()
+        except Exception as e:
+            print(f"❌ Failed to load {path}: {e}")
+            continue
+        documents_by_source[path] = docs
+    return documents_by_source
+
+
+def parse_nodes(documents):
+    # The splitter's sentence embeddings are reused for the nodes (see
+    # utils/embedding_pipeline.py), so the index itself embeds nothing.
+    nodes, embed_model = split_and_embed(documents, Settings.embed_model)
+    print(f"{len(nodes)} nodes, {embed_model.computed} embeddings computed for {len(documents)} documents")
+    return nodes
+
+
+def build_index(storage_dir=STORAGE_DIR):
+    # clear the Drive mirror, but keep the visitor uploads (not on Drive) in place
+    for name in os.listdir(DATA_DIR):
+        if name != "uploaded_experiences":
+            subprocess.run(["rm", "-r", os.path.join(DATA_DIR, name)])
+    print('Just cleared data/ . Contents: ', os.listdir(DATA_DIR))
 
     # system_prompt = fetch_system_prompt_from_gdoc(save=False)
     # system_prompt = system_prompt[:system_prompt.find('You also have access to sensory data for the river')]
@@ -193,70 +218,42 @@ def build_index():
 
 
     print('Refreshing from Google Drive...')
-    download_drive_folder(DRIVE_FOLDER_ID, DATA_DIR)
+    drive = sync_drive_folder(DRIVE_FOLDER_ID, DATA_DIR, {})
     convert_docx_to_txt_and_cleanup(DATA_DIR)
+    news_documents = load_news_documents()
 
     print('Creating Vector store from data sources...')
 
-    if len(os.listdir(DATA_DIR))>0:
-        documents = SimpleDirectoryReader(DATA_DIR, recursive=True).load_data()
-        print(f"{len(documents)} documents loaded from {DATA_DIR}")
-        for i, doc in enumerate(documents):
-            print(f"\n--- Document {i+1} ---")
-            print("File:", doc.metadata.get('file_path', 'Unknown'))
-            print("Content preview:", doc.text, "...\n")
-
-
-    links_path = Path(DATA_DIR) / "General_News/Online News (Links).txt"
-    if links_path.exists():
-        with open(links_path, "r") as f:
-            urls = [line.strip() for line in f if line.strip()]
-
-        web_reader = SimpleWebPageReader()
-        for url in urls:
-            try:
-                print(f"🔗 Fetching: {url}")
-                if "youtube.com" in url or "youtu.be" in url:
-                    doc = fetch_youtube_transcript(url)
-                else:
-                    docs = web_reader.load_data([url])
-                    full_text = "\n\n".join(doc.text for doc in docs)
-                    doc = LlamaDocument(text=full_text, metadata={"source": url})
-
-                if doc:
-                    filename = sanitize_filename(url)
-                    filepath = Path(DATA_DIR) / "General_News/scraped_texts" / filename
-                    filepath.parent.mkdir(parents=True, exist_ok=True)
-                    with open(filepath, "w", encoding="utf-8") as f:
-                        f.write(doc.text)
-                    print(f"✅ Saved to {filepath}")
-            except Exception as e:
-                print(f"❌ Failed to fetch {url}: {e}")
-
-    scraped_documents_path = Path(DATA_DIR) / "General_News/scraped_texts"
-    if  scraped_documents_path.exists() and len(os.listdir(str(scraped_documents_path)))>0:
-        scraped_documents = SimpleDirectoryReader(str(Path(DATA_DIR) / "General_News/scraped_texts")).load_data()
-        documents += scraped_documents
-
-    experiences_folder_path = Path(DATA_DIR) / "uploaded_experiences/text"
-    # experiences_folder_is_empty = not os.listdir(str(Path(DATA_DIR) / "uploaded_experiences/text"))
-    if experiences_folder_path.exists() and len(os.listdir(str(experiences_folder_path)))>0:
-        user_experiences = SimpleDirectoryReader(str(Path(DATA_DIR) / "uploaded_experiences/text")).load_data()
-        documents += user_experiences
+    documents_by_source = load_source_documents(list_sources(DATA_DIR))
+    documents = [doc for docs in documents_by_source.values() for doc in docs]
+    documents += list(news_documents.values())
+    print(f"{len(documents)} documents loaded from {DATA_DIR}")
+    for i, doc in enumerate(documents):
+        print(f"\n--- Document {i+1} ---")
+        print("File:", doc.id_)
+        print("Content preview:", doc.text, "...\n")
 
     print('Creating nodes...')
-    parser = SemanticSplitterNodeParser(embed_model= Settings.embed_model, chunk_size=200, chunk_overlap=32)
-    nodes = parser.get_nodes_from_documents(documents)
-
-    for node in nodes:
-        # Fix common formatting issue: remove excessive line breaks
-        node.text = " ".join(node.text.split())
+    nodes = parse_nodes(documents)
 
     print('Creating index...')
 
     # index = VectorStoreIndex.from_documents(documents)
-    index = VectorStoreIndex(nodes)
-    index.storage_context.persist(persist_dir=STORAGE_DIR)
+    index = VectorStoreIndex(nodes, storage_context=new_storage_context(storage_dir))
+    attach_bm25(index, BM25Index.from_nodes(nodes))
+    index.storage_context.persist(persist_dir=storage_dir)
+    get_bm25(index).persist(storage_dir)
+    # uploaded experiences are part of this build, drop the live-insert log
+    clear_delta(storage_dir)
+
+    save_manifest(storage_dir, {
+        "drive": drive,
+        "sources": {
+            path: source_entry(path, [doc.id_ for doc in docs])
+            for path, docs in documents_by_source.items()
+        },
+        "web": {url: {"hash": text_hash(doc.text), "doc_ids": [url]} for url, doc in news_documents.items()},
+    })
 
     all_nodes = list(index.docstore.docs.values())
     for i, node in enumerate(all_nodes):
@@ -268,8 +265,118 @@ def build_index():
     return index
 
 
+def refresh_index(storage_dir=STORAGE_DIR):
+    """
+    Incremental refresh driven by lahn_index/manifest.json.
+
+    Only Drive files that changed are downloaded, only sources whose content
+    hash changed are re-parsed and re-embedded, and the nodes of removed
+    sources are deleted. Everything else keeps its nodes and embeddings.
+    Works on a fresh copy of the index loaded from storage, so the index
+    serving chat is untouched until the caller swaps in the returned one.
+    """
+    manifest = load_manifest(storage_dir)
+    if manifest is None or not index_ready(storage_dir):
+        print('No index manifest yet, running a full build...')
+        return build_index(storage_dir)
+
+    start = datetime.datetime.now()
+    index = load_index_from_storage(load_storage_context(storage_dir, copy=True))
+    load_bm25(index, storage_dir)
+    replay_delta(index, storage_dir)
+
+    print('Syncing Google Drive...')
+    manifest["drive"] = sync_drive_folder(DRIVE_FOLDER_ID, DATA_DIR, manifest)
+    convert_docx_to_txt_and_cleanup(DATA_DIR)
+    news_documents = load_news_documents()
+
+    changed, removed = diff_sources(manifest, DATA_DIR)
+    print(f"{len(changed)} new/changed and {len(removed)} removed sources.")
+
+    for path in removed + list(changed):
+        for doc_id in manifest["sources"].pop(path, {}).get("doc_ids", []):
+            delete_ref_doc(index, doc_id)
+
+    # news pages: compare the extracted text, a page that failed to fetch keeps its old nodes
+    web = manifest.setdefault("web", {})
+    links = set(load_news_links())
+    changed_news = {
+        url: doc for url, doc in news_documents.items()
+        if web.get(url, {}).get("hash") != text_hash(doc.text)
+    }
+    for url in [u for u in web if u not in links] + list(changed_news):
+        for doc_id in web.pop(url, {}).get("doc_ids", []):
+            delete_ref_doc(index, doc_id)
+    print(f"{len(changed_news)} new/changed news pages.")
+
+    to_parse = []
+    for path, digest in changed.items():
+        # experiences that were live-indexed already have their nodes under doc id == path
+        if index.docstore.get_ref_doc_info(path) is not None:
+            manifest["sources"][path] = source_entry(path, [path], digest)
+        else:
+            to_parse.append(path)
+
+    documents_by_source = load_source_documents(to_parse)
+    documents = [doc for docs in documents_by_source.values() for doc in docs]
+    documents += list(changed_news.values())
+    if documents:
+        print('Creating nodes...')
+        nodes = parse_nodes(documents)
+        index.insert_nodes(nodes)
+        get_bm25(index).add_nodes(nodes)
+    for path, docs in documents_by_source.items():
+        manifest["sources"][path] = source_entry(path, [doc.id_ for doc in docs], changed[path])
+    for url, doc in changed_news.items():
+        web[url] = {"hash": text_hash(doc.text), "doc_ids": [url]}
+
+    index.storage_context.persist(persist_dir=storage_dir)
+    get_bm25(index).persist(storage_dir)
+    clear_delta(storage_dir)
+    save_manifest(storage_dir, manifest)
+
+    print(f'Index refreshed in {(datetime.datetime.now() - start).total_seconds():.1f}s')
+    return index
+
+
+def index_ready(storage_dir=STORAGE_DIR):
+    return os.path.exists(storage_dir) and store_exists(storage_dir)
 
-def build_or_load_index(refresh=False):
+
+
+def new_storage_context(storage_dir=STORAGE_DIR):
+    # a full build writes to a staging database, persist() moves it over store.sqlite
+    stores = {}
+    if DOC_STORE == "sqlite":
+        os.makedirs(storage_dir, exist_ok=True)
+        staging = os.path.join(storage_dir, STORE_FILE + ".building")
+        if os.path.exists(staging):
+            os.remove(staging)
+        stores["docstore"], stores["index_store"] = sqlite_stores(SqliteKVStore(staging))
+    return StorageContext.from_defaults(vector_store=new_vector_store(), **stores)
+
+
+def load_storage_context(storage_dir=STORAGE_DIR, copy=False):
+    """
+    Vectors from the memory-mapped store (utils/vector_store.py), nodes and the
+    index struct from store.sqlite (utils/sqlite_store.py). With copy=True the
+    database is a staging copy, so a refresh can edit it while the served index
+    keeps reading the original until the refreshed one is persisted.
+    """
+    stores = {}
+    if DOC_STORE == "sqlite":
+        kvstore = SqliteKVStore.from_persist_dir(storage_dir)
+        if copy:
+            kvstore = kvstore.copy(os.path.join(storage_dir, STORE_FILE + ".refresh"))
+        stores["docstore"], stores["index_store"] = sqlite_stores(kvstore)
+    return StorageContext.from_defaults(persist_dir=storage_dir, vector_store=load_vector_store(storage_dir), **stores)
+
+
+def load_index(storage_dir=STORAGE_DIR):
+    return load_bm25(load_index_from_storage(load_storage_context(storage_dir)), storage_dir)
+
+
+def init_embed_model():
     # Settings.embed_model = AzureOpenAIEmbedding(
     #     model="text-embedding-3-large",
     #     deployment_name="text-embedding-3-large",
@@ -278,24 +385,27 @@ def build_or_load_index(refresh=False):
     #     api_version=AZURE_VERSION,
     # )
 
-    Settings.embed_model = HuggingFaceEmbedding("sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2") #(model_name="intfloat/multilingual-e5-base") #
+    # HuggingFaceEmbedding("sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2") or its ONNX int8 export, see EMBED_BACKEND
+    Settings.embed_model = get_embed_model() #(model_name="intfloat/multilingual-e5-base") #
 
     # GWDGEmbedding(
     #     api_key=API_KEY,
     #     api_base=API_BASE,
     #     model="e5-mistral-7b-instruct"
     # )
+    return Settings.embed_model
 
-    index_ready = (
-        os.path.exists(STORAGE_DIR)
-        and os.path.exists(os.path.join(STORAGE_DIR, "docstore.json"))
-        and os.path.exists(os.path.join(STORAGE_DIR, "index_store.json"))
-    )
 
-    if index_ready and not refresh:
+def build_or_load_index(refresh=False, embed_model=None):
+    # the server loads the embedder in parallel with other startup work and passes it in
+    if embed_model is None:
+        init_embed_model()
+    else:
+        Settings.embed_model = embed_model
+
+    if index_ready() and not refresh:
         print('Loading index from storage...')
-        storage_context = StorageContext.from_defaults(persist_dir=STORAGE_DIR)
-        return load_index_from_storage(storage_context)
+        return load_index(STORAGE_DIR)
 
     #Index needs to be built and loaded
     index = build_index()
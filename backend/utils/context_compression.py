@@ -0,0 +1,146 @@
+import os
+import re
+import time
+from typing import Any, List, Optional
+
+import numpy as np
+from pydantic import PrivateAttr
+
+from llama_index.core.postprocessor.types import BaseNodePostprocessor
+from llama_index.core.schema import NodeWithScore, QueryBundle, MetadataMode
+from llama_index.core.settings import Settings
+from llama_index.core.utils import get_tokenizer
+
+
+# === CONFIG ===
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "600"))    # retrieved text per synthesis prompt
+AVATAR_CONTEXT_TOKENS = int(os.getenv("AVATAR_CONTEXT_TOKENS", "300"))  # context in the avatar system message
+SCORE_MARGIN = float(os.getenv("SCORE_MARGIN", "0.15"))   # nodes more than this below the best one are dropped
+MIN_SENTENCE_SCORE = 0.1      # cosine; sentences below it are never worth their tokens
+DUPLICATE_SIMILARITY = 0.92   # a sentence this close to an already chosen one adds nothing
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\n+")
+
+
+def split_sentences(text):
+    return [s.strip() for s in _SENTENCE_END.split(text) if len(s.strip()) > 1]
+
+
+def count_tokens(text):
+    return len(get_tokenizer()(text))
+
+
+def _unit_rows(vectors):
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def select_sentences(sentences, sentence_vectors, query_vector, budget):
+    """
+    Indices of the sentences to keep, in their original order.
+
+    Sentences are ranked by cosine similarity to the query (one mat-vec) and
+    taken greedily until the token budget is spent, skipping near-duplicates
+    of sentences already taken. If no sentence reaches MIN_SENTENCE_SCORE
+    (short or cross-language queries), the best one that fits is still kept.
+    """
+    if not sentences:
+        return []
+    vectors = _unit_rows(sentence_vectors)
+    scores = vectors @ _unit_rows(query_vector)
+    chosen, used = [], 0
+    for i in np.argsort(-scores):
+        weak = scores[i] < MIN_SENTENCE_SCORE
+        if weak and chosen:
+            break
+        tokens = count_tokens(sentences[i])
+        if used + tokens > budget:
+            continue  # a shorter, less relevant sentence may still fit
+        if chosen and float(np.max(vectors[chosen] @ vectors[i])) >= DUPLICATE_SIMILARITY:
+            continue
+        chosen.append(int(i))
+        used += tokens
+        if weak:
+            break
+    return sorted(chosen)
+
+
+def compress_text(text, query, budget=AVATAR_CONTEXT_TOKENS, embed_model=None):
+    """The sentences of text most relevant to query, within budget tokens, in their original order."""
+    if count_tokens(text) <= budget:
+        return text
+    embed_model = embed_model or Settings.embed_model
+    sentences = split_sentences(text)
+    vectors = embed_model.get_text_embedding_batch(sentences)
+    keep = select_sentences(sentences, vectors, embed_model.get_query_embedding(query), budget)
+    return " ".join(sentences[i] for i in keep)
+
+
+class ContextCompressor(BaseNodePostprocessor):
+    """
+    Shrinks the retrieved nodes before they reach the synthesis prompt.
+
+    All sentences of the retrieved nodes are embedded in one batch and scored
+    against the query embedding the retriever already computed. A node's score
+    is its best sentence; nodes more than SCORE_MARGIN below the best node are
+    dropped (adaptive cutoff instead of a fixed top-k), then the most relevant
+    sentences of the rest are kept up to token_budget. Each node comes back
+    holding only its chosen sentences.
+    """
+
+    token_budget: int = CONTEXT_TOKEN_BUDGET
+    score_margin: float = SCORE_MARGIN
+    _embed_model: Any = PrivateAttr()
+
+    def __init__(self, embed_model=None, **kwargs):
+        super().__init__(**kwargs)
+        self._embed_model = embed_model
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "ContextCompressor"
+
+    def _postprocess_nodes(
+        self, nodes: List[NodeWithScore], query_bundle: Optional[QueryBundle] = None
+    ) -> List[NodeWithScore]:
+        if not nodes or query_bundle is None:
+            return nodes
+        start = time.perf_counter()
+        embed_model = self._embed_model or Settings.embed_model
+        query_vector = query_bundle.embedding or embed_model.get_agg_embedding_from_queries(query_bundle.embedding_strs)
+
+        sentences, owners = [], []
+        for n, node in enumerate(nodes):
+            for sentence in split_sentences(node.node.get_content(metadata_mode=MetadataMode.NONE)):
+                sentences.append(sentence)
+                owners.append(n)
+        if not sentences:
+            return nodes
+        vectors = np.asarray(embed_model.get_text_embedding_batch(sentences), dtype=np.float32)
+        scores = _unit_rows(vectors) @ _unit_rows(query_vector)
+        owners = np.asarray(owners)
+
+        node_scores = np.full(len(nodes), -1.0, dtype=np.float32)
+        np.maximum.at(node_scores, owners, scores)
+        kept_nodes = node_scores >= node_scores.max() - self.score_margin
+        candidates = [i for i in range(len(sentences)) if kept_nodes[owners[i]]]
+        keep = select_sentences([sentences[i] for i in candidates], vectors[candidates], query_vector, self.token_budget)
+        keep = [candidates[i] for i in keep]
+
+        result = []
+        for n, node in enumerate(nodes):
+            chosen = [sentences[i] for i in keep if owners[i] == n]
+            if not chosen:
+                continue
+            compressed = node.node.model_copy()
+            compressed.set_content(" ".join(chosen))
+            result.append(NodeWithScore(node=compressed, score=float(node_scores[n])))
+        result.sort(key=lambda n: n.score, reverse=True)
+
+        before = sum(count_tokens(n.node.get_content(metadata_mode=MetadataMode.NONE)) for n in nodes)
+        after = sum(count_tokens(n.node.get_content(metadata_mode=MetadataMode.NONE)) for n in result)
+        print(f"Context compressed: {len(nodes)} -> {len(result)} nodes, {before} -> {after} tokens "
+              f"in {(time.perf_counter() - start) * 1000:.0f} ms")
+        return result
@@ -0,0 +1,121 @@
+import os
+import json
+import time
+import fcntl
+import threading
+
+
+# === CONFIG ===
+# keep in sync with the topic list in frontend/src/App.jsx
+DEBATE_TOPICS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "prompts", "debate_topics.txt")
+OPENER_TEMPLATE = "Let's talk about {topic}"   # what App.jsx sends when a debate starts
+OPENERS_FILE = "openers.json"                   # stored in the index version directory
+
+
+def load_topics(path=DEBATE_TOPICS_FILE):
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+class DebateOpeners:
+    """
+    Precomputed replies to the debate openers ("Let's talk about <topic>").
+
+    For each topic, build() runs generate(opener) once, which returns the
+    retrieved context pack and the avatar's opening reply, and writes them
+    to openers.json in an index version directory, together with the
+    versions they were made from (index version, prompt hashes, model).
+    lookup() only returns an entry made from the current versions, so an
+    index swap or a prompt edit makes the old replies fall back to the full
+    pipeline until build() has run again.
+    """
+
+    def __init__(self, topics=None):
+        self.topics = topics if topics is not None else load_topics()
+        self.entries = {}
+        self.path = None
+        self.stamp = None
+        self.lock = threading.Lock()
+
+    def openers(self):
+        return [OPENER_TEMPLATE.format(topic=topic) for topic in self.topics]
+
+    def load(self, storage_dir):
+        """Serve the openers stored with the index in storage_dir (if any)."""
+        path = os.path.join(storage_dir, OPENERS_FILE)
+        with self.lock:
+            self.path = path
+            self._read()
+
+    @staticmethod
+    def _stamp(path):
+        # inode too: after an index swap the path is a different file that may share the mtime
+        stat = os.stat(path)
+        return stat.st_ino, stat.st_mtime
+
+    def _read(self):
+        try:
+            stamp = self._stamp(self.path)
+            with open(self.path, encoding="utf-8") as f:
+                self.entries = json.load(f)
+            self.stamp = stamp
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.entries, self.stamp = {}, None
+
+    def _refresh(self):
+        # another worker may have rebuilt the file, or the index swap put a new one behind the path
+        try:
+            if self._stamp(self.path) != self.stamp:
+                self._read()
+        except FileNotFoundError:
+            self.entries, self.stamp = {}, None
+
+    def lookup(self, prompt, versions):
+        with self.lock:
+            if self.path is None:
+                return None
+            self._refresh()
+            entry = self.entries.get(prompt.strip())
+        if entry is None or entry["versions"] != versions:
+            return None
+        return entry
+
+    def stale(self, versions):
+        with self.lock:
+            if self.path is not None:
+                self._refresh()
+            entries = dict(self.entries)
+        return any(
+            opener not in entries or entries[opener]["versions"] != versions
+            for opener in self.openers()
+        )
+
+    def build(self, storage_dir, generate, versions):
+        """
+        Generate every opener for the index in storage_dir and write openers.json.
+        Skipped (returns False) while another worker process is building them.
+        """
+        path = os.path.join(storage_dir, OPENERS_FILE)
+        lock_file = open(path + ".lock", "w")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return False
+        try:
+            start = time.perf_counter()
+            entries = {}
+            for opener in self.openers():
+                context, reply = generate(opener)
+                entries[opener] = {"context": context, "reply": reply, "versions": versions, "created_at": time.time()}
+            tmp = path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(entries, f, ensure_ascii=False, indent=2)
+            os.replace(tmp, path)
+            print(f"💬 Precomputed {len(entries)} debate openers in {time.perf_counter() - start:.1f}s")
+        finally:
+            lock_file.close()
+        with self.lock:
+            if self.path is not None:
+                self._read()
+        return True
@@ -0,0 +1,170 @@
+import os
+import hashlib
+from typing import Any, List
+
+import numpy as np
+from pydantic import PrivateAttr
+
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.node_parser import SemanticSplitterNodeParser
+from llama_index.core.node_parser.node_utils import build_nodes_from_splits
+from llama_index.core.schema import MetadataMode
+
+
+# === CONFIG ===
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "256"))
+# "derive": node embedding = length-weighted mean of the sentence embeddings the
+#           splitter already computed (no second pass over the text)
+# "embed":  embed every node's text again (exact, but ~2x the embedding work)
+NODE_EMBEDDINGS = os.getenv("NODE_EMBEDDINGS", "derive")
+
+
+class CachedEmbedding(BaseEmbedding):
+    """
+    Wraps an embedding model with an in-memory text -> vector cache and counters.
+
+    Shared by the splitter and the index during one build, so a text that is
+    embedded twice (duplicate chunks, unchanged sentences of an edited
+    document, ...) is only computed once. `computed` and `cache_hits` are what
+    the build benchmark reports.
+    """
+
+    computed: int = 0
+    cache_hits: int = 0
+    _inner: Any = PrivateAttr()
+    _cache: dict = PrivateAttr(default_factory=dict)
+    _use_cache: bool = PrivateAttr(default=True)
+
+    def __init__(self, inner, use_cache=True, embed_batch_size=EMBED_BATCH_SIZE, **kwargs):
+        super().__init__(model_name=getattr(inner, "model_name", "cached"), embed_batch_size=embed_batch_size, **kwargs)
+        self._inner = inner
+        self._use_cache = use_cache
+        if hasattr(inner, "embed_batch_size"):
+            inner.embed_batch_size = max(inner.embed_batch_size, embed_batch_size)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CachedEmbedding"
+
+    def _key(self, text):
+        return hashlib.sha1(text.encode("utf-8")).digest()
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self._inner.get_query_embedding(query)
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return await self._inner.aget_query_embedding(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._get_text_embeddings([text])[0]
+
+    async def _aget_text_embedding(self, text: str) -> List[float]:
+        return self._get_text_embedding(text)
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        if not self._use_cache:
+            self.computed += len(texts)
+            return self._inner._get_text_embeddings(texts)
+
+        keys = [self._key(t) for t in texts]
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in self._cache:
+                missing.setdefault(key, text)
+        if missing:
+            vectors = self._inner._get_text_embeddings(list(missing.values()))
+            self._cache.update(zip(missing.keys(), vectors))
+            self.computed += len(missing)
+        self.cache_hits += len(texts) - len(missing)
+        return [self._cache[key] for key in keys]
+
+
+class CachingSemanticSplitter(SemanticSplitterNodeParser):
+    """
+    SemanticSplitterNodeParser that keeps the sentence-group embeddings it
+    computes to find breakpoints, and (with derive_node_embeddings) turns them
+    into each node's embedding instead of throwing them away.
+    """
+
+    derive_node_embeddings: bool = True
+
+    def build_semantic_nodes_from_documents(self, documents, show_progress=False):
+        all_nodes = []
+        for doc in documents:
+            text_splits = [split for split in self.sentence_splitter(doc.text) if split.strip()]
+            if not text_splits:
+                continue  # empty document: no nodes, like SemanticSplitterNodeParser
+            sentences = self._build_sentence_groups(text_splits)
+            embeddings = self.embed_model.get_text_embedding_batch(
+                [s["combined_sentence"] for s in sentences], show_progress=show_progress
+            )
+            for sentence, embedding in zip(sentences, embeddings):
+                sentence["combined_sentence_embedding"] = embedding
+
+            distances = self._calculate_distances_between_sentence_groups(sentences)
+            groups = self._build_node_groups(sentences, distances)
+            chunks = ["".join(s["sentence"] for s in group) for group in groups]
+            nodes = build_nodes_from_splits(chunks, doc, id_func=self.id_func)
+
+            if self.derive_node_embeddings:
+                for node, group in zip(nodes, groups):
+                    node.embedding = _weighted_mean(group)
+            all_nodes.extend(nodes)
+        return all_nodes
+
+    def _build_node_groups(self, sentences, distances):
+        # Same breakpoints as SemanticSplitterNodeParser._build_node_chunks, but
+        # returns the sentence groups instead of the joined text.
+        if not distances:
+            return [sentences]
+        threshold = np.percentile(distances, self.breakpoint_percentile_threshold)
+        groups, start = [], 0
+        for i, distance in enumerate(distances):
+            if distance > threshold:
+                groups.append(sentences[start: i + 1])
+                start = i + 1
+        if start < len(sentences):
+            groups.append(sentences[start:])
+        return groups
+
+
+def _weighted_mean(group):
+    vectors = np.asarray([s["combined_sentence_embedding"] for s in group], dtype=np.float32)
+    weights = np.asarray([max(len(s["sentence"].split()), 1) for s in group], dtype=np.float32)
+    mean = weights @ vectors / weights.sum()
+    norm = np.linalg.norm(mean)
+    return (mean / norm if norm else mean).tolist()
+
+
+def embed_nodes(nodes, embed_model, batch_size=EMBED_BATCH_SIZE):
+    """Embed the nodes that don't have an embedding yet, in large batches, the same way VectorStoreIndex would."""
+    todo = [node for node in nodes if node.embedding is None]
+    if not todo:
+        return nodes
+    texts = [node.get_content(metadata_mode=MetadataMode.EMBED) for node in todo]
+    for start in range(0, len(texts), batch_size):
+        vectors = embed_model.get_text_embedding_batch(texts[start: start + batch_size])
+        for node, vector in zip(todo[start: start + batch_size], vectors):
+            node.embedding = vector
+    return nodes
+
+
+def split_and_embed(documents, embed_model, derive=None, use_cache=True):
+    """
+    Semantic split + node embeddings with a single embedding model instance.
+
+    Returns (nodes, cached_model); every node comes back with an embedding, so
+    VectorStoreIndex(nodes) / index.insert_nodes(nodes) do no embedding work.
+    """
+    derive = NODE_EMBEDDINGS == "derive" if derive is None else derive
+    cached = embed_model if isinstance(embed_model, CachedEmbedding) else CachedEmbedding(embed_model, use_cache=use_cache)
+    parser = CachingSemanticSplitter(
+        embed_model=cached, derive_node_embeddings=derive,
+        buffer_size=1, breakpoint_percentile_threshold=95,
+    )
+    nodes = parser.get_nodes_from_documents(documents)
+    for node in nodes:
+        # Fix common formatting issue: remove excessive line breaks
+        node.text = " ".join(node.text.split())
+    embed_nodes(nodes, cached)
+    return nodes, cached
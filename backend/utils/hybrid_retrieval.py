@@ -0,0 +1,206 @@
+import os
+import re
+import json
+import math
+import threading
+from collections import Counter, defaultdict
+
+from llama_index.core.retrievers import BaseRetriever
+from llama_index.core.schema import NodeWithScore, MetadataMode
+
+
+# === CONFIG ===
+BM25_FILE = "bm25.json"
+HYBRID_TOP_K = int(os.getenv("HYBRID_TOP_K", "5"))            # nodes handed to synthesis
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))  # per retriever, before fusion
+RRF_K = 60   # reciprocal rank fusion constant; rank 1 scores 1/61, rank 20 1/80
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# Function words only; place names, species and units must stay searchable
+STOPWORDS = set("""
+der die das den dem des ein eine einer eines einem einen und oder aber in im an am auf aus bei mit
+nach von vom zu zum zur für über unter vor hinter neben zwischen durch gegen ohne um ist sind war
+waren wird werden wurde wurden hat haben hatte sein es er sie wir ihr ich du man sich nicht auch
+als wie so noch nur schon sehr mehr dass wenn was wer wo welche welcher welches dieser diese dieses
+the a an and or but of in on at to for from by with as is are was were be been it its this that
+these those what which who how not no do does did can will would should there their they you we
+""".split())
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text):
+    return [t for t in _TOKEN.findall(text.lower()) if len(t) > 1 and t not in STOPWORDS]
+
+
+class BM25Index:
+    """
+    BM25 inverted index over the index's nodes: term -> {node_id: term frequency}.
+
+    Built once with the vector index and kept up to date with add_nodes /
+    delete_nodes, so a query only reads the posting lists of its own terms.
+    Persisted as bm25.json next to the vector store; nodes live-inserted after
+    that are added from the docstore by load_bm25 on the next load.
+    """
+
+    def __init__(self, postings=None, doc_len=None):
+        self.postings = defaultdict(dict, postings or {})
+        self.doc_len = doc_len or {}
+        self.total_len = sum(self.doc_len.values())
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_persist_dir(cls, persist_dir):
+        path = os.path.join(persist_dir, BM25_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["postings"], data["doc_len"])
+
+    @classmethod
+    def from_nodes(cls, nodes):
+        bm25 = cls()
+        bm25.add_nodes(nodes)
+        return bm25
+
+    def persist(self, persist_dir):
+        path = os.path.join(persist_dir, BM25_FILE)
+        tmp = f"{path}.{os.getpid()}.tmp"   # worker processes may persist the same file at once
+        with self.lock:
+            data = {"postings": self.postings, "doc_len": self.doc_len}
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def __len__(self):
+        return len(self.doc_len)
+
+    def add_nodes(self, nodes):
+        counted = [(node.node_id, Counter(tokenize(node.get_content(metadata_mode=MetadataMode.NONE)))) for node in nodes]
+        with self.lock:
+            self._remove({node_id for node_id, _ in counted if node_id in self.doc_len})
+            for node_id, counts in counted:
+                for term, tf in counts.items():
+                    self.postings[term][node_id] = tf
+                self.doc_len[node_id] = sum(counts.values())
+                self.total_len += self.doc_len[node_id]
+
+    def delete_nodes(self, node_ids):
+        with self.lock:
+            self._remove({node_id for node_id in node_ids if node_id in self.doc_len})
+
+    def _remove(self, node_ids):
+        if not node_ids:
+            return
+        # a node's terms aren't stored separately, so deletes are one pass over the postings
+        for term in list(self.postings):
+            posting = self.postings[term]
+            for node_id in node_ids.intersection(posting):
+                del posting[node_id]
+            if not posting:
+                del self.postings[term]
+        for node_id in node_ids:
+            self.total_len -= self.doc_len.pop(node_id)
+
+    def search(self, query, top_k):
+        """[(node_id, score)] best first."""
+        terms = set(tokenize(query))
+        with self.lock:
+            n = len(self.doc_len)
+            if not n or not terms:
+                return []
+            avg_len = self.total_len / n
+            scores = defaultdict(float)
+            for term in terms:
+                posting = self.postings.get(term)
+                if not posting:
+                    continue
+                idf = math.log(1 + (n - len(posting) + 0.5) / (len(posting) + 0.5))
+                for node_id, tf in posting.items():
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_len[node_id] / avg_len)
+                    scores[node_id] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+
+
+def attach_bm25(index, bm25):
+    """The BM25 index travels with the VectorStoreIndex it mirrors, so swapping the index swaps both."""
+    index.bm25 = bm25
+    return index
+
+
+def get_bm25(index):
+    return getattr(index, "bm25", None)
+
+
+def load_bm25(index, persist_dir):
+    """
+    bm25.json brought up to date with the index's nodes.
+
+    Live inserts reach the index struct but not bm25.json, so only the nodes
+    it is missing are read from the docstore (and nodes it has that the index
+    no longer does are dropped); the result is persisted, so the next load has
+    nothing to do. Without a bm25.json it is built from the docstore once.
+    """
+    bm25 = BM25Index.from_persist_dir(persist_dir)
+    node_ids = set(index.index_struct.nodes_dict.values())
+    if bm25 is None:
+        print('Building BM25 index from the docstore...')
+        bm25 = BM25Index.from_nodes(index.docstore.get_nodes(list(node_ids)))
+        bm25.persist(persist_dir)
+        return attach_bm25(index, bm25)
+
+    missing = node_ids - set(bm25.doc_len)
+    extra = set(bm25.doc_len) - node_ids
+    if missing or extra:
+        print(f'Updating BM25 index: {len(missing)} nodes added, {len(extra)} removed')
+        bm25.delete_nodes(extra)
+        bm25.add_nodes(index.docstore.get_nodes(list(missing)))
+        bm25.persist(persist_dir)
+    return attach_bm25(index, bm25)
+
+
+def delete_ref_doc(index, ref_doc_id):
+    """index.delete_ref_doc that also drops the document's nodes from the BM25 index."""
+    info = index.docstore.get_ref_doc_info(ref_doc_id)
+    bm25 = get_bm25(index)
+    if info is not None and bm25 is not None:
+        bm25.delete_nodes(info.node_ids)
+    index.delete_ref_doc(ref_doc_id, delete_from_docstore=True)
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Vector + BM25 retrieval fused with reciprocal rank fusion.
+
+    Both retrievers return `candidates` nodes; a node's fused score is the sum
+    of 1 / (RRF_K + rank) over the lists it appears in, and the best top_k are
+    returned. Exact names (places, species, measurement terms) that MiniLM
+    misses are picked up by BM25, so top_k can be smaller than for vectors alone.
+    """
+
+    def __init__(self, index, top_k=HYBRID_TOP_K, candidates=HYBRID_CANDIDATES, **kwargs):
+        super().__init__(**kwargs)
+        self.index = index
+        self.top_k = top_k
+        self.vector_retriever = index.as_retriever(similarity_top_k=candidates)
+        self.candidates = candidates
+
+    def _retrieve(self, query_bundle):
+        vector_hits = self.vector_retriever.retrieve(query_bundle)
+        bm25 = get_bm25(self.index)
+        lexical_hits = bm25.search(query_bundle.query_str, self.candidates) if bm25 is not None else []
+
+        fused = defaultdict(float)
+        for rank, hit in enumerate(vector_hits, start=1):
+            fused[hit.node.node_id] += 1 / (RRF_K + rank)
+        for rank, (node_id, _) in enumerate(lexical_hits, start=1):
+            fused[node_id] += 1 / (RRF_K + rank)
+        best = sorted(fused, key=fused.get, reverse=True)[:self.top_k]
+
+        nodes = {hit.node.node_id: hit.node for hit in vector_hits}
+        missing = [node_id for node_id in best if node_id not in nodes]
+        if missing:
+            nodes.update((node.node_id, node) for node in self.index.docstore.get_nodes(missing, raise_error=False))
+        return [NodeWithScore(node=nodes[node_id], score=fused[node_id]) for node_id in best if node_id in nodes]
@@ -0,0 +1,248 @@
+import os
+import time
+import uuid
+import fcntl
+import shutil
+import datetime
+import threading
+
+from .sqlite_store import STORE_FILE, SqliteKVStore
+from .live_index import DELTA_FILE
+
+
+# === CONFIG ===
+INDEX_VERSIONS_DIR = os.getenv("INDEX_VERSIONS_DIR", "./lahn_index_versions")
+INDEX_KEEP_VERSIONS = int(os.getenv("INDEX_KEEP_VERSIONS", "3"))   # previous versions kept for rollback
+VALIDATION_QUERY = "Lahn"
+STAGING_SUFFIXES = (".tmp", ".building", ".refresh", ".lock")
+REFRESH_LOCK_FILE = ".refresh.lock"
+
+
+class IndexVersions:
+    """
+    Versioned index directories behind the lahn_index path.
+
+    lahn_index is a symlink to lahn_index_versions/<version>. A refresh
+    writes a new version directory and activate() re-points the link with one
+    rename, so whoever opens lahn_index sees either the old or the new index,
+    never a half-written one; the previous versions stay for rollback.
+    """
+
+    def __init__(self, link, root=INDEX_VERSIONS_DIR, keep=INDEX_KEEP_VERSIONS):
+        self.link = link.rstrip("/")
+        self.root = root
+        self.keep = keep
+
+    def ensure_layout(self):
+        """Turn a plain lahn_index directory (or none) into the first version."""
+        os.makedirs(self.root, exist_ok=True)
+        if os.path.islink(self.link):
+            return
+        version = self._new_name()
+        if os.path.isdir(self.link):
+            print(f'Moving {self.link} to {self.path(version)}...')
+            shutil.move(self.link, self.path(version))
+        else:
+            os.makedirs(self.path(version))
+        self.activate(version)
+
+    def path(self, version):
+        return os.path.join(self.root, version)
+
+    def current(self):
+        return os.path.basename(os.readlink(self.link)) if os.path.islink(self.link) else None
+
+    def versions(self):
+        return sorted(v for v in os.listdir(self.root) if os.path.isdir(self.path(v)))
+
+    def _new_name(self):
+        name = "v" + datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        suffix = 1
+        while os.path.exists(self.path(name if suffix == 1 else f"{name}-{suffix}")):
+            suffix += 1
+        return name if suffix == 1 else f"{name}-{suffix}"
+
+    def create(self, copy_current=True):
+        """New version directory, optionally starting from the current version's files."""
+        version = self._new_name()
+        target = self.path(version)
+        os.makedirs(target)
+        current = self.current()
+        if copy_current and current:
+            source = self.path(current)
+            for name in os.listdir(source):
+                src, dst = os.path.join(source, name), os.path.join(target, name)
+                if name.endswith(STAGING_SUFFIXES) or not os.path.isfile(src):
+                    continue
+                if name == STORE_FILE:
+                    # consistent snapshot even while live inserts write to it
+                    SqliteKVStore(src).copy(dst)
+                elif name == DELTA_FILE:
+                    shutil.copy2(src, dst)  # appended to in place
+                else:
+                    # everything else is only ever replaced whole (tmp + rename), so sharing the inode is safe
+                    try:
+                        os.link(src, dst)
+                    except OSError:
+                        shutil.copy2(src, dst)
+        return version
+
+    def activate(self, version):
+        tmp_link = f"{self.link}.{uuid.uuid4().hex}.tmp"
+        os.symlink(os.path.relpath(self.path(version), os.path.dirname(os.path.abspath(self.link))), tmp_link)
+        os.replace(tmp_link, self.link)
+
+    def discard(self, version):
+        if version != self.current():
+            shutil.rmtree(self.path(version), ignore_errors=True)
+
+    def prune(self):
+        current = self.current()
+        older = [v for v in self.versions() if v != current]
+        for version in older[:max(len(older) - self.keep, 0)]:
+            self.discard(version)
+
+    def previous(self):
+        versions = self.versions()
+        current = self.current()
+        if current not in versions:
+            return None
+        i = versions.index(current)
+        return versions[i - 1] if i > 0 else None
+
+
+def validate_index(index):
+    """Raises if a freshly built index is not fit to serve."""
+    node_ids = index.index_struct.nodes_dict
+    if not node_ids:
+        raise ValueError("index has no nodes")
+    if not index.as_retriever(similarity_top_k=1).retrieve(VALIDATION_QUERY):
+        raise ValueError(f"probe query {VALIDATION_QUERY!r} returned no nodes")
+    bm25 = getattr(index, "bm25", None)
+    if bm25 is not None and len(bm25) != len(node_ids):
+        raise ValueError(f"BM25 index has {len(bm25)} nodes, vector index {len(node_ids)}")
+
+
+class IndexRefresher:
+    """
+    Runs index refreshes as background jobs.
+
+    A job creates a new version (a copy of the current one for an incremental
+    refresh, empty for a full build), runs refresh_index/build_index on it,
+    loads it back the way the server would, validates it, re-points the
+    lahn_index link and hands the loaded index to on_ready, which swaps the
+    query engine. Chat keeps using the old index until then. One job at a
+    time, across worker processes too (a lock file in the versions dir); a
+    failed job leaves the current version untouched. on_update gets a copy
+    of the job dict after every step, for workers that did not run it;
+    prepare(index, path) runs on the validated version before it goes live,
+    for anything that should ship with it.
+    """
+
+    def __init__(self, versions, build_index, refresh_index, load_index, on_ready, on_update=None, prepare=None):
+        self.versions = versions
+        self.build_index = build_index
+        self.refresh_index = refresh_index
+        self.load_index = load_index
+        self.on_ready = on_ready
+        self.on_update = on_update
+        self.prepare = prepare
+        self.jobs = {}
+        self.running = None
+        self.lock = threading.Lock()
+
+    def start(self, full=False):
+        """Start a refresh, or return the one already running. Returns the job id."""
+        with self.lock:
+            if self.running is not None:
+                return self.running
+            job_id = uuid.uuid4().hex
+            self.jobs[job_id] = {
+                "id": job_id,
+                "status": "running",
+                "step": "queued",
+                "full": full,
+                "from_version": self.versions.current(),
+                "started_at": time.time(),
+            }
+            self.running = job_id
+        threading.Thread(target=self._run, args=(job_id,), name="index-refresh", daemon=True).start()
+        return job_id
+
+    def _process_lock(self):
+        f = open(os.path.join(self.versions.root, REFRESH_LOCK_FILE), "w")
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            f.close()
+            raise RuntimeError("A refresh is running in another worker.")
+        return f
+
+    def status(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+
+    def _step(self, job_id, step, **fields):
+        print(f"Index refresh {job_id[:8]}: {step}")
+        with self.lock:
+            self.jobs[job_id].update(step=step, **fields)
+            job = dict(self.jobs[job_id])
+        if self.on_update is not None:
+            self.on_update(job)
+
+    def _run(self, job_id):
+        job = self.jobs[job_id]
+        version = None
+        lock_file = None
+        try:
+            lock_file = self._process_lock()
+            self._step(job_id, "copying current version" if not job["full"] else "creating version")
+            version = self.versions.create(copy_current=not job["full"])
+            path = self.versions.path(version)
+            self._step(job_id, "building" if job["full"] else "refreshing", version=version)
+            if job["full"]:
+                self.build_index(path)
+            else:
+                self.refresh_index(path)
+
+            self._step(job_id, "validating")
+            index = self.load_index(path)
+            validate_index(index)
+
+            if self.prepare is not None:
+                self._step(job_id, "preparing")
+                self.prepare(index, path)
+
+            self._step(job_id, "activating", nodes=len(index.index_struct.nodes_dict))
+            self.versions.activate(version)
+            self.on_ready(index)
+            self.versions.prune()
+            self._step(job_id, "done", status="done", finished_at=time.time())
+        except Exception as e:
+            print(f"❌ Index refresh failed: {e}")
+            if version is not None:
+                self.versions.discard(version)
+            self._step(job_id, "failed", status="failed", error=str(e), finished_at=time.time())
+        finally:
+            if lock_file is not None:
+                lock_file.close()   # releases the flock
+            with self.lock:
+                self.running = None
+
+    def rollback(self, version=None):
+        """Serve an earlier version again (the previous one by default). Returns its name."""
+        with self.lock:
+            if self.running is not None:
+                raise RuntimeError("A refresh is running.")
+            version = version or self.versions.previous()
+            if version is None or version not in self.versions.versions():
+                raise ValueError("No such index version.")
+            lock_file = self._process_lock()
+            try:
+                index = self.load_index(self.versions.path(version))
+                self.versions.activate(version)
+                self.on_ready(index)
+            finally:
+                lock_file.close()
+        return version
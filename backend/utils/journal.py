@@ -0,0 +1,143 @@
+import os
+import gzip
+import json
+import time
+import queue
+import atexit
+import shutil
+import datetime
+import threading
+
+
+# === CONFIG ===
+JOURNAL_DIR = os.getenv("JOURNAL_DIR", "./chat_logs/journal")
+JOURNAL_ENABLED = os.getenv("JOURNAL_ENABLED", "1") == "1"
+JOURNAL_QUEUE_SIZE = 10000          # records waiting for the writer; beyond that they are dropped
+JOURNAL_BATCH = 200                 # records per write
+JOURNAL_FLUSH_INTERVAL = 1.0        # seconds a record may wait for its batch to fill
+JOURNAL_ROTATE_BYTES = int(os.getenv("JOURNAL_ROTATE_BYTES", str(32 * 1024 * 1024)))
+JOURNAL_ROTATE_SECONDS = int(os.getenv("JOURNAL_ROTATE_SECONDS", "86400"))
+
+
+def read_journal(path):
+    """Records of one journal file, compressed (.jsonl.gz) or still open (.jsonl)."""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue  # torn last line of a file that was still being written
+
+
+def journal_files(path):
+    """The journal files under path (or path itself), oldest first."""
+    if os.path.isfile(path):
+        return [path]
+    names = [n for n in os.listdir(path) if n.endswith((".jsonl", ".jsonl.gz"))]
+    return [os.path.join(path, n) for n in sorted(names)]
+
+
+class Journal:
+    """
+    Append-only JSONL record of every chat turn, for replay and capacity planning.
+
+    record() only puts the record on a bounded queue and never blocks; if
+    the writer falls behind, records are dropped and counted instead. One
+    writer thread writes them in batches to journal-<start>-<pid>.jsonl
+    (one file per worker process, so workers never share a file), starts a new file by
+    size or age and gzips the finished one.
+    """
+
+    def __init__(self, directory=JOURNAL_DIR, enabled=JOURNAL_ENABLED):
+        self.directory = directory
+        self.enabled = enabled
+        self.pending = queue.Queue(maxsize=JOURNAL_QUEUE_SIZE)
+        self.stats = {"written": 0, "dropped": 0, "files": 0}
+        self.file = None
+        self.path = None
+        self.opened_at = 0.0
+        self.lock = threading.Lock()   # the writer thread vs. the drain at exit
+
+    def start(self):
+        if not self.enabled:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        threading.Thread(target=self._writer, name="journal-writer", daemon=True).start()
+        atexit.register(self._drain)
+
+    def record(self, **fields):
+        if not self.enabled:
+            return
+        fields.setdefault("ts", time.time())
+        try:
+            self.pending.put_nowait(fields)
+        except queue.Full:
+            self.stats["dropped"] += 1
+
+    def _writer(self):
+        while True:
+            batch = [self.pending.get()]
+            deadline = time.monotonic() + JOURNAL_FLUSH_INTERVAL
+            while len(batch) < JOURNAL_BATCH:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.pending.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self._write(batch)
+            except Exception as e:
+                print(f"❌ Journal write failed: {e}")
+
+    def _write(self, batch):
+        with self.lock:
+            if self.file is None or self._should_rotate():
+                self._rotate()
+            self.file.write("".join(json.dumps(r, ensure_ascii=False, separators=(",", ":")) + "\n" for r in batch))
+            self.file.flush()
+            self.stats["written"] += len(batch)
+
+    def _should_rotate(self):
+        return self.file.tell() >= JOURNAL_ROTATE_BYTES or time.time() - self.opened_at >= JOURNAL_ROTATE_SECONDS
+
+    def _rotate(self):
+        finished = self.path
+        if self.file is not None:
+            self.file.close()
+        stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        self.path = os.path.join(self.directory, f"journal-{stamp}-{os.getpid()}-{self.stats['files']}.jsonl")
+        self.file = open(self.path, "a", encoding="utf-8")
+        self.opened_at = time.time()
+        self.stats["files"] += 1
+        if finished is not None:
+            self._compress(finished)
+
+    @staticmethod
+    def _compress(path):
+        with open(path, "rb") as src, gzip.open(path + ".gz", "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(path)
+
+    def _drain(self):
+        # on exit: whatever is still queued goes to the current file
+        batch = []
+        while True:
+            try:
+                batch.append(self.pending.get_nowait())
+            except queue.Empty:
+                break
+        if batch:
+            self._write(batch)
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+    def metrics(self):
+        return {**self.stats, "queued": self.pending.qsize(), "file": self.path}
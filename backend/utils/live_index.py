@@ -0,0 +1,194 @@
+import os
+import json
+import fcntl
+import queue
+import threading
+import time
+
+from llama_index.core.schema import Document as LlamaDocument, TextNode
+from llama_index.core.node_parser import SentenceSplitter
+from llama_index.core.settings import Settings
+from llama_index.core.vector_stores.simple import SimpleVectorStore, SimpleVectorStoreData
+
+from .hybrid_retrieval import get_bm25
+
+
+# Nodes inserted since the last full persist, one JSON line per node (with its
+# embedding). Replayed on load, dropped by the next full build.
+DELTA_FILE = "experience_delta.jsonl"
+
+
+def _delta_path(storage_dir):
+    return os.path.join(storage_dir, DELTA_FILE)
+
+
+def insert_nodes_live(index, nodes):
+    """
+    Insert already-embedded nodes into a live VectorStoreIndex.
+
+    Mirrors VectorStoreIndex.insert_nodes, except that for the simple vector
+    store the new vectors are staged on copies of its dicts and swapped in with
+    a single assignment: queries iterate embedding_dict without a lock, so it
+    must never change size underneath them.
+    """
+    store = index.vector_store
+    if isinstance(store, SimpleVectorStore):
+        data = store.data
+        staged = SimpleVectorStore(data=SimpleVectorStoreData(
+            embedding_dict=dict(data.embedding_dict),
+            text_id_to_ref_doc_id=dict(data.text_id_to_ref_doc_id),
+            metadata_dict=dict(data.metadata_dict),
+        ))
+        staged.add(nodes)
+        store.data = staged.data
+    else:
+        store.add(nodes)
+
+    for node in nodes:
+        stripped = node.model_copy()
+        stripped.embedding = None
+        index.index_struct.add_node(stripped, text_id=node.node_id)
+        index.docstore.add_documents([stripped], allow_update=True)
+    index.storage_context.index_store.add_index_struct(index.index_struct)
+
+    bm25 = get_bm25(index)
+    if bm25 is not None:
+        bm25.add_nodes(nodes)
+
+
+def _vector_ids(index):
+    store = index.vector_store
+    if isinstance(store, SimpleVectorStore):
+        return set(store.data.embedding_dict)
+    return store.node_ids()
+
+
+def replay_delta(index, storage_dir):
+    """Re-insert the nodes appended since the last full persist. Returns the indexed sources."""
+    path = _delta_path(storage_dir)
+    sources = set()
+    if not os.path.exists(path):
+        return sources
+
+    present = _vector_ids(index)
+    nodes = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # torn last line from a crash; that upload gets re-indexed on its next submit
+            sources.add(entry["source"])
+            node = TextNode.from_dict(entry["node"])
+            # checked against the vectors, not the docstore or index struct: those
+            # are in SQLite and already hold every live insert (this worker's
+            # before a restart, other workers' too), the vectors only this process's
+            if node.node_id not in present:
+                nodes.append(node)
+    if nodes:
+        insert_nodes_live(index, nodes)
+    print(f"Replayed {len(nodes)} live-indexed nodes from {path}")
+    return sources
+
+
+def clear_delta(storage_dir):
+    path = _delta_path(storage_dir)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+class LiveIndexer:
+    """
+    Adds visitor experiences to the running index as soon as they are written.
+
+    submit() just queues the file. A background thread chunks it with a plain
+    sentence splitter (no per-sentence embeddings), embeds the chunks in one
+    batch, inserts them into the live index and appends them to the delta file
+    in storage_dir, so nothing is lost on restart and no full persist is needed.
+    """
+
+    def __init__(self, get_index, storage_dir, chunk_size=200, chunk_overlap=32, on_indexed=None, start=True):
+        self.get_index = get_index
+        self.storage_dir = storage_dir
+        self.on_indexed = on_indexed
+        self.parser = SentenceSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        self.pending = queue.Queue()
+        self.indexed_sources = set()
+        self.lock = threading.Lock()
+        self.loaded = threading.Event()   # uploads wait until the server has loaded an index
+        if start:
+            self.start()
+
+    def start(self):
+        threading.Thread(target=self._worker, name="live-indexer", daemon=True).start()
+
+    def load(self, index):
+        """Call with a freshly loaded index to bring back earlier live inserts."""
+        with self.lock:
+            previous = self.indexed_sources
+            self.indexed_sources = replay_delta(index, self.storage_dir)
+        self.loaded.set()
+        # uploads that went into the previous index while this one was being built
+        for source in previous - self.indexed_sources:
+            if index.docstore.get_ref_doc_info(source) is None:
+                self.submit(source)
+
+    def submit(self, path):
+        self.pending.put(path)
+
+    def sync(self):
+        """Pick up nodes another worker process appended to the delta file."""
+        with self.lock:
+            self.indexed_sources |= replay_delta(self.get_index(), self.storage_dir)
+
+    def _worker(self):
+        self.loaded.wait()
+        while True:
+            path = self.pending.get()
+            try:
+                self.add_file(path)
+            except Exception as e:
+                print(f"❌ Failed to live-index {path}: {e}")
+
+    def add_file(self, path):
+        start = time.perf_counter()
+        source = os.path.normpath(path)
+        with self.lock:
+            index = self.get_index()
+            if source in self.indexed_sources or index.docstore.get_ref_doc_info(source) is not None:
+                return  # already live-indexed, or picked up by a build/refresh
+            with open(path, encoding="utf-8") as f:
+                text = f.read().strip()
+            if not text:
+                return
+
+            doc = LlamaDocument(
+                text=text,
+                id_=source,
+                metadata={"file_path": source, "file_name": os.path.basename(source)},
+            )
+            nodes = self.parser.get_nodes_from_documents([doc])
+            for node in nodes:
+                node.text = " ".join(node.text.split())
+            embeddings = Settings.embed_model.get_text_embedding_batch(
+                [node.get_content(metadata_mode="embed") for node in nodes]
+            )
+            for node, embedding in zip(nodes, embeddings):
+                node.embedding = embedding
+
+            insert_nodes_live(index, nodes)
+
+            os.makedirs(self.storage_dir, exist_ok=True)
+            with open(_delta_path(self.storage_dir), "a", encoding="utf-8") as f:
+                fcntl.flock(f, fcntl.LOCK_EX)   # other worker processes append to the same file
+                for node in nodes:
+                    f.write(json.dumps({"source": source, "node": node.to_dict()}, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+                fcntl.flock(f, fcntl.LOCK_UN)
+            self.indexed_sources.add(source)
+
+        if self.on_indexed is not None:
+            self.on_indexed(source)
+
+        print(f"🌊 Live-indexed {os.path.basename(source)}: {len(nodes)} nodes in {(time.perf_counter() - start) * 1000:.0f} ms")
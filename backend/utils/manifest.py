@@ -0,0 +1,250 @@
+import os
+import json
+import shutil
+import filecmp
+import hashlib
+import subprocess
+
+import requests
+
+
+# === CONFIG ===
+MANIFEST_FILE = "manifest.json"
+DRIVE_API_KEY = os.getenv("GOOGLE_DRIVE_API_KEY")
+DRIVE_API = "https://www.googleapis.com/drive/v3/files"
+FOLDER_MIME = "application/vnd.google-apps.folder"
+GOOGLE_DOC_MIME = "application/vnd.google-apps.document"
+DOCX_MIME = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+# Files under data/ that are not knowledge sources: raw uploads, partial
+# transcripts and the voice-chat scratch files (data/temp.*, data/reply.wav).
+SKIP_EXTENSIONS = {".wav", ".webm", ".mp3", ".m4a", ".ogg", ".flac", ".jsonl"}
+UPLOADS_DIR = "uploaded_experiences"
+UPLOADS_TEXT_DIR = os.path.join(UPLOADS_DIR, "text")
+# Scraped pages used to be written here; they now live in the web cache (utils/web_ingest.py)
+LEGACY_SCRAPED_DIR = os.path.join("General_News", "scraped_texts")
+
+
+def load_manifest(storage_dir):
+    path = os.path.join(storage_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(storage_dir, manifest):
+    os.makedirs(storage_dir, exist_ok=True)
+    path = os.path.join(storage_dir, MANIFEST_FILE)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, ensure_ascii=False)
+    os.replace(path + ".tmp", path)
+
+
+def file_hash(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _is_source(rel_path):
+    name = os.path.basename(rel_path)
+    if name.startswith(".") or os.path.splitext(name)[1].lower() in SKIP_EXTENSIONS:
+        return False
+    if rel_path.startswith(LEGACY_SCRAPED_DIR + os.sep):
+        return False
+    if rel_path.startswith(UPLOADS_DIR + os.sep):
+        return rel_path.startswith(UPLOADS_TEXT_DIR + os.sep)
+    return not (os.sep not in rel_path and name.startswith("temp."))
+
+
+def list_sources(data_dir):
+    """Every file under data_dir that goes into the index, as paths like 'data/x/y.txt'."""
+    data_dir = os.path.normpath(data_dir)
+    sources = []
+    for root, _, files in os.walk(data_dir):
+        for name in files:
+            path = os.path.join(root, name)
+            if _is_source(os.path.relpath(path, data_dir)):
+                sources.append(path)
+    return sorted(sources)
+
+
+def source_entry(path, doc_ids, digest=None):
+    stat = os.stat(path)
+    return {
+        "mtime": stat.st_mtime,
+        "size": stat.st_size,
+        "hash": digest or file_hash(path),
+        "doc_ids": doc_ids,
+    }
+
+
+def diff_sources(manifest, data_dir):
+    """
+    Compare the files on disk with the manifest.
+
+    Returns (changed, removed): changed maps new or modified paths to their
+    content hash, removed lists paths that are gone. A file whose mtime and
+    size match the manifest is not even hashed; one that was touched but has
+    the same content only gets its mtime refreshed.
+    """
+    known = manifest["sources"]
+    changed = {}
+    current = list_sources(data_dir)
+    for path in current:
+        entry = known.get(path)
+        stat = os.stat(path)
+        if entry and entry["mtime"] == stat.st_mtime and entry["size"] == stat.st_size:
+            continue
+        digest = file_hash(path)
+        if entry and entry["hash"] == digest:
+            entry["mtime"], entry["size"] = stat.st_mtime, stat.st_size
+            continue
+        changed[path] = digest
+    current = set(current)
+    removed = [path for path in known if path not in current]
+    return changed, removed
+
+
+# === Google Drive ===
+
+def _local_name(drive_file):
+    # Google Docs and .docx files end up as .txt after convert_docx_to_txt_and_cleanup.
+    # A Doc's path is its title without extension (saved as title + ".docx"), so
+    # a dotted title like "Bericht v2.1" must not lose its last part.
+    path = drive_file["path"]
+    if drive_file["mimeType"] == GOOGLE_DOC_MIME:
+        return path + ".txt"
+    if path.endswith(".docx"):
+        return os.path.splitext(path)[0] + ".txt"
+    return path
+
+
+def list_drive_files(folder_id, api_key=DRIVE_API_KEY, prefix=""):
+    files = []
+    page_token = None
+    while True:
+        params = {
+            "q": f"'{folder_id}' in parents and trashed = false",
+            "fields": "nextPageToken, files(id, name, mimeType, modifiedTime, md5Checksum)",
+            "pageSize": 1000,
+            "key": api_key,
+        }
+        if page_token:
+            params["pageToken"] = page_token
+        resp = requests.get(DRIVE_API, params=params, timeout=30)
+        resp.raise_for_status()
+        data = resp.json()
+        for f in data.get("files", []):
+            path = os.path.join(prefix, f["name"])
+            if f["mimeType"] == FOLDER_MIME:
+                files += list_drive_files(f["id"], api_key, path)
+            else:
+                files.append(dict(f, path=path))
+        page_token = data.get("nextPageToken")
+        if not page_token:
+            return files
+
+
+def _download_drive_file(drive_file, output_dir, api_key):
+    target = os.path.join(output_dir, drive_file["path"])
+    if drive_file["mimeType"] == GOOGLE_DOC_MIME:
+        url = f"{DRIVE_API}/{drive_file['id']}/export"
+        params = {"mimeType": DOCX_MIME, "key": api_key}
+        target += ".docx"
+    else:
+        url = f"{DRIVE_API}/{drive_file['id']}"
+        params = {"alt": "media", "key": api_key}
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    with requests.get(url, params=params, stream=True, timeout=60) as resp:
+        resp.raise_for_status()
+        with open(target, "wb") as f:
+            for chunk in resp.iter_content(1 << 16):
+                f.write(chunk)
+
+
+def _gdown_folder(folder_id, output_dir):
+    """
+    Download the whole folder with gdown into a fresh directory next to
+    output_dir and move it over: changed files replace the local copies,
+    unchanged ones are left alone, and local sources the download did not
+    contain (deleted on Drive) are removed. Visitor uploads are not on Drive
+    and are kept. If gdown fails, output_dir stays as it was.
+    """
+    fresh = os.path.normpath(output_dir) + ".gdown"
+    shutil.rmtree(fresh, ignore_errors=True)
+    try:
+        result = subprocess.run(["gdown", "--folder", f"https://drive.google.com/drive/folders/{folder_id}", "-O", fresh])
+        if result.returncode != 0:
+            print(f"❌ gdown failed (exit code {result.returncode}), keeping {output_dir} as it is")
+            return
+        downloaded = set()
+        for root, _, files in os.walk(fresh):
+            for name in files:
+                src = os.path.join(root, name)
+                rel = os.path.relpath(src, fresh)
+                # .docx files become .txt in convert_docx_to_txt_and_cleanup
+                downloaded.add(rel)
+                if rel.endswith(".docx"):
+                    downloaded.add(os.path.splitext(rel)[0] + ".txt")
+                target = os.path.join(output_dir, rel)
+                if os.path.exists(target) and filecmp.cmp(src, target, shallow=False):
+                    continue
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                os.replace(src, target)
+        for path in list_sources(output_dir):
+            rel = os.path.relpath(path, output_dir)
+            if rel not in downloaded and not rel.startswith(UPLOADS_DIR + os.sep):
+                os.remove(path)
+                print(f"🗑️ Removed {path} (deleted on Drive)")
+    finally:
+        shutil.rmtree(fresh, ignore_errors=True)
+
+
+def sync_drive_folder(folder_id, output_dir, manifest, api_key=DRIVE_API_KEY):
+    """
+    Bring output_dir up to date with the Drive folder.
+
+    With GOOGLE_DRIVE_API_KEY set, the folder is listed through the Drive API
+    and only files whose modifiedTime changed are downloaded; files deleted on
+    Drive are deleted locally. Without a key we fall back to a full
+    `gdown --folder` download (see _gdown_folder) and rely on the content
+    hashes in diff_sources to skip re-indexing unchanged files.
+    Returns the updated drive section of the manifest.
+    """
+    known = manifest.get("drive", {})
+    if not api_key:
+        print('No GOOGLE_DRIVE_API_KEY set, downloading the whole Drive folder...')
+        _gdown_folder(folder_id, output_dir)
+        return known
+
+    remote = {f["id"]: f for f in list_drive_files(folder_id, api_key)}
+    synced = {}
+    downloaded = 0
+    for file_id, f in remote.items():
+        local = os.path.join(output_dir, _local_name(f))
+        entry = known.get(file_id)
+        if entry and entry["modified"] == f["modifiedTime"] and os.path.exists(local):
+            synced[file_id] = entry
+            continue
+        try:
+            _download_drive_file(f, output_dir, api_key)
+            downloaded += 1
+            synced[file_id] = {"path": _local_name(f), "modified": f["modifiedTime"]}
+        except Exception as e:
+            print(f"❌ Failed to download {f['path']}: {e}")
+            if entry:
+                synced[file_id] = entry
+
+    for file_id, entry in known.items():
+        if file_id not in remote:
+            local = os.path.join(output_dir, entry["path"])
+            if os.path.exists(local):
+                os.remove(local)
+                print(f"🗑️ Removed {local} (deleted on Drive)")
+
+    print(f"Drive sync: {downloaded} of {len(remote)} files downloaded.")
+    return synced
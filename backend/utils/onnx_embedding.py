@@ -0,0 +1,159 @@
+import os
+import threading
+from typing import Any, List
+
+import numpy as np
+from pydantic import PrivateAttr
+
+from llama_index.core.base.embeddings.base import BaseEmbedding
+
+from .embedding_pipeline import EMBED_BATCH_SIZE
+
+
+# === CONFIG ===
+# Which model Settings.embed_model uses:
+#   "torch" -> HuggingFaceEmbedding in FP32 PyTorch (the original setup)
+#   "onnx"  -> the same model exported to ONNX with int8 weights (OnnxEmbedding below)
+# Vectors of the two differ slightly (see benchmarks/embedding_benchmark.py);
+# rebuild the index after switching so queries and nodes come from one model.
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "torch")
+EMBED_MODEL = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+EMBED_THREADS = int(os.getenv("EMBED_THREADS", str(os.cpu_count() or 1)))
+EMBED_MAX_LENGTH = 128            # MiniLM's max_seq_length; longer texts are truncated, as in sentence-transformers
+EMBED_BATCH_TOKENS = int(os.getenv("EMBED_BATCH_TOKENS", "8192"))   # padded tokens per ONNX run
+ONNX_CACHE_DIR = os.getenv("ONNX_CACHE_DIR", "./cache/onnx")
+
+
+def export_onnx(model_name=EMBED_MODEL, cache_dir=ONNX_CACHE_DIR):
+    """
+    Export the transformer to ONNX once and quantize its weights to int8.
+    Returns the path of the quantized model; later calls reuse the cached file.
+    """
+    out_dir = os.path.join(cache_dir, model_name.replace("/", "__"))
+    fp32_path = os.path.join(out_dir, "model.onnx")
+    int8_path = os.path.join(out_dir, "model_int8.onnx")
+    if os.path.exists(int8_path):
+        return int8_path
+
+    import torch
+    from transformers import AutoModel
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    os.makedirs(out_dir, exist_ok=True)
+    print(f"🔄 Exporting {model_name} to ONNX...")
+    model = AutoModel.from_pretrained(model_name).eval()
+    dummy = {
+        "input_ids": torch.ones(1, 8, dtype=torch.long),
+        "attention_mask": torch.ones(1, 8, dtype=torch.long),
+    }
+    dynamic = {0: "batch", 1: "sequence"}
+    with torch.inference_mode():
+        torch.onnx.export(
+            model, (dummy,), fp32_path,
+            input_names=["input_ids", "attention_mask"],
+            output_names=["last_hidden_state"],
+            dynamic_axes={"input_ids": dynamic, "attention_mask": dynamic, "last_hidden_state": dynamic},
+            opset_version=17,
+        )
+    # int8 weights for MatMul/Gemm, activations quantized on the fly
+    quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+    print(f"✅ Quantized model written to {int8_path}")
+    return int8_path
+
+
+class OnnxEmbedding(BaseEmbedding):
+    """
+    MiniLM sentence embeddings through ONNX Runtime with int8 weights.
+
+    Texts are tokenized once, sorted by length and cut into batches of at most
+    EMBED_BATCH_TOKENS padded tokens, so short queries aren't padded to the
+    length of a long chunk in the same batch. Mean pooling over the attention
+    mask and L2 normalisation match HuggingFaceEmbedding's defaults.
+    """
+
+    _model_path: str = PrivateAttr()
+    _threads: int = PrivateAttr()
+    _session: Any = PrivateAttr(default=None)
+    _session_pid: Any = PrivateAttr(default=None)
+    _session_lock: Any = PrivateAttr(default_factory=threading.Lock)
+    _tokenizer: Any = PrivateAttr()
+
+    def __init__(self, model_name=EMBED_MODEL, threads=EMBED_THREADS, embed_batch_size=EMBED_BATCH_SIZE, **kwargs):
+        super().__init__(model_name=model_name, embed_batch_size=embed_batch_size, **kwargs)
+        from transformers import AutoTokenizer
+
+        self._model_path = export_onnx(model_name)
+        self._threads = threads
+        self._tokenizer = AutoTokenizer.from_pretrained(model_name)
+
+    def _get_session(self):
+        # Created on first use in each process: onnxruntime's thread pool doesn't
+        # survive fork(), so a session made in the prefork master hangs in the workers.
+        if self._session_pid != os.getpid():
+            with self._session_lock:
+                if self._session_pid != os.getpid():
+                    import onnxruntime as ort
+
+                    options = ort.SessionOptions()
+                    options.intra_op_num_threads = self._threads
+                    options.inter_op_num_threads = 1
+                    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+                    self._session = ort.InferenceSession(self._model_path, options, providers=["CPUExecutionProvider"])
+                    self._session_pid = os.getpid()
+        return self._session
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "OnnxEmbedding"
+
+    def _batches(self, encoded):
+        # longest first, so each batch's padding is set by similar lengths
+        order = sorted(range(len(encoded)), key=lambda i: len(encoded[i]), reverse=True)
+        batch = []
+        for i in order:
+            if batch and len(encoded[batch[0]]) * (len(batch) + 1) > EMBED_BATCH_TOKENS:
+                yield batch
+                batch = []
+            batch.append(i)
+        if batch:
+            yield batch
+
+    def _embed(self, texts):
+        encoded = self._tokenizer(texts, truncation=True, max_length=EMBED_MAX_LENGTH)["input_ids"]
+        pad_id = self._tokenizer.pad_token_id
+        session = self._get_session()
+        vectors = [None] * len(texts)
+        for batch in self._batches(encoded):
+            width = len(encoded[batch[0]])
+            input_ids = np.full((len(batch), width), pad_id, dtype=np.int64)
+            mask = np.zeros((len(batch), width), dtype=np.int64)
+            for row, i in enumerate(batch):
+                input_ids[row, :len(encoded[i])] = encoded[i]
+                mask[row, :len(encoded[i])] = 1
+            hidden = session.run(None, {"input_ids": input_ids, "attention_mask": mask})[0]
+            pooled = (hidden * mask[:, :, None]).sum(axis=1) / np.maximum(mask.sum(axis=1, keepdims=True), 1)
+            pooled /= np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+            for row, i in enumerate(batch):
+                vectors[i] = pooled[row].tolist()
+        return vectors
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self._embed([query])[0]
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._get_query_embedding(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._embed([text])[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(texts)
+
+
+def get_embed_model(backend=None):
+    backend = backend or EMBED_BACKEND
+    if backend == "onnx":
+        return OnnxEmbedding()
+    from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+
+    return HuggingFaceEmbedding(EMBED_MODEL, embed_batch_size=EMBED_BATCH_SIZE)
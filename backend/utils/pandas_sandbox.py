@@ -0,0 +1,181 @@
+import os
+import sys
+import time
+import queue
+import pickle
+import select
+import signal
+import struct
+import threading
+import subprocess
+
+
+# === CONFIG ===
+SANDBOX_WORKERS = int(os.getenv("SANDBOX_WORKERS", "1"))
+SANDBOX_CPU_SECONDS = int(os.getenv("SANDBOX_CPU_SECONDS", "5"))        # CPU time per expression
+SANDBOX_MEMORY_MB = int(os.getenv("SANDBOX_MEMORY_MB", "1024"))         # address space per process
+SANDBOX_TIMEOUT = float(os.getenv("SANDBOX_TIMEOUT", "15"))             # wall clock per expression
+SANDBOX_START_TIMEOUT = 120.0                                           # importing pandas + llama_index
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ERROR_PREFIX = "There was an error running the output as Python code. Error message: "
+
+_HEADER = struct.Struct("!Q")
+
+
+def _send(f, obj):
+    data = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+    f.write(_HEADER.pack(len(data)) + data)
+    f.flush()
+
+
+def _read_exact(fd, n, deadline):
+    chunks, remaining = [], n
+    while remaining:
+        timeout = None if deadline is None else deadline - time.monotonic()
+        if timeout is not None and (timeout <= 0 or not select.select([fd], [], [], timeout)[0]):
+            raise TimeoutError
+        chunk = os.read(fd, remaining)
+        if not chunk:
+            raise EOFError
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b"".join(chunks)
+
+
+def _receive(fd, timeout=None):
+    deadline = None if timeout is None else time.monotonic() + timeout
+    (size,) = _HEADER.unpack(_read_exact(fd, _HEADER.size, deadline))
+    return pickle.loads(_read_exact(fd, size, deadline))
+
+
+class SandboxProcess:
+    """One `python -m utils.pandas_sandbox` child, talking pickles over its stdin/stdout."""
+
+    def __init__(self):
+        self.proc = subprocess.Popen(
+            [sys.executable, "-m", "utils.pandas_sandbox"],
+            cwd=BACKEND_DIR,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            # one BLAS/OpenMP thread: the CPU limit is per process, and thread pools eat address space
+            env={**os.environ, "OPENBLAS_NUM_THREADS": "1", "OMP_NUM_THREADS": "1", "MKL_NUM_THREADS": "1"},
+            start_new_session=True,   # no terminal signals from the server's session
+        )
+        if _receive(self.proc.stdout.fileno(), SANDBOX_START_TIMEOUT) != "ready":
+            raise RuntimeError("sandbox process failed to start")
+
+    def run(self, code, df, output_kwargs):
+        _send(self.proc.stdin, (code, df, output_kwargs))
+        return _receive(self.proc.stdout.fileno(), SANDBOX_TIMEOUT)
+
+    def kill(self):
+        self.proc.kill()
+        self.proc.wait()
+
+
+class PandasSandbox:
+    """
+    Pre-started worker processes that evaluate the pandas code the LLM wrote.
+
+    Each child imports pandas and the PandasQueryEngine output processor
+    once, caps its address space at SANDBOX_MEMORY_MB and the CPU time of
+    every expression at SANDBOX_CPU_SECONDS (SIGXCPU ends the process).
+    run() also gives up after SANDBOX_TIMEOUT of wall clock. A child that
+    dies, times out or runs out of memory is killed and replaced in the
+    background, and the caller gets the same error string the output
+    processor returns for failing code, so the synthesis step answers it.
+    """
+
+    def __init__(self, workers=SANDBOX_WORKERS):
+        self.workers = workers
+        self.idle = queue.Queue()
+        self.alive = 0   # processes running or starting
+        self.lock = threading.Lock()
+        self.stats = {"runs": 0, "errors": 0, "killed": 0}
+
+    def start(self):
+        for _ in range(self.workers):
+            self._spawn()
+
+    def _spawn(self):
+        with self.lock:
+            self.alive += 1
+
+        def spawn():
+            try:
+                self.idle.put(SandboxProcess())
+            except Exception as e:
+                print(f"❌ Failed to start pandas sandbox: {e}")
+                with self.lock:
+                    self.alive -= 1
+        threading.Thread(target=spawn, name="pandas-sandbox-start", daemon=True).start()
+
+    def run(self, code, df, output_kwargs=None):
+        if self.alive == 0:
+            self.start()   # never started, or every start failed; this call doesn't wait for it
+            return ERROR_PREFIX + "the sandbox is not running"
+        try:
+            worker = self.idle.get(timeout=SANDBOX_START_TIMEOUT + SANDBOX_TIMEOUT)
+        except queue.Empty:
+            return ERROR_PREFIX + "no sandbox process available"
+        self.stats["runs"] += 1
+        try:
+            status, output = worker.run(code, df, output_kwargs or {})
+        except TimeoutError:
+            error = f"no result within {SANDBOX_TIMEOUT:.0f}s"
+        except EOFError:
+            error = "the sandbox process ended (CPU or memory limit)"
+        else:
+            self.idle.put(worker)
+            if status != "ok":
+                self.stats["errors"] += 1
+            return output
+        print(f"❌ Pandas sandbox: {error}")
+        self.stats["killed"] += 1
+        self.stats["errors"] += 1
+        worker.kill()
+        with self.lock:
+            self.alive -= 1
+        self._spawn()
+        return ERROR_PREFIX + error
+
+    def metrics(self):
+        return {**self.stats, "idle": self.idle.qsize(), "workers": self.workers}
+
+
+sandbox = PandasSandbox()
+
+
+def _serve():
+    """Child process: evaluate (code, df, output_kwargs) requests until stdin closes."""
+    import resource
+
+    # results go over the original stdout; anything the code prints goes to stderr
+    out = os.fdopen(os.dup(sys.stdout.fileno()), "wb")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    stdin = sys.stdin.buffer.fileno()
+
+    memory = SANDBOX_MEMORY_MB * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+    from llama_index.experimental.query_engine.pandas.output_parser import default_output_processor
+    _send(out, "ready")
+
+    while True:
+        try:
+            code, df, output_kwargs = _receive(stdin)
+        except EOFError:
+            return
+        used = resource.getrusage(resource.RUSAGE_SELF)
+        cpu = int(used.ru_utime + used.ru_stime) + SANDBOX_CPU_SECONDS
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu, resource.RLIM_INFINITY))
+        try:
+            output = default_output_processor(code, df, **output_kwargs)
+            status = "error" if output.startswith(ERROR_PREFIX) else "ok"
+        except MemoryError:
+            output, status = ERROR_PREFIX + "out of memory", "error"
+        _send(out, (status, output))
+
+
+if __name__ == "__main__":
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _serve()
@@ -0,0 +1,124 @@
+import os
+import time
+import hashlib
+import threading
+
+
+# === CONFIG ===
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROMPT_FILES = {
+    "avatar": os.path.join(BASE_DIR, "system_prompt.txt"),                 # synced from the Google Doc
+    "rag": os.path.join(BASE_DIR, "prompts", "rag_synthesis.txt"),         # query engine's synthesis LLM
+    "sensor": os.path.join(BASE_DIR, "prompts", "sensor_analysis.txt"),    # pandas sensor tool LLM
+    "debate": os.path.join(BASE_DIR, "prompts", "debate_summary.txt"),     # {topic}, {history}, {summary}
+}
+PROMPT_WATCH_INTERVAL = float(os.getenv("PROMPT_WATCH_INTERVAL", "2"))   # seconds between file checks
+
+
+def prompt_version(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:12]
+
+
+class PromptRegistry:
+    """
+    The prompts, read once and kept in memory with a version hash each.
+
+    A watcher thread re-reads a file when its mtime changes, so editing a
+    prompt on disk takes effect without a restart. Listeners registered with
+    on_change(name, fn) are called only when the text's hash really changed
+    (touching a file or re-downloading the same Google Doc does nothing),
+    so each cache built from a prompt is rebuilt only for its own prompt.
+    """
+
+    def __init__(self, files=PROMPT_FILES):
+        self.files = dict(files)
+        self.prompts = {}
+        self.listeners = {}
+        self.remote = {}   # name -> ETag/Last-Modified of the last download
+        self.lock = threading.RLock()
+        for name in self.files:
+            self._load(name)
+
+    def _load(self, name):
+        path = self.files[name]
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+        return self._set(name, text, os.path.getmtime(path))
+
+    def _set(self, name, text, mtime):
+        version = prompt_version(text)
+        with self.lock:
+            previous = self.prompts.get(name)
+            self.prompts[name] = {"text": text, "version": version, "mtime": mtime, "loaded_at": time.time()}
+            changed = previous is not None and previous["version"] != version
+        if changed:
+            print(f"📝 Prompt {name} changed: {previous['version']} -> {version}")
+            for fn in self.listeners.get(name, []):
+                try:
+                    fn(text)
+                except Exception as e:
+                    print(f"❌ Failed to apply prompt {name}: {e}")
+        return changed
+
+    def get(self, name):
+        with self.lock:
+            return self.prompts[name]["text"]
+
+    def version(self, name):
+        with self.lock:
+            return self.prompts[name]["version"]
+
+    def versions(self):
+        with self.lock:
+            return {name: entry["version"] for name, entry in self.prompts.items()}
+
+    def on_change(self, name, fn):
+        self.listeners.setdefault(name, []).append(fn)
+
+    def update(self, name, text, etag=None, last_modified=None):
+        """Store new text for a prompt (written to its file if it differs). Returns whether it changed."""
+        with self.lock:
+            self.remote[name] = {"etag": etag, "last_modified": last_modified}
+            if prompt_version(text) == self.prompts[name]["version"]:
+                return False
+            path = self.files[name]
+            tmp = path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp, path)
+            return self._set(name, text, os.path.getmtime(path))
+
+    def conditional_headers(self, name):
+        """If-None-Match/If-Modified-Since for re-downloading a prompt's source."""
+        with self.lock:
+            remote = self.remote.get(name, {})
+        headers = {}
+        if remote.get("etag"):
+            headers["If-None-Match"] = remote["etag"]
+        if remote.get("last_modified"):
+            headers["If-Modified-Since"] = remote["last_modified"]
+        return headers
+
+    def reload(self):
+        """Re-read the prompt files whose mtime changed. Returns the names that changed."""
+        changed = []
+        for name, path in self.files.items():
+            try:
+                mtime = os.path.getmtime(path)
+            except FileNotFoundError:
+                continue
+            with self.lock:
+                stale = mtime != self.prompts[name]["mtime"]
+            if stale and self._load(name):
+                changed.append(name)
+        return changed
+
+    def watch(self, interval=PROMPT_WATCH_INTERVAL):
+        def loop():
+            while True:
+                time.sleep(interval)
+                self.reload()
+        threading.Thread(target=loop, name="prompt-watcher", daemon=True).start()
+
+
+prompts = PromptRegistry()
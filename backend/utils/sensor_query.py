@@ -0,0 +1,120 @@
+import os
+import re
+import hashlib
+import threading
+from collections import OrderedDict
+
+from llama_index.core.base.response.schema import Response
+from llama_index.core.utils import print_text
+from llama_index.experimental.query_engine import PandasQueryEngine
+
+from .pandas_sandbox import sandbox, ERROR_PREFIX
+
+
+# === CONFIG ===
+CODE_CACHE_SIZE = int(os.getenv("CODE_CACHE_SIZE", "256"))
+
+
+# words (digits included), decimal numbers and comparison signs; everything else is spacing/punctuation
+_QUESTION_TOKEN = re.compile(r"\d+(?:[.,]\d+)?|\w+|[<>=≤≥%]", re.UNICODE)
+
+
+def question_key(question):
+    # only case, spacing and punctuation are ignored: every word, number, negation
+    # ("not", "ohne") and comparative ("über"/"unter") can change the pandas code
+    return " ".join(_QUESTION_TOKEN.findall(question.lower()))
+
+
+def schema_key(df):
+    schema = ",".join(f"{name}:{dtype}" for name, dtype in df.dtypes.items())
+    return hashlib.sha256(schema.encode("utf-8")).hexdigest()[:12]
+
+
+def data_day(df):
+    # The LLM sees absolute created_at timestamps, so code for "yesterday" or
+    # "last week" usually hardcodes dates; it is only valid for the day it was made for
+    if "created_at" not in df or df.empty:
+        return None
+    return str(df["created_at"].max().date())
+
+
+class CodeCache:
+    """LRU of generated pandas code by (normalized question, DataFrame schema, day of the newest reading)."""
+
+    def __init__(self, size=CODE_CACHE_SIZE):
+        self.size = size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+
+    def get(self, key):
+        with self.lock:
+            code = self.entries.get(key)
+            if code is None:
+                self.stats["misses"] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return code
+
+    def put(self, key, code):
+        with self.lock:
+            self.entries[key] = code
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def metrics(self):
+        with self.lock:
+            return {**self.stats, "entries": len(self.entries), "size": self.size}
+
+
+code_cache = CodeCache()
+
+
+class CachedPandasQueryEngine(PandasQueryEngine):
+    """
+    PandasQueryEngine that reuses the code it generated for the same question
+    and schema on the same day of data, and evaluates it in the pandas sandbox
+    instead of in-process.
+    Only code that ran without error is cached.
+    """
+
+    def _query(self, query_bundle):
+        key = (question_key(query_bundle.query_str), schema_key(self._df), data_day(self._df))
+        pandas_response_str = code_cache.get(key)
+        cached = pandas_response_str is not None
+        if not cached:
+            pandas_response_str = self._llm.predict(
+                self._pandas_prompt,
+                df_str=self._get_table_context(),
+                query_str=query_bundle.query_str,
+                instruction_str=self._instruction_str,
+            )
+
+        if self._verbose:
+            print_text(f"> Pandas Instructions{' (cached)' if cached else ''}:\n```\n{pandas_response_str}\n```\n")
+        pandas_output = sandbox.run(pandas_response_str, self._df, self._instruction_parser.output_kwargs)
+        if self._verbose:
+            print_text(f"> Pandas Output: {pandas_output}\n")
+        if not cached and not pandas_output.startswith(ERROR_PREFIX):
+            code_cache.put(key, pandas_response_str)
+
+        response_metadata = {
+            "pandas_instruction_str": pandas_response_str,
+            "raw_pandas_output": pandas_output,
+            "cached_code": cached,
+        }
+        if self._synthesize_response:
+            response_str = str(
+                self._llm.predict(
+                    self._response_synthesis_prompt,
+                    query_str=query_bundle.query_str,
+                    pandas_instructions=pandas_response_str,
+                    pandas_output=pandas_output,
+                )
+            )
+        else:
+            response_str = str(pandas_output)
+
+        return Response(response=response_str, metadata=response_metadata)
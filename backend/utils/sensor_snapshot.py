@@ -0,0 +1,115 @@
+import os
+import time
+import threading
+
+import numpy as np
+import pandas as pd
+
+from .utils import fetch_lahn_sensors_df
+
+
+# === CONFIG ===
+SNAPSHOT_URL = "https://api.thingspeak.com/channels/2974588/feeds.json?days=1"
+SNAPSHOT_INTERVAL = int(os.getenv("SNAPSHOT_INTERVAL", "300"))   # seconds between fetches
+SNAPSHOT_MAX_AGE = 3 * SNAPSHOT_INTERVAL                          # older than this is not injected
+TREND_HOURS = 3                                                   # trend = fitted change over the last 3 h
+TREND_MIN_CHANGE = 0.1                                            # fraction of the 24 h range that counts as a trend
+
+
+def _trend(times, values):
+    recent = times >= times.max() - pd.Timedelta(hours=TREND_HOURS)
+    if recent.sum() < 3:
+        return "steady", 0.0
+    hours = (times[recent] - times[recent].min()).dt.total_seconds() / 3600
+    slope = np.polyfit(hours, values[recent], 1)[0]
+    change = slope * TREND_HOURS
+    span = values.max() - values.min()
+    if span == 0 or abs(change) < TREND_MIN_CHANGE * span:
+        return "steady", change
+    return ("rising" if change > 0 else "falling"), change
+
+
+def compute_snapshot(df):
+    """Latest value, 24 h min/max and trend of each sensor field."""
+    fields = {}
+    for name in df.attrs.get("fields", []):
+        series = df[["created_at", name]].dropna()
+        if series.empty:
+            continue
+        trend, change = _trend(series["created_at"], series[name])
+        fields[name] = {
+            "latest": round(float(series[name].iloc[-1]), 2),
+            "min": round(float(series[name].min()), 2),
+            "max": round(float(series[name].max()), 2),
+            "trend": trend,
+            "change": round(float(change), 2),
+        }
+    return {"as_of": df["created_at"].max(), "fields": fields}
+
+
+def _signed(value):
+    # fixed point, decimals by magnitude: pH moves by +0.04, CO2 by +150 ppm (never "+1.5e+02")
+    decimals = 2 if abs(value) < 1 else 1 if abs(value) < 100 else 0
+    return f"{value:+.{decimals}f}"
+
+
+def format_snapshot(snapshot):
+    readings = "; ".join(
+        f"{name} {f['latest']:g} (24 h min {f['min']:g}, max {f['max']:g}, {f['trend']}"
+        + (f" {_signed(f['change'])} over {TREND_HOURS} h)" if f["trend"] != "steady" else ")")
+        for name, f in snapshot["fields"].items()
+    )
+    as_of = snapshot["as_of"].strftime("%Y-%m-%d %H:%M %Z").strip()
+    return (
+        f"Live Lahn sensor readings as of {as_of}: {readings}. "
+        "Answer questions about current values, ranges or trends from these readings directly; "
+        "call analyze_sensor_data() only for analysis they cannot answer."
+    )
+
+
+class SensorSnapshot:
+    """
+    Compact summary of the last 24 h of sensor data, refreshed in the background.
+
+    The system message is rebuilt only when a new reading arrived (the version
+    is the newest reading's timestamp), so consecutive chats send identical
+    bytes. A snapshot that could not be refreshed for SNAPSHOT_MAX_AGE is
+    withheld rather than passed off as live.
+    """
+
+    def __init__(self, url=SNAPSHOT_URL, interval=SNAPSHOT_INTERVAL):
+        self.url = url
+        self.interval = interval
+        self.version = None
+        self.text = None
+        self.fetched_at = 0.0
+        self.lock = threading.Lock()
+
+    def refresh(self):
+        df = fetch_lahn_sensors_df(self.url)
+        if df.empty:
+            return
+        version = df["created_at"].max().isoformat()
+        if version != self.version:
+            text = format_snapshot(compute_snapshot(df))
+            with self.lock:
+                self.version, self.text = version, text
+            print(f"🌡️ Sensor snapshot updated ({version})")
+        self.fetched_at = time.time()
+
+    def start(self):
+        def loop():
+            while True:
+                try:
+                    self.refresh()
+                except Exception as e:
+                    print(f"❌ Sensor snapshot refresh failed: {e}")
+                time.sleep(self.interval)
+        threading.Thread(target=loop, name="sensor-snapshot", daemon=True).start()
+
+    def message(self):
+        """(version, system message) or (None, None) when there is no fresh snapshot."""
+        with self.lock:
+            if self.text is None or time.time() - self.fetched_at > SNAPSHOT_MAX_AGE:
+                return None, None
+            return self.version, {'role': 'system', 'content': self.text}
@@ -0,0 +1,183 @@
+import os
+import json
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from llama_index.core.storage.kvstore.types import BaseKVStore, DEFAULT_COLLECTION
+from llama_index.core.storage.kvstore.simple_kvstore import SimpleKVStore
+from llama_index.core.storage.docstore.keyval_docstore import KVDocumentStore
+from llama_index.core.storage.index_store.keyval_index_store import KVIndexStore
+
+
+# === CONFIG ===
+# "sqlite": docstore + index store in lahn_index/store.sqlite; "json": LlamaIndex's docstore.json/index_store.json
+DOC_STORE = os.getenv("DOC_STORE", "sqlite")
+STORE_FILE = "store.sqlite"
+JSON_STORE_FILES = ("docstore.json", "index_store.json")
+PUT_BATCH_SIZE = 1000
+
+
+class SqliteKVStore(BaseKVStore):
+    """
+    Key-value store in a single SQLite file, one row per (collection, key).
+
+    Every put/delete is its own committed transaction and put_all writes all
+    pairs in one, so adding nodes appends rows instead of rewriting a JSON
+    file, and reads only touch the keys asked for. One connection shared by
+    the Flask and indexing threads, serialised with a lock.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.RLock()
+        self.conn = self._connect(path)
+
+    @staticmethod
+    def _connect(path):
+        # timeout: with several worker processes, a writer may briefly hold the file lock
+        conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        # rollback journal rather than WAL: the file is replaced wholesale when
+        # a refreshed copy is persisted, and must not pair with a stale -wal
+        conn.execute("PRAGMA journal_mode=DELETE")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS kv ("
+            " collection TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,"
+            " PRIMARY KEY (collection, key))"
+        )
+        conn.commit()
+        return conn
+
+    @classmethod
+    def from_persist_dir(cls, persist_dir):
+        """Open lahn_index/store.sqlite, importing docstore.json/index_store.json the first time."""
+        os.makedirs(persist_dir, exist_ok=True)
+        path = os.path.join(persist_dir, STORE_FILE)
+        legacy = [os.path.join(persist_dir, name) for name in JSON_STORE_FILES]
+        migrate = not os.path.exists(path) and all(os.path.exists(p) for p in legacy)
+
+        store = cls(path)
+        if migrate:
+            print(f'Importing {", ".join(JSON_STORE_FILES)} into {path}...')
+            for legacy_path in legacy:
+                for collection, pairs in SimpleKVStore.from_persist_path(legacy_path).to_dict().items():
+                    store.put_all(list(pairs.items()), collection=collection)
+            for legacy_path in legacy:
+                os.remove(legacy_path)
+        return store
+
+    def reopen(self):
+        """
+        New connection and lock after fork(). SQLite connections must not be
+        used across fork (the child doesn't inherit the parent's file locks),
+        so a prefork worker opens its own. The inherited connection is left
+        alone rather than closed, closing it could touch the parent's state.
+        """
+        self._inherited = self.conn
+        self.lock = threading.RLock()
+        self.conn = self._connect(self.path)
+
+    def copy(self, path):
+        """Consistent copy of the database at path (SQLite online backup), opened as a new store."""
+        if os.path.exists(path):
+            os.remove(path)
+        target = sqlite3.connect(path)
+        with self.lock:
+            self.conn.backup(target)
+        target.close()
+        return SqliteKVStore(path)
+
+    def persist(self, persist_path, fs=None):
+        """
+        Writes are committed as they happen, so persisting in place is a no-op.
+        A store opened on a staging copy is moved over store.sqlite in
+        persist_path's directory and keeps working on the moved file.
+        """
+        target = os.path.join(os.path.dirname(persist_path) or ".", STORE_FILE)
+        with self.lock:
+            if os.path.abspath(target) == os.path.abspath(self.path):
+                return
+            self.conn.commit()
+            self.conn.close()
+            os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+            os.replace(self.path, target)
+            self.path = target
+            self.conn = self._connect(target)
+
+    def put(self, key: str, val: dict, collection: str = DEFAULT_COLLECTION) -> None:
+        self.put_all([(key, val)], collection=collection)
+
+    def put_all(
+        self,
+        kv_pairs: List[Tuple[str, dict]],
+        collection: str = DEFAULT_COLLECTION,
+        batch_size: int = PUT_BATCH_SIZE,
+    ) -> None:
+        rows = [(collection, key, json.dumps(val, ensure_ascii=False)) for key, val in kv_pairs]
+        with self.lock, self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO kv (collection, key, value) VALUES (?, ?, ?)", rows)
+
+    def get(self, key: str, collection: str = DEFAULT_COLLECTION) -> Optional[dict]:
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT value FROM kv WHERE collection = ? AND key = ?", (collection, key)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_all(self, collection: str = DEFAULT_COLLECTION) -> Dict[str, dict]:
+        with self.lock:
+            rows = self.conn.execute("SELECT key, value FROM kv WHERE collection = ?", (collection,)).fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+    def delete(self, key: str, collection: str = DEFAULT_COLLECTION) -> bool:
+        with self.lock, self.conn:
+            cursor = self.conn.execute("DELETE FROM kv WHERE collection = ? AND key = ?", (collection, key))
+        return cursor.rowcount > 0
+
+    async def aput(self, key: str, val: dict, collection: str = DEFAULT_COLLECTION) -> None:
+        self.put(key, val, collection)
+
+    async def aput_all(self, kv_pairs, collection: str = DEFAULT_COLLECTION, batch_size: int = PUT_BATCH_SIZE) -> None:
+        self.put_all(kv_pairs, collection, batch_size)
+
+    async def aget(self, key: str, collection: str = DEFAULT_COLLECTION) -> Optional[dict]:
+        return self.get(key, collection)
+
+    async def aget_all(self, collection: str = DEFAULT_COLLECTION) -> Dict[str, dict]:
+        return self.get_all(collection)
+
+    async def adelete(self, key: str, collection: str = DEFAULT_COLLECTION) -> bool:
+        return self.delete(key, collection)
+
+
+class SqliteDocumentStore(KVDocumentStore):
+    def __init__(self, kvstore, namespace=None):
+        super().__init__(kvstore, namespace=namespace, batch_size=PUT_BATCH_SIZE)
+
+    def persist(self, persist_path, fs=None):
+        self._kvstore.persist(persist_path)
+
+
+class SqliteIndexStore(KVIndexStore):
+    def persist(self, persist_path, fs=None):
+        self._kvstore.persist(persist_path)
+
+
+def sqlite_stores(kvstore):
+    """(docstore, index_store) sharing one SQLite file."""
+    return SqliteDocumentStore(kvstore), SqliteIndexStore(kvstore)
+
+
+def reopen_stores(storage_context):
+    """Reopen the SQLite store behind a storage context's docstore and index store (after fork)."""
+    kvstores = {id(store._kvstore): store._kvstore for store in (storage_context.docstore, storage_context.index_store)}
+    for kvstore in kvstores.values():
+        if isinstance(kvstore, SqliteKVStore):
+            kvstore.reopen()
+
+
+def store_exists(persist_dir):
+    return os.path.exists(os.path.join(persist_dir, STORE_FILE)) or all(
+        os.path.exists(os.path.join(persist_dir, name)) for name in JSON_STORE_FILES
+    )
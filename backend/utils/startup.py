@@ -0,0 +1,85 @@
+import os
+import time
+import threading
+
+
+# === CONFIG ===
+# Whisper is only needed for audio uploads; text-only deployments can skip warming it
+WARM_WHISPER = os.getenv("WARM_WHISPER", "1") == "1"
+
+
+class Warmup:
+    """
+    Runs the slow startup steps (LLM clients, embedder, index, Whisper) in
+    background threads so the server binds its port right away.
+
+    Each task starts as soon as the tasks it depends on are ready; a task
+    whose dependency failed fails too. status() is what /readyz reports.
+    """
+
+    def __init__(self):
+        self.tasks = {}
+        self.started_at = time.time()
+        self.lock = threading.Lock()
+
+    def add(self, name, fn, after=(), required=True):
+        self.tasks[name] = {
+            "fn": fn,
+            "after": tuple(after),
+            "required": required,
+            "state": "pending",
+            "event": threading.Event(),
+        }
+
+    def start(self):
+        for name in self.tasks:
+            threading.Thread(target=self._run, args=(name,), name=f"warmup-{name}", daemon=True).start()
+
+    def _run(self, name):
+        task = self.tasks[name]
+        for dependency in task["after"]:
+            self.tasks[dependency]["event"].wait()
+            if self.tasks[dependency]["state"] != "ready":
+                self._finish(name, "failed", error=f"{dependency} failed")
+                return
+        with self.lock:
+            task.update(state="running", started=time.time())
+        try:
+            task["fn"]()
+        except Exception as e:
+            print(f"❌ Startup step {name} failed: {e}")
+            self._finish(name, "failed", error=str(e))
+            return
+        self._finish(name, "ready")
+        print(f"✅ {name} ready after {time.time() - self.started_at:.1f}s")
+
+    def _finish(self, name, state, **fields):
+        with self.lock:
+            task = self.tasks[name]
+            task.update(state=state, finished=time.time(), **fields)
+        task["event"].set()
+
+    def join(self):
+        """Block until every step has finished (prefork mode warms up in the master before forking)."""
+        for task in self.tasks.values():
+            task["event"].wait()
+
+    def is_ready(self, *names):
+        names = names or [n for n, t in self.tasks.items() if t["required"]]
+        return all(self.tasks[n]["state"] == "ready" for n in names)
+
+    def wait(self, name, timeout=None):
+        self.tasks[name]["event"].wait(timeout)
+        return self.is_ready(name)
+
+    def status(self):
+        with self.lock:
+            report = {}
+            for name, task in self.tasks.items():
+                entry = {"state": task["state"], "required": task["required"]}
+                if "finished" in task and "started" in task:
+                    entry["seconds"] = round(task["finished"] - task["started"], 2)
+                if "error" in task:
+                    entry["error"] = task["error"]
+                report[name] = entry
+        return report
@@ -0,0 +1,270 @@
+import os
+import json
+import threading
+
+import numpy as np
+import soundfile as sf
+
+
+# === CONFIG ===
+# Which engine transcribe_audio() uses:
+#   "ctranslate2"  -> faster-whisper (CTranslate2) with int8 weights, same as the Pi
+#   "torch-int8"   -> transformers Whisper with dynamically quantized Linear layers
+#   "transformers" -> transformers Whisper in FP32 (the original setup)
+WHISPER_BACKEND = os.getenv("WHISPER_BACKEND", "ctranslate2")
+WHISPER_MODEL_SIZE = os.getenv("WHISPER_MODEL_SIZE", "small")
+WHISPER_COMPUTE_TYPE = os.getenv("WHISPER_COMPUTE_TYPE", "int8")
+WHISPER_THREADS = int(os.getenv("WHISPER_THREADS", str(os.cpu_count() or 1)))
+WHISPER_BEAM_SIZE = int(os.getenv("WHISPER_BEAM_SIZE", "1"))
+# Concurrent transcribe calls (e.g. voice streams next to the upload queue) for the
+# CTranslate2 engine; cores are split between them
+WHISPER_PARALLEL = int(os.getenv("WHISPER_PARALLEL", "2"))
+
+SAMPLE_RATE = 16000
+
+# Long-form settings: Whisper only sees 30 s at a time, so longer recordings are
+# cut into windows, preferably in a quiet spot near the end of each window.
+WINDOW_SECONDS = 30.0
+WINDOW_OVERLAP_SECONDS = 1.0
+SILENCE_SEARCH_SECONDS = 5.0     # how far back from the window end to look for a pause
+SILENCE_FRAME_SECONDS = 0.1
+LONG_FORM_BATCH = int(os.getenv("WHISPER_LONG_FORM_BATCH", "4"))  # windows in memory at once
+
+
+def load_wav(path):
+    # Audio is expected to be 16 kHz mono already (see convert_to_wav)
+    speech, sr = sf.read(path, dtype="float32", always_2d=True)
+    return speech.mean(axis=1), sr
+
+
+class TransformersWhisperEngine:
+    name = "transformers"
+
+    def __init__(self, model_size=WHISPER_MODEL_SIZE, quantize=False):
+        import torch
+        from transformers import WhisperProcessor, WhisperForConditionalGeneration
+
+        self.torch = torch
+        self.device = "cuda" if torch.cuda.is_available() and not quantize else "cpu"
+        torch.set_num_threads(WHISPER_THREADS)
+
+        model_name = f"openai/whisper-{model_size}"
+        print(f"🔄 Loading Whisper model ({self.name}) on {self.device}...")
+        self.processor = WhisperProcessor.from_pretrained(model_name)
+        model = WhisperForConditionalGeneration.from_pretrained(model_name)
+        if quantize:
+            # int8 weights for every Linear layer, activations quantized on the fly
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.model = model.to(self.device).eval()
+        print("✅ Whisper model loaded.")
+
+    def transcribe_batch(self, waveforms, sampling_rate=SAMPLE_RATE):
+        # The processor pads/truncates every clip to 30 s, so the clips can go
+        # through a single generate call.
+        input_features = self.processor(
+            [np.asarray(w, dtype=np.float32) for w in waveforms],
+            sampling_rate=sampling_rate, return_tensors="pt"
+        ).input_features.to(self.device)
+
+        with self.torch.inference_mode():
+            predicted_ids = self.model.generate(input_features, num_beams=WHISPER_BEAM_SIZE)
+        return self.processor.batch_decode(predicted_ids, skip_special_tokens=True)
+
+    def transcribe(self, waveform, sampling_rate=SAMPLE_RATE):
+        return self.transcribe_batch([waveform], sampling_rate)[0]
+
+
+class QuantizedTorchWhisperEngine(TransformersWhisperEngine):
+    name = "torch-int8"
+
+    def __init__(self, model_size=WHISPER_MODEL_SIZE):
+        super().__init__(model_size, quantize=True)
+
+
+class CTranslate2WhisperEngine:
+    name = "ctranslate2"
+
+    def __init__(self, model_size=WHISPER_MODEL_SIZE, compute_type=WHISPER_COMPUTE_TYPE):
+        from faster_whisper import WhisperModel
+        from faster_whisper.audio import pad_or_trim
+        from faster_whisper.tokenizer import Tokenizer
+
+        print(f"🔄 Loading Whisper model ({self.name}, {compute_type}) on cpu...")
+        self.parallel = max(1, WHISPER_PARALLEL)
+        self.model = WhisperModel(
+            model_size, device="cpu", compute_type=compute_type,
+            cpu_threads=max(1, WHISPER_THREADS // self.parallel), num_workers=self.parallel
+        )
+        self.pad_or_trim = pad_or_trim
+        self.multilingual = self.model.model.is_multilingual
+        # the language token is replaced per clip with the detected one
+        self.tokenizer = Tokenizer(
+            self.model.hf_tokenizer, self.multilingual,
+            task="transcribe", language="en" if self.multilingual else None
+        )
+        print("✅ Whisper model loaded.")
+
+    def transcribe_batch(self, waveforms, sampling_rate=SAMPLE_RATE):
+        # Like the processor of the transformers engines: every clip's log-mel
+        # features are padded/trimmed to 30 s (3000 frames), so the whole batch
+        # goes through one encode and one generate call.
+        if len(waveforms) == 1:
+            return [self.transcribe(waveforms[0], sampling_rate)]
+        extractor = self.model.feature_extractor
+        features = np.stack([
+            self.pad_or_trim(extractor(np.asarray(w, dtype=np.float32)), extractor.nb_max_frames)
+            for w in waveforms
+        ])
+        encoder_output = self.model.encode(features)
+
+        prompt = self.tokenizer.sot_sequence + [self.tokenizer.no_timestamps]
+        prompts = [list(prompt) for _ in waveforms]
+        if self.multilingual:
+            for clip_prompt, languages in zip(prompts, self.model.model.detect_language(encoder_output)):
+                clip_prompt[1] = self.tokenizer.tokenizer.token_to_id(languages[0][0])
+
+        results = self.model.model.generate(
+            encoder_output, prompts, beam_size=WHISPER_BEAM_SIZE,
+            max_length=self.model.max_length, suppress_blank=True, suppress_tokens=[-1]
+        )
+        return [self.tokenizer.decode(result.sequences_ids[0]).strip() for result in results]
+
+    def transcribe(self, waveform, sampling_rate=SAMPLE_RATE):
+        segments, _ = self.model.transcribe(
+            np.asarray(waveform, dtype=np.float32), beam_size=WHISPER_BEAM_SIZE
+        )
+        return " ".join(seg.text.strip() for seg in segments)
+
+
+ENGINES = {
+    TransformersWhisperEngine.name: TransformersWhisperEngine,
+    QuantizedTorchWhisperEngine.name: QuantizedTorchWhisperEngine,
+    CTranslate2WhisperEngine.name: CTranslate2WhisperEngine,
+}
+
+# (pid, backend) -> engine: an engine loaded before a fork is never used in the
+# child, CTranslate2/torch thread pools don't survive fork()
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def get_transcription_engine(backend=None):
+    backend = backend or WHISPER_BACKEND
+    if backend not in ENGINES:
+        raise ValueError(f"Unknown WHISPER_BACKEND '{backend}'. Choose one of: {', '.join(ENGINES)}")
+    key = (os.getpid(), backend)
+    with _engines_lock:
+        if key not in _engines:
+            _engines[key] = ENGINES[backend]()
+        return _engines[key]
+
+
+def audio_duration(path):
+    info = sf.info(path)
+    return info.frames / info.samplerate
+
+
+def _quietest_cut(window, sr):
+    """Index of the quietest SILENCE_FRAME_SECONDS frame in the tail of the window."""
+    frame = int(SILENCE_FRAME_SECONDS * sr)
+    search = min(len(window), int(SILENCE_SEARCH_SECONDS * sr))
+    tail = window[len(window) - search:]
+    n_frames = len(tail) // frame
+    if n_frames < 2:
+        return len(window)
+    energy = np.square(tail[: n_frames * frame].reshape(n_frames, frame)).mean(axis=1)
+    quietest = int(np.argmin(energy))
+    return len(window) - search + quietest * frame + frame // 2
+
+
+def iter_windows(path, start=0):
+    """
+    Yield (start_sample, next_start_sample, audio) windows of at most WINDOW_SECONDS.
+
+    Reads the file window by window, so memory stays bounded however long the
+    recording is. Each window ends at the quietest point of its last
+    SILENCE_SEARCH_SECONDS and the next one starts WINDOW_OVERLAP_SECONDS
+    before that cut, so a word split at the boundary is heard twice.
+    """
+    with sf.SoundFile(path) as f:
+        sr = f.samplerate
+        window_len = int(WINDOW_SECONDS * sr)
+        overlap = int(WINDOW_OVERLAP_SECONDS * sr)
+        total = f.frames
+        while start < total:
+            f.seek(start)
+            audio = f.read(window_len, dtype="float32", always_2d=True).mean(axis=1)
+            if start + len(audio) >= total:
+                yield start, total, audio
+                return
+            cut = _quietest_cut(audio, sr)
+            yield start, start + cut - overlap, audio[:cut]
+            start += max(cut - overlap, 1)
+
+
+def stitch(text, addition, max_overlap_words=12):
+    """Append addition to text, dropping words repeated across the window overlap."""
+    if not text:
+        return addition.strip()
+    prev, new = text.split(), addition.split()
+    norm = lambda w: w.strip(".,!?;:\"'").lower()
+    for k in range(min(max_overlap_words, len(prev), len(new)), 0, -1):
+        if [norm(w) for w in prev[-k:]] == [norm(w) for w in new[:k]]:
+            new = new[k:]
+            break
+    return " ".join(prev + new)
+
+
+def _read_partial(partial_path):
+    text, next_start = "", 0
+    if partial_path and os.path.exists(partial_path):
+        with open(partial_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break  # torn last line from a crash; redo that window
+                text = stitch(text, entry["text"])
+                next_start = entry["next_start"]
+    return text, next_start
+
+
+def transcribe_long_audio(path, engine=None, partial_path=None):
+    """
+    Transcribe a 16 kHz mono wav of any length.
+
+    Short clips go straight to the engine. Longer ones are split with
+    iter_windows() and transcribed LONG_FORM_BATCH windows at a time (one
+    batched call per group). If partial_path is given, every finished window
+    is appended to it as a JSON line, so progress is visible while the job
+    runs and an interrupted job resumes from the last finished window.
+    """
+    engine = engine or get_transcription_engine()
+    if audio_duration(path) <= WINDOW_SECONDS:
+        speech, sr = load_wav(path)
+        return engine.transcribe(speech, sampling_rate=sr)
+
+    sr = sf.info(path).samplerate
+    text, next_start = _read_partial(partial_path)
+    partial = open(partial_path, "a", encoding="utf-8") if partial_path else None
+    try:
+        batch = []
+        windows = iter_windows(path, start=next_start)
+        while True:
+            window = next(windows, None)
+            if window is not None:
+                batch.append(window)
+            if batch and (window is None or len(batch) >= LONG_FORM_BATCH):
+                texts = engine.transcribe_batch([audio for _, _, audio in batch], sampling_rate=sr)
+                for (_, window_next, _), window_text in zip(batch, texts):
+                    text = stitch(text, window_text)
+                    if partial:
+                        partial.write(json.dumps({"next_start": window_next, "text": window_text}, ensure_ascii=False) + "\n")
+                        partial.flush()
+                batch = []
+            if window is None:
+                break
+    finally:
+        if partial:
+            partial.close()
+    return text
@@ -0,0 +1,221 @@
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+
+from .transcription import load_wav, audio_duration, transcribe_long_audio, WINDOW_SECONDS
+
+
+# === CONFIG ===
+TRANSCRIPTION_WORKERS = int(os.getenv("TRANSCRIPTION_WORKERS", "1"))
+# Recordings longer than one Whisper window run on these, so they never hold up a batch
+LONG_TRANSCRIPTION_WORKERS = int(os.getenv("LONG_TRANSCRIPTION_WORKERS", "1"))
+TRANSCRIPTION_QUEUE_SIZE = int(os.getenv("TRANSCRIPTION_QUEUE_SIZE", "64"))
+TRANSCRIPTION_MAX_BATCH = int(os.getenv("TRANSCRIPTION_MAX_BATCH", "8"))
+TRANSCRIPTION_BATCH_WAIT = float(os.getenv("TRANSCRIPTION_BATCH_WAIT", "0.25"))  # seconds to wait for more clips
+TRANSCRIPTION_JOB_HISTORY = 500  # finished jobs kept around for the status endpoint
+
+
+class TranscriptionQueue:
+    """
+    Background transcription for experience uploads.
+
+    submit() only records the job and returns its id. Worker threads take the
+    first pending job, wait up to TRANSCRIPTION_BATCH_WAIT for more to arrive,
+    and run up to TRANSCRIPTION_MAX_BATCH clips through one engine.transcribe_batch
+    call (one padded whisper generate call, whichever engine). Recordings
+    longer than one Whisper window are handed to separate long-form workers,
+    so an hour-long upload doesn't stall the short clips batched with it.
+    """
+
+    def __init__(self, get_engine, convert_to_wav, on_transcribed=None, on_finished=None,
+                 workers=TRANSCRIPTION_WORKERS, long_workers=LONG_TRANSCRIPTION_WORKERS, max_queue=TRANSCRIPTION_QUEUE_SIZE,
+                 max_batch=TRANSCRIPTION_MAX_BATCH, batch_wait=TRANSCRIPTION_BATCH_WAIT, start=True):
+        self.get_engine = get_engine
+        self.convert_to_wav = convert_to_wav
+        self.on_transcribed = on_transcribed
+        self.on_finished = on_finished
+        self.workers = workers
+        self.long_workers = long_workers
+        self.max_batch = max_batch
+        self.batch_wait = batch_wait
+
+        self.pending = queue.Queue(maxsize=max_queue)
+        self.long_pending = queue.Queue()   # already admitted through pending
+        self.jobs = {}
+        self.finished = deque()
+        self.lock = threading.Lock()
+
+        self.stats = {
+            "completed": 0,
+            "failed": 0,
+            "batches": 0,
+            "total_wait_s": 0.0,
+            "total_batch_size": 0,
+            "last_batch_size": 0,
+            "last_batch_s": 0.0,
+        }
+
+        if start:
+            self.start()
+
+    def start(self):
+        for i in range(self.workers):
+            threading.Thread(target=self._worker, name=f"transcriber-{i}", daemon=True).start()
+        for i in range(self.long_workers):
+            threading.Thread(target=self._long_worker, name=f"transcriber-long-{i}", daemon=True).start()
+
+    def submit(self, audio_path, transcript_path):
+        """Queue an uploaded clip. Raises queue.Full when the backlog is at capacity."""
+        job_id = uuid.uuid4().hex
+        job = {
+            "id": job_id,
+            "status": "queued",
+            "audio_path": audio_path,
+            "transcript_path": transcript_path,
+            "submitted_at": time.time(),
+        }
+        with self.lock:
+            self.jobs[job_id] = job
+        try:
+            self.pending.put_nowait(job)
+        except queue.Full:
+            with self.lock:
+                del self.jobs[job_id]
+            raise
+        return job_id
+
+    def status(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            return {k: v for k, v in job.items() if k not in ("audio_path", "transcript_path", "wav_path", "partial_path")}
+
+    def metrics(self):
+        with self.lock:
+            stats = dict(self.stats)
+            running = sum(1 for j in self.jobs.values() if j["status"] == "running")
+        batches = stats.pop("batches")
+        done = stats["completed"] + stats["failed"]
+        return {
+            "queue_depth": self.pending.qsize(),
+            "long_queue_depth": self.long_pending.qsize(),
+            "running": running,
+            "completed": stats["completed"],
+            "failed": stats["failed"],
+            "batches": batches,
+            "avg_wait_s": stats["total_wait_s"] / done if done else 0.0,
+            "avg_batch_size": stats["total_batch_size"] / batches if batches else 0.0,
+            "last_batch_size": stats["last_batch_size"],
+            "last_batch_s": stats["last_batch_s"],
+            "max_batch": self.max_batch,
+        }
+
+    def _next_batch(self):
+        batch = [self.pending.get()]
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.pending.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _finish(self, job, status, **fields):
+        for path in (job.get("wav_path"), job.get("partial_path")):
+            if path and os.path.exists(path):
+                os.remove(path)
+        with self.lock:
+            job.update(status=status, finished_at=time.time(), **fields)
+            self.stats["completed" if status == "done" else "failed"] += 1
+            self.finished.append(job["id"])
+            while len(self.finished) > TRANSCRIPTION_JOB_HISTORY:
+                self.jobs.pop(self.finished.popleft(), None)
+        if self.on_finished is not None:
+            self.on_finished(self.status(job["id"]))
+
+    def _worker(self):
+        while True:
+            batch = self._next_batch()
+            started = time.time()
+            with self.lock:
+                for job in batch:
+                    job.update(status="running", started_at=started)
+                    self.stats["total_wait_s"] += started - job["submitted_at"]
+
+            # ffmpeg + decode per clip; a clip that fails here doesn't sink the batch.
+            # Recordings longer than one Whisper window go to the long-form
+            # workers, the short ones are batched together.
+            ready, waveforms = [], []
+            for job in batch:
+                job["wav_path"] = job["audio_path"].rsplit(".", 1)[0] + "_converted.wav"
+                try:
+                    self.convert_to_wav(job["audio_path"], job["wav_path"])
+                    if audio_duration(job["wav_path"]) > WINDOW_SECONDS:
+                        self.long_pending.put(job)
+                        continue
+                    speech, sr = load_wav(job["wav_path"])
+                    ready.append(job)
+                    waveforms.append(speech)
+                except Exception as e:
+                    print("❌ Failed to decode upload:", e)
+                    self._finish(job, "error", error="Audio saved, but could not be decoded.")
+
+            if not ready:
+                continue
+
+            try:
+                transcripts = self.get_engine().transcribe_batch(waveforms, sampling_rate=sr)
+            except Exception as e:
+                print("❌ Failed to transcribe batch:", e)
+                for job in ready:
+                    self._finish(job, "error", error="Audio saved, but transcription failed.")
+                continue
+
+            elapsed = time.time() - started
+            with self.lock:
+                self.stats["batches"] += 1
+                self.stats["total_batch_size"] += len(ready)
+                self.stats["last_batch_size"] = len(ready)
+                self.stats["last_batch_s"] = elapsed
+            print(f"📝 Transcribed batch of {len(ready)} in {elapsed:.1f}s.")
+
+            for job, transcript in zip(ready, transcripts):
+                self._save(job, transcript)
+
+    def _long_worker(self):
+        while True:
+            job = self.long_pending.get()
+            # Finished windows are streamed to the .partial.jsonl file while the
+            # job runs; jobs are not resumed after a restart, so it goes away
+            # with the converted wav however the job ends.
+            wav_path = job["wav_path"]
+            job["partial_path"] = wav_path.rsplit(".", 1)[0] + ".partial.jsonl"
+            start = time.time()
+            try:
+                transcript = transcribe_long_audio(wav_path, self.get_engine(), partial_path=job["partial_path"])
+            except Exception as e:
+                print("❌ Failed to transcribe long recording:", e)
+                self._finish(job, "error", error="Audio saved, but transcription failed.")
+                continue
+            print(f"📝 Transcribed {audio_duration(wav_path):.0f}s recording in {time.time() - start:.1f}s.")
+            self._save(job, transcript)
+
+    def _save(self, job, transcript):
+        try:
+            with open(job["transcript_path"], "w", encoding="utf-8") as f:
+                f.write(transcript.strip())
+            if self.on_transcribed is not None:
+                self.on_transcribed(job["transcript_path"])
+            self._finish(job, "done")
+            return True
+        except Exception as e:
+            print("❌ Failed to save transcript:", e)
+            self._finish(job, "error", error="Audio saved, but transcript could not be written.")
+            return False
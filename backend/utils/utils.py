@@ -2,12 +2,10 @@
 import numpy as np
 
 import soundfile as sf
-import torch, torchaudio
 import subprocess
-from transformers import WhisperProcessor, WhisperForConditionalGeneration
 
 
-import os, io, shutil
+import os, io, shutil, json, threading, asyncio
 from openai import AzureOpenAI, AsyncAzureOpenAI
 import base64
 
@@ -17,15 +15,14 @@ from typing import Any, List
 
 import requests
 import pandas as pd
-from llama_index.experimental.query_engine import PandasQueryEngine
 from llama_index.core.memory.types import BaseMemory
 
+from .transcription import get_transcription_engine, transcribe_long_audio
+from .prompt_registry import prompts
 
-whisper_device = "cuda" if torch.cuda.is_available() else "cpu"
-print(f"🔄 Loading Whisper model on {whisper_device}...")
-whisper_processor = WhisperProcessor.from_pretrained("openai/whisper-small")
-whisper_model = WhisperForConditionalGeneration.from_pretrained("openai/whisper-small").to(whisper_device)
-print("✅ Whisper model loaded.")
+
+# Backend is picked with WHISPER_BACKEND (see utils/transcription.py); the
+# model is loaded on first use (or by the server's warm-up), not at import
 
 
 
@@ -35,9 +32,9 @@ THINGSPEAK_URL = (
     "https://api.thingspeak.com/channels/2974588/feeds.json?results=100"
 )
 
-def fetch_lahn_sensors_df() -> pd.DataFrame:
+def fetch_lahn_sensors_df(url: str = THINGSPEAK_URL) -> pd.DataFrame:
     print('Fetching Lahn sensor data...')
-    resp = requests.get(THINGSPEAK_URL)
+    resp = requests.get(url, timeout=30)
     resp.raise_for_status()
     data = resp.json()
     # extract channel metadata → used for human‐friendly column names
@@ -54,6 +51,7 @@ def fetch_lahn_sensors_df() -> pd.DataFrame:
     df["created_at"] = pd.to_datetime(df["created_at"])
     for col in field_map.values():
         df[col] = pd.to_numeric(df[col], errors="coerce")
+    df.attrs["fields"] = list(field_map.values())
     return df
 
 # 2) Wrap it in a callable that runs PandasQueryEngine on demand
@@ -69,10 +67,14 @@ class LahnSensorsTool:
 
     def __call__(self, query: str) -> str:
         print('Calling Lahn Sensors Tool...')
+        # experimental package, imported on first use to keep startup light
+        from .sensor_query import CachedPandasQueryEngine
+
         # fetch fresh data
         df = fetch_lahn_sensors_df()
-        # spin up a Pandas‐powered engine on it
-        engine = PandasQueryEngine(
+        # spin up a Pandas‐powered engine on it; the generated code is cached
+        # and runs in the sandbox processes (utils/pandas_sandbox.py)
+        engine = CachedPandasQueryEngine(
             df=df,
             llm=self.llm,             # or your preferred LLM wrapper
             verbose=True,             # shows generated pandas code
@@ -169,14 +171,8 @@ def transcribe_audio(file_path):
     temp_wav_path = file_path.rsplit(".", 1)[0] + "_converted.wav"
     convert_to_wav(file_path, temp_wav_path)
 
-    speech, sr = torchaudio.load(temp_wav_path)
-    input_features = whisper_processor(
-        speech.squeeze(), sampling_rate=sr, return_tensors="pt"
-    ).input_features.to(whisper_device)
-
-    predicted_ids = whisper_model.generate(input_features)
-    transcription = whisper_processor.batch_decode(predicted_ids, skip_special_tokens=True)[0]
-    return transcription
+    # windowed, so recordings longer than 30 s are no longer cut off
+    return transcribe_long_audio(temp_wav_path, get_transcription_engine())
 
 
 
@@ -195,6 +191,19 @@ INPUT_FORMAT = 'pcm16'
 OUTPUT_SAMPLERATE = 24000  # Hz for playback/writing WAV
 TARGET_SR = 16000  
 
+# Streaming (full-duplex) voice settings. The realtime API expects pcm16 mono
+# at 24 kHz when audio is appended to its input buffer, so the browser records
+# at that rate and the reply is played back at the same rate.
+STREAM_SAMPLERATE = 24000
+VAD_THRESHOLD = float(os.getenv("VAD_THRESHOLD", "0.5"))
+VAD_PREFIX_PADDING_MS = int(os.getenv("VAD_PREFIX_PADDING_MS", "300"))
+VAD_SILENCE_DURATION_MS = int(os.getenv("VAD_SILENCE_DURATION_MS", "500"))
+
+
+def read_system_prompt():
+    # in memory, kept current by the prompt registry's watcher
+    return prompts.get("avatar")
+
 async def azure_speech_response_func(input_path: str) -> tuple[str, bytes]:
     wav_file = input_path.split('.')[0] + ".wav"
 
@@ -217,15 +226,7 @@ async def azure_speech_response_func(input_path: str) -> tuple[str, bytes]:
         api_version=API_VERSION,
     )
 
-	# Get the directory where the current script is located
-    base_dir = os.path.dirname(os.path.abspath(__file__))
-    # print('Base directory: ', base_dir)
-
-	# Build a path to the target file
-    file_path = os.path.join(base_dir, 'system_prompt.txt')
-
-    system_prompt = open(file_path, 'r').read()
-    # print('System prompt: ', system_prompt[:50])
+    system_prompt = read_system_prompt()
 
     async with client.beta.realtime.connect(model=DEPLOYMENT_ID) as conn:
         # Session update
@@ -277,3 +278,100 @@ async def azure_speech_response_func(input_path: str) -> tuple[str, bytes]:
     bio = io.BytesIO()
     sf.write(bio, audio_np, OUTPUT_SAMPLERATE, format='WAV', subtype='PCM_16')
     return reply_text, bio.getvalue()
+
+
+async def azure_speech_stream_func(ws):
+    """
+    Full-duplex voice session over a websocket.
+
+    The client sends raw pcm16 (24 kHz, mono) frames as binary messages while
+    the visitor is still talking. Frames are appended to the realtime input
+    buffer as they arrive and the server-side VAD decides when a turn ends and
+    triggers the response. Reply audio is sent back as binary pcm16 frames on
+    the same socket, text/turn events as small JSON messages.
+    A text message {"type": "stop"} (or closing the socket) ends the session.
+    """
+    loop = asyncio.get_running_loop()
+    mic_queue = asyncio.Queue()
+
+    def pump_client_audio():
+        # flask-sock sockets are blocking, so read them on a helper thread
+        # and hand the frames over to the event loop.
+        while True:
+            try:
+                msg = ws.receive()
+            except Exception:
+                msg = None
+            if isinstance(msg, str):
+                # the only text frame is {"type": "stop"}; audio comes as bytes
+                try:
+                    control = json.loads(msg)
+                except ValueError:
+                    continue
+                if not (isinstance(control, dict) and control.get("type") == "stop"):
+                    continue
+                msg = None
+            loop.call_soon_threadsafe(mic_queue.put_nowait, msg)
+            if msg is None:
+                break
+
+    threading.Thread(target=pump_client_audio, daemon=True).start()
+
+    client = AsyncAzureOpenAI(
+        azure_endpoint=AZURE_ENDPOINT,
+        api_key=AZURE_KEY,
+        api_version=API_VERSION,
+    )
+
+    async with client.beta.realtime.connect(model=DEPLOYMENT_ID) as conn:
+        await conn.session.update(session={
+            "modalities": ["text", "audio"],
+            "instructions": read_system_prompt(),
+            "voice": "alloy",
+            "input_audio_format": INPUT_FORMAT,
+            "output_audio_format": INPUT_FORMAT,
+            "turn_detection": {
+                "type": "server_vad",
+                "threshold": VAD_THRESHOLD,
+                "prefix_padding_ms": VAD_PREFIX_PADDING_MS,
+                "silence_duration_ms": VAD_SILENCE_DURATION_MS,
+                "create_response": True,
+            },
+        })
+        async for ev in conn:
+            if ev.type == "session.updated":
+                break
+            if ev.type == "error":
+                raise RuntimeError(f"Session error: {ev.model_dump()}")
+
+        ws.send(json.dumps({"type": "ready", "sample_rate": STREAM_SAMPLERATE}))
+
+        async def forward_mic():
+            while True:
+                frame = await mic_queue.get()
+                if frame is None:
+                    break
+                await conn.input_audio_buffer.append(audio=base64.b64encode(frame).decode())
+
+        async def forward_replies():
+            async for ev in conn:
+                if ev.type == "response.audio.delta":
+                    ws.send(base64.b64decode(ev.delta))
+                elif ev.type in ("response.text.delta", "response.audio_transcript.delta"):
+                    ws.send(json.dumps({"type": "text", "delta": ev.delta}))
+                elif ev.type == "input_audio_buffer.speech_started":
+                    # lets the client stop playback when the visitor barges in
+                    ws.send(json.dumps({"type": "speech_started"}))
+                elif ev.type == "input_audio_buffer.speech_stopped":
+                    ws.send(json.dumps({"type": "speech_stopped"}))
+                elif ev.type == "response.done":
+                    ws.send(json.dumps({"type": "done"}))
+                elif ev.type == "error":
+                    print("❌ Realtime error:", ev.model_dump())
+                    ws.send(json.dumps({"type": "error"}))
+
+        reply_task = asyncio.create_task(forward_replies())
+        try:
+            await forward_mic()
+        finally:
+            reply_task.cancel()
@@ -0,0 +1,339 @@
+import os
+import json
+import threading
+from typing import Any, List, Optional
+
+import numpy as np
+from pydantic import PrivateAttr
+
+from llama_index.core.schema import BaseNode
+from llama_index.core.vector_stores.types import (
+    BasePydanticVectorStore,
+    VectorStoreQuery,
+    VectorStoreQueryResult,
+)
+from llama_index.core.vector_stores.simple import SimpleVectorStore
+
+
+# === CONFIG ===
+# "mmap": MmapVectorStore below; "simple": LlamaIndex's JSON SimpleVectorStore
+VECTOR_STORE = os.getenv("VECTOR_STORE", "mmap")
+VECTOR_DTYPE = os.getenv("VECTOR_DTYPE", "float32")   # or "float16" to halve the file
+VECTORS_FILE = "vectors.npy"
+VECTOR_IDS_FILE = "vector_ids.json"
+SIMPLE_STORE_FILE = "default__vector_store.json"
+SCORE_BLOCK_ROWS = 65536   # float16 rows are upcast block by block while scoring
+
+# Approximate search (IVF): vectors are clustered into ANN_LISTS cells and a
+# query only scores the rows of its ANN_NPROBE closest cells. More probes ->
+# higher recall, more work. Below ANN_MIN_VECTORS the exact scan is used.
+ANN_INDEX = os.getenv("ANN_INDEX", "ivf")            # "ivf" or "exact"
+ANN_LISTS = int(os.getenv("ANN_LISTS", "0"))         # 0: about 4 * sqrt(n)
+ANN_NPROBE = int(os.getenv("ANN_NPROBE", "16"))
+ANN_MIN_VECTORS = int(os.getenv("ANN_MIN_VECTORS", "5000"))
+IVF_FILE = "ivf.npz"
+
+
+class IVFIndex:
+    """
+    Inverted-file index over the rows of vectors.npy.
+
+    Spherical k-means centroids plus each row's cell, with the rows grouped by
+    cell (order/offsets) so a probe is a slice. Built at persist time; rows
+    added afterwards sit in the store's tail and are always scanned exactly,
+    deleted rows are masked like in the exact path.
+    """
+
+    def __init__(self, centroids, assign, trained_rows):
+        self.centroids = centroids.astype(np.float32)
+        self.assign = assign.astype(np.int32)
+        self.trained_rows = trained_rows
+        self.order = np.argsort(self.assign, kind="stable")
+        self.offsets = np.searchsorted(self.assign[self.order], np.arange(len(self.centroids) + 1))
+
+    @classmethod
+    def train(cls, matrix, n_lists=0, iterations=10, sample=50000, seed=0):
+        n = matrix.shape[0]
+        n_lists = n_lists or max(1, int(4 * np.sqrt(n)))
+        rng = np.random.default_rng(seed)
+        rows = np.sort(rng.choice(n, size=min(n, max(sample, n_lists * 40)), replace=False))
+        data = np.asarray(matrix[rows], dtype=np.float32)
+        n_lists = min(n_lists, len(data))
+        centroids = data[rng.choice(len(data), size=n_lists, replace=False)]
+        for _ in range(iterations):
+            labels = np.argmax(data @ centroids.T, axis=1)
+            for c in range(n_lists):
+                members = data[labels == c]
+                if len(members):
+                    centroids[c] = members.sum(axis=0)
+                else:
+                    centroids[c] = data[rng.integers(len(data))]  # re-seed empty cells
+            centroids = _normalise(centroids)
+        return cls(centroids, cls._assign(matrix, centroids), n)
+
+    @classmethod
+    def update(cls, previous, matrix, n_lists=0):
+        """Keep the centroids while the corpus has grown less than 2x since training, retrain otherwise."""
+        n = matrix.shape[0]
+        if previous is None or n > 2 * previous.trained_rows or (n_lists and n_lists != len(previous.centroids)):
+            return cls.train(matrix, n_lists)
+        return cls(previous.centroids, cls._assign(matrix, previous.centroids), previous.trained_rows)
+
+    @staticmethod
+    def _assign(matrix, centroids):
+        return np.concatenate([
+            np.argmax(np.asarray(matrix[i:i + SCORE_BLOCK_ROWS], dtype=np.float32) @ centroids.T, axis=1)
+            for i in range(0, matrix.shape[0], SCORE_BLOCK_ROWS)
+        ]).astype(np.int32)
+
+    def candidates(self, query, nprobe):
+        """Row numbers (sorted) in the nprobe cells closest to the query."""
+        nprobe = min(nprobe, len(self.centroids))
+        cells = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        rows = np.concatenate([self.order[self.offsets[c]:self.offsets[c + 1]] for c in cells])
+        return np.sort(rows)
+
+    def save(self, path):
+        with open(path + ".tmp", "wb") as f:
+            np.savez(f, centroids=self.centroids, assign=self.assign, trained_rows=self.trained_rows)
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, path, rows):
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            if len(data["assign"]) != rows:
+                return None  # written for another vectors.npy; rebuilt on the next persist
+            return cls(data["centroids"], data["assign"], int(data["trained_rows"]))
+
+
+class _Snapshot:
+    """Immutable view of the store; queries take one and never see a half-applied insert."""
+
+    def __init__(self, base, tail, ids, ref_doc_ids, alive, ivf=None):
+        self.base = base                # (n, d) memmap from vectors.npy, read-only
+        self.tail = tail                # (m, d) float32 rows added since the last persist
+        self.ids = ids                  # node id per row, base rows first
+        self.ref_doc_ids = ref_doc_ids  # ref doc id per row
+        self.alive = alive              # bool per row, False once deleted
+        self.ivf = ivf                  # IVFIndex over the base rows, or None for exact search
+
+    @property
+    def dim(self):
+        for matrix in (self.base, self.tail):
+            if matrix is not None and matrix.shape[0]:
+                return matrix.shape[1]
+        return None
+
+
+class MmapVectorStore(BasePydanticVectorStore):
+    """
+    Exact cosine vector store backed by a memory-mapped .npy matrix.
+
+    Vectors are L2-normalised when added, so a query is one matrix-vector
+    product over the mapped file plus argpartition for the top-k. Loading only
+    maps the file and reads the id table (vector_ids.json), so startup does not
+    parse any embeddings and the pages are shared with the OS page cache.
+    Rows added after loading live in a small in-memory tail until persist()
+    rewrites the file; deletes just mark rows dead until then.
+
+    With ANN_INDEX=ivf and at least ANN_MIN_VECTORS rows, persist() also
+    writes an IVF index (ivf.npz) and queries only score the base rows of the
+    `nprobe` closest cells; `nprobe=None` per query forces the exact scan.
+    """
+
+    stores_text: bool = False
+    is_embedding_query: bool = True
+
+    _snapshot: Any = PrivateAttr()
+    _write_lock: Any = PrivateAttr()
+    _dtype: Any = PrivateAttr()
+    nprobe: int = ANN_NPROBE
+
+    def __init__(self, snapshot=None, dtype=VECTOR_DTYPE, **kwargs):
+        super().__init__(**kwargs)
+        self._snapshot = snapshot or _Snapshot(None, None, [], [], np.zeros(0, dtype=bool))
+        self._write_lock = threading.Lock()
+        self._dtype = np.dtype(dtype)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "MmapVectorStore"
+
+    @property
+    def client(self) -> Any:
+        return None
+
+    @classmethod
+    def from_persist_dir(cls, persist_dir, dtype=VECTOR_DTYPE):
+        vectors_path = os.path.join(persist_dir, VECTORS_FILE)
+        ids_path = os.path.join(persist_dir, VECTOR_IDS_FILE)
+        if not os.path.exists(vectors_path):
+            simple_path = os.path.join(persist_dir, SIMPLE_STORE_FILE)
+            if os.path.exists(simple_path):
+                # one-off migration from the JSON store written by older builds
+                print(f'Converting {simple_path} to {VECTORS_FILE}...')
+                store = cls.from_simple_store(SimpleVectorStore.from_persist_path(simple_path), dtype)
+                store.persist(os.path.join(persist_dir, SIMPLE_STORE_FILE))
+                return store
+            return cls(dtype=dtype)
+
+        base = np.load(vectors_path, mmap_mode="r")
+        with open(ids_path, encoding="utf-8") as f:
+            table = json.load(f)
+        ivf = IVFIndex.load(os.path.join(persist_dir, IVF_FILE), base.shape[0]) if ANN_INDEX == "ivf" else None
+        snapshot = _Snapshot(base, None, table["ids"], table["ref_doc_ids"], np.ones(len(table["ids"]), dtype=bool), ivf)
+        return cls(snapshot=snapshot, dtype=base.dtype)
+
+    @classmethod
+    def from_simple_store(cls, simple_store, dtype=VECTOR_DTYPE):
+        data = simple_store.data
+        ids = list(data.embedding_dict)
+        store = cls(dtype=dtype)
+        if ids:
+            tail = _normalise(np.asarray([data.embedding_dict[i] for i in ids], dtype=np.float32))
+            ref_doc_ids = [data.text_id_to_ref_doc_id.get(i) for i in ids]
+            store._snapshot = _Snapshot(None, tail, ids, ref_doc_ids, np.ones(len(ids), dtype=bool))
+        return store
+
+    def add(self, nodes: List[BaseNode], **add_kwargs: Any) -> List[str]:
+        if not nodes:
+            return []
+        vectors = _normalise(np.asarray([node.get_embedding() for node in nodes], dtype=np.float32))
+        with self._write_lock:
+            snap = self._snapshot
+            tail = vectors if snap.tail is None else np.vstack([snap.tail, vectors])
+            self._snapshot = _Snapshot(
+                snap.base, tail,
+                snap.ids + [node.node_id for node in nodes],
+                snap.ref_doc_ids + [node.ref_doc_id for node in nodes],
+                np.concatenate([snap.alive, np.ones(len(nodes), dtype=bool)]),
+                snap.ivf,
+            )
+        return [node.node_id for node in nodes]
+
+    def node_ids(self):
+        """Ids of the nodes that currently have a vector."""
+        snap = self._snapshot
+        return {i for i, keep in zip(snap.ids, snap.alive) if keep}
+
+    def delete(self, ref_doc_id: str, **delete_kwargs: Any) -> None:
+        with self._write_lock:
+            snap = self._snapshot
+            alive = snap.alive.copy()
+            for row, rid in enumerate(snap.ref_doc_ids):
+                if rid == ref_doc_id:
+                    alive[row] = False
+            self._snapshot = _Snapshot(snap.base, snap.tail, snap.ids, snap.ref_doc_ids, alive, snap.ivf)
+
+    def delete_nodes(self, node_ids: Optional[List[str]] = None, filters=None, **delete_kwargs: Any) -> None:
+        drop = set(node_ids or [])
+        with self._write_lock:
+            snap = self._snapshot
+            alive = snap.alive & np.fromiter((i not in drop for i in snap.ids), dtype=bool, count=len(snap.ids))
+            self._snapshot = _Snapshot(snap.base, snap.tail, snap.ids, snap.ref_doc_ids, alive, snap.ivf)
+
+    def _scores(self, snap, query):
+        """Scores for every row; used for the exact scan."""
+        parts = []
+        if snap.base is not None and snap.base.shape[0]:
+            if snap.base.dtype == np.float32:
+                parts.append(snap.base @ query)
+            else:
+                parts.extend(
+                    snap.base[i:i + SCORE_BLOCK_ROWS].astype(np.float32) @ query
+                    for i in range(0, snap.base.shape[0], SCORE_BLOCK_ROWS)
+                )
+        if snap.tail is not None and snap.tail.shape[0]:
+            parts.append(snap.tail @ query)
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=np.float32)
+
+    def query(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        if query.filters is not None:
+            raise ValueError("MmapVectorStore does not support metadata filters.")
+        snap = self._snapshot
+        if not snap.ids:
+            return VectorStoreQueryResult(ids=[], similarities=[])
+
+        q = _normalise(np.asarray(query.query_embedding, dtype=np.float32)[None, :])[0]
+        mask = snap.alive
+        if query.node_ids is not None:
+            wanted = set(query.node_ids)
+            mask = mask & np.fromiter((i in wanted for i in snap.ids), dtype=bool, count=len(snap.ids))
+
+        nprobe = kwargs.get("nprobe", self.nprobe)
+        if snap.ivf is not None and nprobe and query.node_ids is None:
+            n_base = snap.base.shape[0]
+            rows = np.concatenate([snap.ivf.candidates(q, nprobe), np.arange(n_base, len(snap.ids))])
+            scores = np.asarray(snap.base[rows[rows < n_base]], dtype=np.float32) @ q
+            if snap.tail is not None and snap.tail.shape[0]:
+                scores = np.concatenate([scores, snap.tail @ q])
+        else:
+            rows = np.arange(len(snap.ids))
+            scores = self._scores(snap, q)
+        scores = np.where(mask[rows], scores, -np.inf)
+
+        k = min(query.similarity_top_k, int(np.isfinite(scores).sum()))
+        if k <= 0:
+            return VectorStoreQueryResult(ids=[], similarities=[])
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return VectorStoreQueryResult(
+            ids=[snap.ids[rows[i]] for i in top],
+            similarities=[float(scores[i]) for i in top],
+        )
+
+    def persist(self, persist_path: str, fs=None) -> None:
+        """Write live rows to vectors.npy + vector_ids.json next to persist_path, then map the new file."""
+        persist_dir = os.path.dirname(persist_path) or "."
+        os.makedirs(persist_dir, exist_ok=True)
+        vectors_path = os.path.join(persist_dir, VECTORS_FILE)
+        ids_path = os.path.join(persist_dir, VECTOR_IDS_FILE)
+
+        with self._write_lock:
+            snap = self._snapshot
+            dim = snap.dim or 0
+            parts = [m for m in (snap.base, snap.tail) if m is not None and m.shape[0]]
+            matrix = np.concatenate(parts) if parts else np.zeros((0, dim), dtype=np.float32)
+            matrix = np.ascontiguousarray(matrix[snap.alive], dtype=self._dtype)
+            ids = [i for i, keep in zip(snap.ids, snap.alive) if keep]
+            ref_doc_ids = [r for r, keep in zip(snap.ref_doc_ids, snap.alive) if keep]
+
+            with open(vectors_path + ".tmp", "wb") as f:
+                np.save(f, matrix)
+            with open(ids_path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump({"ids": ids, "ref_doc_ids": ref_doc_ids}, f)
+            os.replace(vectors_path + ".tmp", vectors_path)
+            os.replace(ids_path + ".tmp", ids_path)
+
+            base = np.load(vectors_path, mmap_mode="r")
+            ivf_path = os.path.join(persist_dir, IVF_FILE)
+            ivf = None
+            if ANN_INDEX == "ivf" and len(ids) >= ANN_MIN_VECTORS:
+                ivf = IVFIndex.update(snap.ivf, base, ANN_LISTS)
+                ivf.save(ivf_path)
+            elif os.path.exists(ivf_path):
+                os.remove(ivf_path)
+            self._snapshot = _Snapshot(base, None, ids, ref_doc_ids, np.ones(len(ids), dtype=bool), ivf)
+
+        # the JSON store is superseded; don't leave a stale copy to be loaded by mistake
+        simple_path = os.path.join(persist_dir, SIMPLE_STORE_FILE)
+        if os.path.exists(simple_path):
+            os.remove(simple_path)
+
+
+def _normalise(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def new_vector_store():
+    return MmapVectorStore() if VECTOR_STORE == "mmap" else SimpleVectorStore()
+
+
+def load_vector_store(persist_dir):
+    if VECTOR_STORE == "mmap":
+        return MmapVectorStore.from_persist_dir(persist_dir)
+    return SimpleVectorStore.from_persist_path(os.path.join(persist_dir, SIMPLE_STORE_FILE))
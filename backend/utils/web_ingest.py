@@ -0,0 +1,230 @@
+import os
+import re
+import json
+import hashlib
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
+from urllib.parse import urlparse, parse_qs
+
+import requests
+from llama_index.core.schema import Document as LlamaDocument
+
+
+# === CONFIG ===
+WEB_CACHE_DIR = os.getenv("WEB_CACHE_DIR", "./cache/web")
+FETCH_WORKERS = int(os.getenv("FETCH_WORKERS", "8"))
+FETCH_PER_HOST = int(os.getenv("FETCH_PER_HOST", "2"))
+FETCH_TIMEOUT = float(os.getenv("FETCH_TIMEOUT", "15"))
+MAX_DOC_CHARS = int(os.getenv("MAX_DOC_CHARS", "20000"))
+MIN_LINE_WORDS = 5        # shorter lines are usually menu entries, buttons or captions
+USER_AGENT = "Mozilla/5.0 (compatible; LahnAvatar/1.0)"
+
+# Elements whose text is never article content
+BOILERPLATE_TAGS = {"script", "style", "noscript", "nav", "header", "footer", "aside", "form",
+                    "svg", "button", "iframe", "template", "figure"}
+BLOCK_TAGS = {"p", "div", "section", "article", "main", "li", "ul", "ol", "br", "h1", "h2", "h3",
+              "h4", "h5", "h6", "blockquote", "pre", "table", "tr", "td", "th"}
+
+
+class _TextExtractor(HTMLParser):
+    """Collects visible text, skipping boilerplate elements; text inside <article>/<main> is kept apart."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        # Only the skipped/main tag itself is counted, so unclosed <p> or <li>
+        # inside a <nav> can't throw the nesting off.
+        self.skip_tag = None
+        self.skip_depth = 0
+        self.main_depth = 0
+        self.parts = []
+        self.main_parts = []
+        self.title = ""
+        self.in_title = False
+
+    def handle_starttag(self, tag, attrs):
+        if self.skip_tag:
+            if tag == self.skip_tag:
+                self.skip_depth += 1
+            return
+        if tag in BOILERPLATE_TAGS:
+            self.skip_tag, self.skip_depth = tag, 1
+            return
+        if tag in ("article", "main"):
+            self.main_depth += 1
+        if tag == "title":
+            self.in_title = True
+        if tag in BLOCK_TAGS:
+            self._add("\n")
+
+    def handle_endtag(self, tag):
+        if self.skip_tag:
+            if tag == self.skip_tag:
+                self.skip_depth -= 1
+                if not self.skip_depth:
+                    self.skip_tag = None
+            return
+        if tag == "title":
+            self.in_title = False
+        if tag in BLOCK_TAGS:
+            self._add("\n")
+        if tag in ("article", "main") and self.main_depth:
+            self.main_depth -= 1
+
+    def handle_data(self, data):
+        if self.skip_tag:
+            return
+        if self.in_title:
+            self.title += data
+            return
+        self._add(data)
+
+    def _add(self, text):
+        self.parts.append(text)
+        if self.main_depth:
+            self.main_parts.append(text)
+
+
+def extract_main_text(html, max_chars=MAX_DOC_CHARS):
+    """Visible article text of an HTML page: boilerplate elements and short menu-like lines dropped, size-capped."""
+    parser = _TextExtractor()
+    parser.feed(html)
+    parser.close()
+    main = "".join(parser.main_parts)
+    raw = main if len(main.split()) >= 50 else "".join(parser.parts)
+
+    lines = []
+    for line in raw.split("\n"):
+        line = " ".join(line.split())
+        if len(line.split()) >= MIN_LINE_WORDS:
+            lines.append(line)
+    text = "\n".join(lines)
+    return " ".join(parser.title.split()), text[:max_chars]
+
+
+def youtube_video_id(url):
+    parsed = urlparse(url)
+    if "youtube.com" in parsed.netloc:
+        video_id = parse_qs(parsed.query).get("v", [None])[0]
+    elif "youtu.be" in parsed.netloc:
+        video_id = parsed.path.lstrip("/")
+    else:
+        return None
+    return video_id if video_id and len(video_id) == 11 else None
+
+
+class NewsFetcher:
+    """
+    Fetches the news links and YouTube transcripts for the index.
+
+    URLs are fetched concurrently (FETCH_WORKERS in total, FETCH_PER_HOST per
+    host) with a timeout per request. Pages are revalidated with their stored
+    ETag/Last-Modified, so an unchanged page costs a 304 and no parsing; YouTube
+    transcripts are cached by video id. Documents are built in memory with the
+    URL as document id.
+    """
+
+    def __init__(self, cache_dir=WEB_CACHE_DIR, session=None, languages=("de",)):
+        self.cache_dir = cache_dir
+        self.session = session or requests.Session()
+        self.session.headers.setdefault("User-Agent", USER_AGENT)
+        self.languages = list(languages)
+        self.host_limits = defaultdict(lambda: threading.BoundedSemaphore(FETCH_PER_HOST))
+        self.host_limits_lock = threading.Lock()
+        os.makedirs(os.path.join(cache_dir, "http"), exist_ok=True)
+        os.makedirs(os.path.join(cache_dir, "youtube"), exist_ok=True)
+
+    def fetch_all(self, urls):
+        """Returns {url: LlamaDocument}; URLs that fail or have no usable text are left out."""
+        with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as pool:
+            results = pool.map(self._fetch_safe, urls)
+            return {url: doc for url, doc in zip(urls, results) if doc is not None}
+
+    def _fetch_safe(self, url):
+        try:
+            return self.fetch(url)
+        except Exception as e:
+            print(f"❌ Failed to fetch {url}: {e}")
+            return None
+
+    def fetch(self, url):
+        video_id = youtube_video_id(url)
+        if video_id:
+            text = self._youtube_text(video_id)
+            title = ""
+        elif "youtube.com" in url or "youtu.be" in url:
+            raise ValueError("Invalid YouTube video ID.")
+        else:
+            title, text = self._page_text(url)
+        if not text:
+            return None
+        metadata = {"source": url}
+        if title:
+            metadata["title"] = title
+        return LlamaDocument(text=text[:MAX_DOC_CHARS], id_=url, metadata=metadata)
+
+    def _host_limit(self, url):
+        with self.host_limits_lock:
+            return self.host_limits[urlparse(url).netloc]
+
+    def _cache_path(self, kind, key):
+        name = hashlib.sha1(key.encode()).hexdigest() if kind == "http" else key
+        return os.path.join(self.cache_dir, kind, name + ".json")
+
+    def _read_cache(self, path):
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        return None
+
+    def _write_cache(self, path, entry):
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(path + ".tmp", path)
+
+    def _page_text(self, url):
+        path = self._cache_path("http", url)
+        cached = self._read_cache(path)
+        headers = {}
+        if cached:
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        with self._host_limit(url):
+            resp = self.session.get(url, headers=headers, timeout=FETCH_TIMEOUT)
+        if resp.status_code == 304 and cached:
+            print(f"✅ Not modified: {url}")
+            return cached.get("title", ""), cached["text"]
+        resp.raise_for_status()
+
+        if "html" in resp.headers.get("Content-Type", "html"):
+            title, text = extract_main_text(resp.text)
+        else:
+            title, text = "", resp.text[:MAX_DOC_CHARS]
+        self._write_cache(path, {
+            "url": url,
+            "etag": resp.headers.get("ETag"),
+            "last_modified": resp.headers.get("Last-Modified"),
+            "title": title,
+            "text": text,
+        })
+        print(f"✅ Fetched {url} ({len(text)} chars)")
+        return title, text
+
+    def _youtube_text(self, video_id):
+        path = self._cache_path("youtube", video_id)
+        cached = self._read_cache(path)
+        if cached:
+            return cached["text"]
+
+        from youtube_transcript_api import YouTubeTranscriptApi
+
+        with self._host_limit("https://www.youtube.com"):
+            transcript = YouTubeTranscriptApi.get_transcript(video_id, languages=self.languages)
+        text = re.sub(r"\s+", " ", " ".join(entry["text"] for entry in transcript)).strip()
+        self._write_cache(path, {"video_id": video_id, "text": text})
+        print(f"✅ Fetched transcript for {video_id} ({len(text)} chars)")
+        return text
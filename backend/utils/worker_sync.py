@@ -0,0 +1,74 @@
+import os
+import json
+import time
+import fcntl
+import threading
+
+
+# === CONFIG ===
+# "single": one Flask process (python server.py)
+# "prefork": several gunicorn workers forked from a preloaded master (gunicorn.conf.py)
+SERVER_MODE = os.getenv("SERVER_MODE", "single")
+WORKER_EVENTS_FILE = os.getenv("WORKER_EVENTS_FILE", "./run/worker_events.jsonl")
+POLL_INTERVAL = 0.2
+
+
+class EventBus:
+    """
+    Broadcast between the worker processes of one machine.
+
+    publish() appends a JSON line to a shared file under an exclusive lock;
+    every worker tails the file from the position it had when it started and
+    calls the handlers registered for each event kind. A worker skips its own
+    events (it has already applied them). Events are small notifications
+    ("index version X is live"), the data itself is on disk.
+    """
+
+    def __init__(self, path=WORKER_EVENTS_FILE):
+        self.path = path
+        self.handlers = {}
+        self.offset = 0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def reset(self):
+        """Called once in the master before forking."""
+        with open(self.path, "w"):
+            pass
+
+    def on(self, kind, handler):
+        self.handlers[kind] = handler
+
+    def publish(self, kind, **data):
+        line = json.dumps({"pid": os.getpid(), "kind": kind, "data": data, "ts": time.time()}) + "\n"
+        with open(self.path, "a", encoding="utf-8") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            f.write(line)
+            f.flush()
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+    def start(self):
+        self.offset = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        threading.Thread(target=self._listen, name="worker-events", daemon=True).start()
+
+    def _listen(self):
+        pid = os.getpid()
+        while True:
+            time.sleep(POLL_INTERVAL)
+            try:
+                with open(self.path, "rb") as f:
+                    f.seek(self.offset)
+                    chunk = f.read()
+            except FileNotFoundError:
+                continue
+            # only consume complete lines; a line being written is picked up next time
+            complete = chunk[:chunk.rfind(b"\n") + 1]
+            self.offset += len(complete)
+            for line in complete.decode("utf-8").splitlines():
+                event = json.loads(line)
+                handler = self.handlers.get(event["kind"])
+                if event["pid"] == pid or handler is None:
+                    continue
+                try:
+                    handler(**event["data"])
+                except Exception as e:
+                    print(f"❌ Failed to apply {event['kind']} event: {e}")
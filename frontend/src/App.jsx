@@ -15,6 +15,7 @@ export default function LahnAvatarChat() {
   const [defaultThinking, setDefaultThinking] = useState(false);
   const [debateThinking, setDebateThinking] = useState(false);
   const [isDebateMode, setIsDebateMode] = useState(false);
+  // keep in sync with backend/utils/prompts/debate_topics.txt, whose openers the server precomputes
   const [topics] = useState(['The Lahn should have legal personhood', 'The Lahn should be able to own property', 'There should exist a “Lahn Fund”', 'The Avatar should be able to legally speak on behalf of the Lahn']);
   const [selectedTopic, setSelectedTopic] = useState("");
   const [debateSummary, setDebateSummary] = useState(`Lahn:\nPro:\nCon:\n\nYou:\nPro:\nCon:`);
@@ -99,7 +100,15 @@ export default function LahnAvatarChat() {
   const handleRefreshEmbeddings = async () => {
     setRefreshEmbeddingsState("loading");
     try {
-      await fetch("https://lahn-server.eastus.cloudapp.azure.com:5001/api/refresh-embeddings", { method: "POST" });
+      const res = await fetch("https://lahn-server.eastus.cloudapp.azure.com:5001/api/refresh-embeddings", { method: "POST" });
+      const { status_url } = await res.json();
+      // the rebuild runs in the background; poll until the new index is live
+      let job = { status: "running" };
+      while (job.status === "running") {
+        await new Promise((r) => setTimeout(r, 3000));
+        job = await (await fetch(`https://lahn-server.eastus.cloudapp.azure.com:5001${status_url}`)).json();
+      }
+      if (job.status !== "done") throw new Error(job.error || "Refresh failed");
       setRefreshEmbeddingsState("done");
       setTimeout(() => setRefreshEmbeddingsState("idle"), 1500);
     } catch {
@@ -2,22 +2,31 @@ import React, { useState, useRef, useEffect } from "react";
 import { Button } from "@/components/ui/button";
 import { Mic, StopCircle } from "lucide-react";
 
+const VOICE_STREAM_URL = "wss://lahn-server.eastus.cloudapp.azure.com:5001/api/voice-stream";
+const STREAM_SAMPLE_RATE = 24000; // pcm16 mono, matches the realtime session on the server
+const FRAME_SIZE = 2048;          // samples per mic frame (~85 ms)
+
 export default function VoiceChat() {
   const [recording, setRecording] = useState(false);
   const [reply, setReply] = useState("");
-  const mediaRecorderRef = useRef(null);
-  const audioChunksRef = useRef([]);
   const canvasRef = useRef(null);
   const animationRef = useRef(null);
   const analyserRef = useRef(null);
   const dataArrayRef = useRef(null);
   const audioCtxRef = useRef(null);
+  const wsRef = useRef(null);
+  const streamRef = useRef(null);
+  const processorRef = useRef(null);
+  const playheadRef = useRef(0);
+  const playingSourcesRef = useRef([]);
+  const newTurnRef = useRef(true);
 
   // Initialize canvas drawing context
   useEffect(() => {
     const canvas = canvasRef.current;
     const ctx = canvas.getContext("2d");
     ctx.clearRect(0, 0, canvas.width, canvas.height);
+    return () => stopRecording();
   }, []);
 
   // Draw waveform continuously
@@ -33,7 +42,7 @@ export default function VoiceChat() {
     ctx.fillStyle = "#f3f4f6";      // light bg
     ctx.fillRect(0, 0, canvas.width, canvas.height);
     ctx.lineWidth = 2;
-    ctx.strokeStyle = recording ? "#dc2626" : "#2563eb"; // red when rec, blue when playback
+    ctx.strokeStyle = "#dc2626";
     ctx.beginPath();
 
     const sliceWidth = canvas.width / bufferLength;
@@ -52,11 +61,69 @@ export default function VoiceChat() {
     animationRef.current = requestAnimationFrame(drawWave);
   };
 
+  // Queue a pcm16 reply chunk right after the previous one, so playback is gapless
+  const playPcmChunk = (arrayBuffer) => {
+    const audioCtx = audioCtxRef.current;
+    if (!audioCtx) return;
+    const int16 = new Int16Array(arrayBuffer);
+    const float32 = new Float32Array(int16.length);
+    for (let i = 0; i < int16.length; i++) float32[i] = int16[i] / 32768;
+
+    const buffer = audioCtx.createBuffer(1, float32.length, STREAM_SAMPLE_RATE);
+    buffer.copyToChannel(float32, 0);
+    const source = audioCtx.createBufferSource();
+    source.buffer = buffer;
+    source.connect(audioCtx.destination);
+
+    const startAt = Math.max(audioCtx.currentTime, playheadRef.current);
+    source.start(startAt);
+    playheadRef.current = startAt + buffer.duration;
+    playingSourcesRef.current.push(source);
+    source.onended = () => {
+      playingSourcesRef.current = playingSourcesRef.current.filter((s) => s !== source);
+    };
+  };
+
+  // Visitor started talking again: drop whatever reply audio is still queued
+  const stopPlayback = () => {
+    playingSourcesRef.current.forEach((s) => {
+      try { s.stop(); } catch (e) { /* already stopped */ }
+    });
+    playingSourcesRef.current = [];
+    playheadRef.current = 0;
+  };
+
+  const handleServerMessage = (event) => {
+    if (event.data instanceof ArrayBuffer) {
+      playPcmChunk(event.data);
+      return;
+    }
+    const msg = JSON.parse(event.data);
+    if (msg.type === "text") {
+      if (newTurnRef.current) {
+        setReply("");
+        newTurnRef.current = false;
+      }
+      setReply((prev) => prev + msg.delta);
+    } else if (msg.type === "speech_started") {
+      stopPlayback();
+    } else if (msg.type === "done") {
+      newTurnRef.current = true;
+    } else if (msg.type === "error") {
+      setReply("⚠️ Error during voice chat");
+    }
+  };
+
   const startRecording = async () => {
     setReply("");
-    // 1. get mic stream
-    const stream = await navigator.mediaDevices.getUserMedia({ audio: true });
-    const audioCtx = new (window.AudioContext || window.webkitAudioContext)();
+    newTurnRef.current = true;
+
+    // 1. get mic stream and an audio context running at the stream rate
+    const stream = await navigator.mediaDevices.getUserMedia({
+      audio: { channelCount: 1, echoCancellation: true, noiseSuppression: true },
+    });
+    streamRef.current = stream;
+    const audioCtx = new (window.AudioContext || window.webkitAudioContext)({ sampleRate: STREAM_SAMPLE_RATE });
     audioCtxRef.current = audioCtx;
 
     // 2. hook up analyser
@@ -72,74 +139,65 @@ export default function VoiceChat() {
     // 3. start draw loop
     drawWave();
 
-    // 4. set up recorder
-    audioChunksRef.current = [];
-    const mediaRecorder = new MediaRecorder(stream);
-    mediaRecorderRef.current = mediaRecorder;
-    mediaRecorder.ondataavailable = (e) => {
-      if (e.data.size > 0) audioChunksRef.current.push(e.data);
+    // 4. open the voice socket; mic frames go out as soon as the session is ready
+    const ws = new WebSocket(VOICE_STREAM_URL);
+    ws.binaryType = "arraybuffer";
+    wsRef.current = ws;
+    let ready = false;
+    ws.onmessage = (event) => {
+      if (!ready && typeof event.data === "string" && JSON.parse(event.data).type === "ready") {
+        ready = true;
+        return;
+      }
+      handleServerMessage(event);
+    };
+    ws.onerror = (err) => {
+      console.error("Voice stream error:", err);
+      setReply("⚠️ Error during voice chat");
     };
-    mediaRecorder.start();
+    ws.onclose = () => stopRecording();
+
+    // 5. stream mic pcm16 frames while the visitor is talking
+    const processor = audioCtx.createScriptProcessor(FRAME_SIZE, 1, 1);
+    processorRef.current = processor;
+    processor.onaudioprocess = (e) => {
+      if (!ready || ws.readyState !== WebSocket.OPEN) return;
+      const input = e.inputBuffer.getChannelData(0);
+      const pcm = new Int16Array(input.length);
+      for (let i = 0; i < input.length; i++) {
+        const s = Math.max(-1, Math.min(1, input[i]));
+        pcm[i] = s < 0 ? s * 0x8000 : s * 0x7fff;
+      }
+      ws.send(pcm.buffer);
+    };
+    source.connect(processor);
+    processor.connect(audioCtx.destination);
+
     setRecording(true);
   };
 
-  const stopRecording = async () => {
-    return new Promise((resolve) => {
-      const mediaRecorder = mediaRecorderRef.current;
-      const audioCtx = audioCtxRef.current;
-
-      // Close audio context and stop waveform
-      audioCtx.close();
-      cancelAnimationFrame(animationRef.current);
-      setRecording(false);
-
-      // On stop, assemble blob and send it
-      mediaRecorder.onstop = async () => {
-        const audioBlob = new Blob(audioChunksRef.current, { type: "audio/webm" });
-
-        // Upload
-        const formData = new FormData();
-        formData.append("audio", audioBlob, "recording.webm");
-
-        try {
-          const res = await fetch("https://lahn-server.eastus.cloudapp.azure.com:5001/api/voice-chat", { method: "POST", body: formData });
-          const data = await res.json();
-          setReply(data.reply_text || "(No text response)");
-
-          if (data.reply_audio_url) {
-            const audio = new Audio(data.reply_audio_url);
-            await audio.play();
-
-            // const ctx = new (window.AudioContext || window.webkitAudioContext)();
-            // audioCtxRef.current = ctx;
-            // const source = ctx.createMediaElementSource(audio);
-            // const analyser = ctx.createAnalyser();
-            // analyser.fftSize = 2048;
-            // source.connect(analyser);
-            // analyser.connect(ctx.destination);
-            // analyserRef.current = analyser;
-
-            // const bufferLength = analyser.frequencyBinCount;
-            // dataArrayRef.current = new Uint8Array(bufferLength);
-            // drawWave();
-
-            // audio.onended = () => {
-            //   cancelAnimationFrame(animationRef.current);
-            //   ctx.close();
-            // };
-          }
-
-          resolve();
-        } catch (err) {
-          console.error("Error during voice chat:", err);
-          setReply("⚠️ Error during voice chat");
-          resolve(); // resolve anyway to unblock UI
-        }
-      };
-
-      // Actually stop
-      mediaRecorder.stop();
-    });
+  const stopRecording = () => {
+    const ws = wsRef.current;
+    wsRef.current = null;
+    if (ws && ws.readyState === WebSocket.OPEN) {
+      ws.send(JSON.stringify({ type: "stop" }));
+      ws.close();
+    }
+    if (processorRef.current) {
+      processorRef.current.disconnect();
+      processorRef.current = null;
+    }
+    if (streamRef.current) {
+      streamRef.current.getTracks().forEach((t) => t.stop());
+      streamRef.current = null;
+    }
+    stopPlayback();
+    if (audioCtxRef.current) {
+      audioCtxRef.current.close();
+      audioCtxRef.current = null;
+    }
+    cancelAnimationFrame(animationRef.current);
+    setRecording(false);
   };
 
 